@@ -1,27 +1,49 @@
 import os
+import json
+import time
+import uuid
 import logging
 import base64
+import hmac
 from datetime import datetime
-from flask import Flask, request, jsonify, send_file, current_app, make_response
+from flask import Flask, Response, request, jsonify, send_file, current_app, make_response, stream_with_context, g
 from flask_cors import CORS
 from flask_migrate import Migrate
 import redis
 from celery import Celery
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
 from PIL import Image
 import io
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import nltk
 
 # Import models
 from models import db, User, WordCloud, Analytics
 
 # Import processors
-from utils.advanced_processor import AdvancedWordCloudProcessor
+from utils.advanced_processor import AdvancedWordCloudProcessor, RESPONSE_FIELDS, generation_fingerprint, resolve_seed
 from utils.file_processor import FileProcessor
-from utils.wordcloud_processor import WordCloudProcessor
+from utils.wordcloud_processor import WordCloudProcessor, translate_background_color, translate_color_scheme
+from utils.blob_store import LocalBlobCache, LocalBlobStore, get_blob_store, get_image_cache
+from utils.analytics_rollup import NOT_MODIFIED_FEATURE, dashboard_statistics, register_rollup_listener
+from utils.analytics_buffer import AnalyticsBuffer, get_analytics_buffer
+from utils.database import database_config, configure_sqlite_pragmas
+from utils.column_codec import codec_from_name, get_default_codec, set_default_codec
+from utils.export_stream import csv_chunks, ndjson_chunks, gzip_chunks
+from utils.serialization import compress_response, dumps, etag_matches
+from utils.budget import parse_budget_ms
+from utils.admission import EXEMPT_ENDPOINTS, AdmissionRejected, admission_from_config, estimate_cost
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, record_cache, record_request
+from utils.structured_logging import configure_logging, request_id_var
+from utils.profiling import PROFILE_MODES, SAMPLED_ENDPOINTS, ProfileSampler, ProfileStore, RequestProfile
+from utils.cloud_layout import (
+    layout_from_wordcloud, recolor_layout, render_layout_png, render_layout_svg, scale_for_dpi
+)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: records are queued and written by a background thread
+configure_logging(os.environ.get('LOG_LEVEL', 'INFO'), os.environ.get('LOG_FORMAT', 'text'))
 logger = logging.getLogger(__name__)
 
 # Initialize extensions
@@ -55,21 +77,84 @@ def create_app(config_name='default'):
     base_dir = os.path.abspath(os.path.dirname(__file__))
     instance_dir = os.path.join(base_dir, 'instance')
     os.makedirs(instance_dir, exist_ok=True)
-    db_path = os.path.join(instance_dir, 'wordcloud_dev.db')
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    # Database: DATABASE_URL (e.g. Postgres) if set, otherwise tuned SQLite,
+    # with the pool sized to the server's thread count
+    app.config['SERVER_THREADS'] = int(os.environ.get('SERVER_THREADS', 4))
+    app.config.update(database_config(instance_dir, app.config['SERVER_THREADS']))
     app.config['UPLOAD_FOLDER'] = 'uploads'
+    # Content-addressed storage for rendered images
+    app.config['BLOB_STORAGE_PATH'] = os.environ.get('BLOB_STORAGE_PATH', os.path.join(instance_dir, 'blobs'))
+    # Images of generate responses that were not saved: bounded in bytes and
+    # in seconds since last use, least recently used evicted first
+    app.config['IMAGE_CACHE_PATH'] = os.environ.get('IMAGE_CACHE_PATH', os.path.join(instance_dir, 'image_cache'))
+    app.config['IMAGE_CACHE_MAX_BYTES'] = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    app.config['IMAGE_CACHE_MAX_AGE'] = float(os.environ.get('IMAGE_CACHE_MAX_AGE', 24 * 3600))
+    
+    # Codec for structured WordCloud columns, as 'serializer+compressor'
+    # (serializer: json, orjson, msgpack; compressor: none, zlib, zstd)
+    app.config['COLUMN_CODEC'] = os.environ.get('COLUMN_CODEC', get_default_codec().name)
+    
+    # Buffered analytics writes: queue bound, events per bulk insert, seconds between flushes
+    app.config['ANALYTICS_QUEUE_SIZE'] = int(os.environ.get('ANALYTICS_QUEUE_SIZE', 10000))
+    app.config['ANALYTICS_BATCH_SIZE'] = int(os.environ.get('ANALYTICS_BATCH_SIZE', 500))
+    app.config['ANALYTICS_FLUSH_INTERVAL'] = float(os.environ.get('ANALYTICS_FLUSH_INTERVAL', 2.0))
+    
+    # Admission control: per-client token buckets (cost units per second and
+    # burst size) and the heavy/light lanes. Heavy work keeps at least one
+    # server thread free for light endpoints such as /health.
+    threads = app.config['SERVER_THREADS']
+    heavy_concurrency = max(1, threads // 2)
+    app.config['ADMISSION_ENABLED'] = os.environ.get('ADMISSION_ENABLED', '1') != '0'
+    app.config['ADMISSION_RATE'] = float(os.environ.get('ADMISSION_RATE', 1.0))
+    app.config['ADMISSION_BURST'] = float(os.environ.get('ADMISSION_BURST', 10.0))
+    app.config['ADMISSION_REDIS_URL'] = os.environ.get('ADMISSION_REDIS_URL')
+    app.config['ADMISSION_QUEUE_TIMEOUT'] = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 10.0))
+    app.config['ADMISSION_HEAVY_CONCURRENCY'] = int(os.environ.get('ADMISSION_HEAVY_CONCURRENCY', heavy_concurrency))
+    app.config['ADMISSION_HEAVY_QUEUE'] = int(os.environ.get('ADMISSION_HEAVY_QUEUE', max(0, threads - 1 - heavy_concurrency)))
+    app.config['ADMISSION_LIGHT_CONCURRENCY'] = int(os.environ.get('ADMISSION_LIGHT_CONCURRENCY', threads))
+    app.config['ADMISSION_LIGHT_QUEUE'] = int(os.environ.get('ADMISSION_LIGHT_QUEUE', threads * 2))
+    
+    # Reverse proxies in front of the app whose X-Forwarded-For and
+    # X-Forwarded-Proto are trusted, so remote_addr (the admission client key
+    # and analytics address) is the real client. Off by default: with clients
+    # connecting directly, trusting the header would let them pick their own
+    # address and dodge their bucket. Set to the proxy count when proxied.
+    app.config['PROXY_TRUSTED_HOPS'] = int(os.environ.get('PROXY_TRUSTED_HOPS', 0))
+    if app.config['PROXY_TRUSTED_HOPS'] > 0:
+        hops = app.config['PROXY_TRUSTED_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
     
     # Set maximum content length for uploads (16MB)
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
     # Set maximum text length (1MB for text input)
     app.config['MAX_TEXT_LENGTH'] = 1 * 1024 * 1024
     
+    # Batch URL ingestion: URLs per request, seconds for the whole batch, and
+    # fetch threads shared by all batches
+    app.config['MAX_URLS_PER_REQUEST'] = int(os.environ.get('MAX_URLS_PER_REQUEST', 50))
+    app.config['URL_BATCH_TIMEOUT'] = float(os.environ.get('URL_BATCH_TIMEOUT', 60))
+    app.config['URL_BATCH_WORKERS'] = int(os.environ.get('URL_BATCH_WORKERS', 8))
+    
+    # Profiling: PROFILING_ENABLED lets clients ask for a profile (X-Profile
+    # header or settings.profile); PROFILE_SAMPLE_RATE profiles 1 in N heavy
+    # requests. Profiles are read back through /api/admin/profiles with the
+    # PROFILE_ADMIN_TOKEN, which also authorizes opt-in when it is disabled.
+    app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED', '0') == '1'
+    app.config['PROFILE_SAMPLE_RATE'] = int(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_SAMPLE_MODE'] = os.environ.get('PROFILE_SAMPLE_MODE', 'sampling')
+    app.config['PROFILE_ADMIN_TOKEN'] = os.environ.get('PROFILE_ADMIN_TOKEN')
+    app.config['PROFILE_STORAGE_PATH'] = os.environ.get('PROFILE_STORAGE_PATH', os.path.join(instance_dir, 'profiles'))
+    app.config['PROFILE_MAX_STORED'] = int(os.environ.get('PROFILE_MAX_STORED', 100))
+    
     # Add JWT secret key for authentication
     app.config['JWT_SECRET_KEY'] = 'your_super_secret_jwt_key'  # TODO: Change this to a secure value in production
     
     # Initialize extensions
+    set_default_codec(codec_from_name(app.config['COLUMN_CODEC']))
     db.init_app(app)
     migrate.init_app(app, db)
+    with app.app_context():
+        configure_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS'))
     CORS(app, origins=["https://wordcloudapp.onrender.com", "https://wordcloud-n2ew.onrender.com", "http://localhost:3000", "http://127.0.0.1:3000"])
     
     # Initialize Celery
@@ -78,10 +163,233 @@ def create_app(config_name='default'):
     # Create upload directory
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
+    # Register the blob store used for saved word cloud images, and the
+    # cache for images that are only returned from generate
+    app.extensions['blob_store'] = LocalBlobStore(app.config['BLOB_STORAGE_PATH'])
+    app.extensions['image_cache'] = LocalBlobCache(
+        app.config['IMAGE_CACHE_PATH'],
+        max_bytes=app.config['IMAGE_CACHE_MAX_BYTES'],
+        max_age=app.config['IMAGE_CACHE_MAX_AGE']
+    )
+    
+    # Keep the hourly/daily analytics rollups in step with Analytics inserts
+    register_rollup_listener()
+    
+    # Analytics events are queued in memory and bulk inserted in the background
+    app.extensions['analytics_buffer'] = AnalyticsBuffer(
+        app,
+        max_queue_size=app.config['ANALYTICS_QUEUE_SIZE'],
+        batch_size=app.config['ANALYTICS_BATCH_SIZE'],
+        flush_interval=app.config['ANALYTICS_FLUSH_INTERVAL']
+    )
+    
+    # Batch URL requests share one pool, so concurrent batches queue for the
+    # same fetch threads rather than each starting its own
+    app.extensions['url_executor'] = ThreadPoolExecutor(
+        max_workers=app.config['URL_BATCH_WORKERS'], thread_name_prefix='url-fetch'
+    )
+    
+    app.extensions['profile_store'] = ProfileStore(
+        app.config['PROFILE_STORAGE_PATH'], max_profiles=app.config['PROFILE_MAX_STORED']
+    )
+    app.extensions['profile_sampler'] = ProfileSampler(app.config['PROFILE_SAMPLE_RATE'])
+    
+    if app.config['ADMISSION_ENABLED']:
+        app.extensions['admission'] = admission_from_config(app.config)
+    
     return app
 
 app = create_app()
 
+@app.before_request
+def assign_request_id():
+    """Tag the request's log records with the caller's X-Request-ID or a new one."""
+    request_id = request.headers.get('X-Request-ID', '')
+    if not request_id or len(request_id) > 64 or not request_id.replace('-', '').isalnum():
+        request_id = uuid.uuid4().hex
+    g.request_id = request_id
+    g.request_id_token = request_id_var.set(request_id)
+
+@app.teardown_request
+def clear_request_id(error=None):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        request_id_var.reset(token)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def admit_request():
+    """Rate-limit by client and queue CPU-heavy requests apart from light ones."""
+    controller = current_app.extensions.get('admission')
+    if controller is None or request.endpoint is None or request.endpoint in EXEMPT_ENDPOINTS:
+        return None
+    
+    cost = estimate_cost(
+        request.endpoint,
+        request.get_json(silent=True) if request.is_json else None,
+        request.content_length or 0,
+        request.args
+    )
+    try:
+        g.admission_lane = controller.admit(request.remote_addr or 'unknown', cost)
+    except AdmissionRejected as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.status_code = e.status
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    g.admission_started = time.perf_counter()
+    return None
+
+def _is_profile_admin():
+    token = current_app.config.get('PROFILE_ADMIN_TOKEN')
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+def _requested_profile_mode():
+    """Profile mode asked for by the X-Profile header or settings.profile, if any."""
+    mode = request.headers.get('X-Profile')
+    if not mode and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict) and isinstance(data.get('settings'), dict):
+            mode = data['settings'].get('profile')
+    if not mode:
+        return None
+    mode = str(mode).lower()
+    return 'cprofile' if mode in ('1', 'true') else mode
+
+@app.before_request
+def start_profile():
+    """Profile the request if the client asked for it or it was sampled."""
+    if request.endpoint is None or request.endpoint in EXEMPT_ENDPOINTS:
+        return None
+    mode = _requested_profile_mode()
+    if mode is not None and (current_app.config['PROFILING_ENABLED'] or _is_profile_admin()):
+        if mode not in PROFILE_MODES:
+            return jsonify({
+                'success': False,
+                'error': f"Unknown profile mode '{mode}', expected one of: {', '.join(PROFILE_MODES)}"
+            }), 400
+        trigger = 'requested'
+    elif request.endpoint in SAMPLED_ENDPOINTS and current_app.extensions['profile_sampler'].hit():
+        mode = current_app.config['PROFILE_SAMPLE_MODE']
+        trigger = 'sampled'
+    else:
+        return None
+    
+    profile = RequestProfile(mode, trigger, endpoint=request.endpoint, request_id=g.get('request_id'))
+    if profile.start():
+        g.profile = profile
+    else:
+        logger.info("Skipping profile, another request is being profiled")
+    return None
+
+@app.teardown_request
+def save_profile(error=None):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return
+    try:
+        result = profile.finish(g.pop('profile_status', 500 if error else None))
+        current_app.extensions['profile_store'].save(result)
+        logger.info("Stored request profile", extra={'profile_id': profile.id, 'wall_ms': result['wall_ms']})
+    except Exception as e:
+        logger.error(f"Failed to store profile: {str(e)}")
+
+@app.teardown_request
+def release_admission(error=None):
+    """Give the request's lane slot back."""
+    lane = g.pop('admission_lane', None)
+    if lane is not None:
+        current_app.extensions['admission'].release(lane, g.pop('admission_started'))
+
+@app.after_request
+def count_request(response):
+    """Record the request in the /metrics counters and latency histogram."""
+    started = g.get('request_started')
+    if started is not None:
+        record_request(request.endpoint, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.after_request
+def echo_request_id(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    if 'profile' in g:
+        g.profile_status = response.status_code
+        response.headers['X-Profile-ID'] = g.profile.id
+    return response
+
+@app.after_request
+def compress(response):
+    """Compress large text responses for clients that accept it."""
+    return compress_response(response, request.accept_encodings)
+
+def _queue_metrics():
+    """Queue depths and counters of this app's background queues and admission lanes."""
+    analytics = current_app.extensions['analytics_buffer'].stats()
+    yield ('wordcloud_queue_depth', 'gauge', 'Items waiting in a queue.', [
+        ({'queue': 'analytics'}, analytics['queued'])
+    ])
+    yield ('wordcloud_queue_capacity', 'gauge', 'Maximum items a queue holds.', [
+        ({'queue': 'analytics'}, analytics['capacity'])
+    ])
+    yield ('wordcloud_analytics_events_total', 'counter', 'Analytics events by outcome.', [
+        ({'outcome': outcome}, analytics[outcome]) for outcome in ('recorded', 'written', 'dropped', 'failed')
+    ])
+    
+    fetcher = file_processor.url_fetcher.stats()
+    yield ('wordcloud_cache_entries', 'gauge', 'Entries held in a cache.', [
+        ({'cache': 'url_text'}, fetcher['size'])
+    ])
+    
+    controller = current_app.extensions.get('admission')
+    if controller is not None:
+        stats = controller.stats()
+        lanes = [(name, stats[name]) for name in ('heavy', 'light')]
+        yield ('wordcloud_admission_active', 'gauge', 'Requests running in an admission lane.', [
+            ({'lane': name}, lane['active']) for name, lane in lanes
+        ])
+        yield ('wordcloud_admission_waiting', 'gauge', 'Requests queued for an admission lane.', [
+            ({'lane': name}, lane['waiting']) for name, lane in lanes
+        ])
+        yield ('wordcloud_admission_rejections_total', 'counter', 'Requests turned away, by lane and reason.', [
+            ({'lane': name, 'reason': reason}, lane[reason])
+            for name, lane in lanes for reason in ('rejected', 'timed_out')
+        ] + [({'lane': 'client', 'reason': 'throttled'}, stats['throttled'])])
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics in the text exposition format."""
+    return Response(REGISTRY.expose(extra_collectors=[_queue_metrics]), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """Newest stored request profiles, without the profiler output."""
+    if not _is_profile_admin():
+        return jsonify({'success': False, 'error': 'Admin token required'}), 403
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify({'success': True, 'profiles': current_app.extensions['profile_store'].list(limit)})
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    One stored profile. ?format=text returns the pstats report (cProfile)
+    or collapsed stacks for flame graph tools (sampling) as plain text.
+    """
+    if not _is_profile_admin():
+        return jsonify({'success': False, 'error': 'Admin token required'}), 403
+    profile = current_app.extensions['profile_store'].get(profile_id)
+    if profile is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    if request.args.get('format') == 'text':
+        output = profile['profile']
+        text = output['text'] if profile['mode'] == 'cprofile' else '\n'.join(output['collapsed_stacks'])
+        return Response(text, mimetype='text/plain')
+    return jsonify({'success': True, 'profile': profile})
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -190,7 +498,7 @@ def upload_file():
 def process_url():
     """
     Extract text from a website URL.
-    Uses BeautifulSoup to parse and extract meaningful text.
+    Uses the shared lxml extractor to keep the page's main content.
     """
     try:
         data = request.get_json()
@@ -233,12 +541,172 @@ def process_url():
             'error': f"Error processing URL: {str(e)}"
         }), 500
 
+@app.route('/api/process_urls', methods=['POST'])
+def process_urls():
+    """
+    Extract text from several website URLs at once.
+    
+    Pages are fetched concurrently (duplicates once, a few per host at a
+    time, all within URL_BATCH_TIMEOUT) and their word counts merged into
+    a single frequency map, filtered like a generation request.
+    """
+    try:
+        data = request.get_json()
+        urls = data.get('urls') if data else None
+        
+        if not isinstance(urls, list) or not urls:
+            return jsonify({
+                'success': False,
+                'error': 'A list of URLs is required'
+            }), 400
+        
+        urls = [url.strip() for url in urls if isinstance(url, str) and url.strip()]
+        if not urls:
+            return jsonify({
+                'success': False,
+                'error': 'URLs cannot be empty'
+            }), 400
+        
+        if len(urls) > current_app.config['MAX_URLS_PER_REQUEST']:
+            return jsonify({
+                'success': False,
+                'error': f'Too many URLs (maximum {current_app.config["MAX_URLS_PER_REQUEST"]} per request)'
+            }), 400
+        
+        settings = data.get('settings') or {}
+        results = file_processor.extract_text_from_urls(
+            urls,
+            current_app.extensions['url_executor'],
+            timeout=current_app.config['URL_BATCH_TIMEOUT']
+        )
+        
+        # Count each page separately and merge, then apply the thresholds
+        wordcloud_processor = advanced_processor.wordcloud_processor
+        word_frequencies = Counter()
+        texts = []
+        for result in results:
+            if not result['success']:
+                continue
+            texts.append(result['text'])
+            tokens = wordcloud_processor.preprocess_text(
+                result['text'],
+                settings.get('remove_stopwords', True),
+                settings.get('custom_stopwords', [])
+            )
+            word_frequencies.update(wordcloud_processor.count_frequencies(tokens))
+        
+        thresholds = {}
+        for key in ('min_frequency', 'max_frequency'):
+            try:
+                thresholds[key] = int(settings[key]) if settings.get(key) is not None else None
+            except (ValueError, TypeError):
+                logger.warning(f"Invalid {key} value: {settings.get(key)}, ignoring it")
+                thresholds[key] = None
+        merged = {
+            word: count for word, count in word_frequencies.most_common()
+            if (thresholds['min_frequency'] is None or count >= thresholds['min_frequency'])
+            and (thresholds['max_frequency'] is None or count <= thresholds['max_frequency'])
+        }
+        
+        succeeded = len(texts)
+        return jsonify({
+            'success': succeeded > 0,
+            'error': None if succeeded else 'Failed to extract text from any URL',
+            'text': '\n\n'.join(texts),
+            'word_frequencies': merged,
+            'results': [
+                {key: result.get(key) for key in (
+                    'url', 'success', 'error', 'title', 'word_count', 'character_count', 'from_cache'
+                )}
+                for result in results
+            ],
+            'duplicates': len(urls) - len(results),
+            'fetched': succeeded,
+            'failed': len(results) - succeeded
+        }), 200 if succeeded else 400
+    except Exception as e:
+        logger.error(f"Error in batch URL processing: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f"Error processing URLs: {str(e)}"
+        }), 500
+
+def _record_analytics(action, feature_used, start_time, **fields):
+    """Queue an analytics event for the current request; never raises."""
+    try:
+        get_analytics_buffer().record(
+            action,
+            feature_used=feature_used,
+            processing_time=time.perf_counter() - start_time,
+            referrer=(request.referrer or '')[:255] or None,
+            user_agent=(request.user_agent.string or '')[:255] or None,
+            ip_address=request.remote_addr,
+            **fields
+        )
+    except Exception as e:
+        logger.warning(f"Could not record analytics event: {str(e)}")
+
+# Representations of a generated word cloud, chosen from the Accept header
+GENERATE_MIMETYPES = {
+    'application/json': 'json',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'multipart/mixed': 'multipart'
+}
+
+def _multipart_mixed(parts):
+    """Build a multipart/mixed response from (content type, headers, bytes) parts."""
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for content_type, headers, body in parts:
+        head = [f'--{boundary}', f'Content-Type: {content_type}', f'Content-Length: {len(body)}']
+        head.extend(f'{name}: {value}' for name, value in headers.items())
+        chunks.append(('\r\n'.join(head) + '\r\n\r\n').encode('utf-8'))
+        chunks.append(body)
+        chunks.append(b'\r\n')
+    chunks.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return Response(b''.join(chunks), mimetype=f'multipart/mixed; boundary={boundary}')
+
+def _requested_fields(data):
+    """
+    Response fields selected by ?fields= or a "fields" list in the body.
+
+    Returns:
+        Set of RESPONSE_FIELDS names, or None when no selection was made
+    """
+    fields = request.args.get('fields') or data.get('fields')
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    return {field.strip() for field in fields if field.strip()}
+
+def _png_to_webp(image_png):
+    """Re-encode PNG bytes as lossless WebP."""
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(image_png)).save(buffer, format='WEBP', lossless=True)
+    return buffer.getvalue()
+
 # Advanced word cloud generation
 @app.route('/api/generate_wordcloud', methods=['POST'])
 def generate_advanced_wordcloud():
     """
     Generate advanced word cloud with comprehensive analytics.
+    
+    The response format follows the Accept header:
+    - application/json (default): analytics plus image_url into the image
+      cache; ?inline_image=true adds the legacy image_base64 field
+    - image/png or image/webp: the image bytes only
+    - multipart/mixed: a JSON analytics part followed by the PNG part
+    
+    ?fields=word_frequencies,top_words (or a "fields" list in the body)
+    limits the JSON to those parts of RESPONSE_FIELDS; stages that are not
+    requested are not computed, and the image is only rendered when
+    'image' is among them.
     """
+    start_time = time.perf_counter()
+    feature_used = 'words'
+    text_length = None
     try:
         data = request.get_json()
         
@@ -275,33 +743,92 @@ def generate_advanced_wordcloud():
             
         # Validate and convert numeric settings
         if 'min_frequency' in settings:
-            logger.info(f"Original min_frequency value: {settings['min_frequency']} (type: {type(settings['min_frequency']).__name__})")
+            logger.debug(f"Original min_frequency value: {settings['min_frequency']} (type: {type(settings['min_frequency']).__name__})")
             try:
                 settings['min_frequency'] = int(settings['min_frequency'])
-                logger.info(f"Converted min_frequency value: {settings['min_frequency']} (type: {type(settings['min_frequency']).__name__})")
+                logger.debug(f"Converted min_frequency value: {settings['min_frequency']} (type: {type(settings['min_frequency']).__name__})")
             except (ValueError, TypeError) as e:
                 logger.warning(f"Invalid min_frequency value: {settings.get('min_frequency')}, setting to None. Error: {str(e)}")
                 settings['min_frequency'] = None
                 
         if 'max_frequency' in settings:
-            logger.info(f"Original max_frequency value: {settings['max_frequency']} (type: {type(settings['max_frequency']).__name__})")
+            logger.debug(f"Original max_frequency value: {settings['max_frequency']} (type: {type(settings['max_frequency']).__name__})")
             try:
                 settings['max_frequency'] = int(settings['max_frequency'])
-                logger.info(f"Converted max_frequency value: {settings['max_frequency']} (type: {type(settings['max_frequency']).__name__})")
+                logger.debug(f"Converted max_frequency value: {settings['max_frequency']} (type: {type(settings['max_frequency']).__name__})")
             except (ValueError, TypeError) as e:
                 logger.warning(f"Invalid max_frequency value: {settings.get('max_frequency')}, setting to None. Error: {str(e)}")
                 settings['max_frequency'] = None
         
+        for key in ('time_budget_ms', 'entity_time_budget_ms'):
+            try:
+                settings[key] = parse_budget_ms(settings.get(key))
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': f'{key}: {str(e)}'
+                }), 400
+            if settings[key] is None:
+                del settings[key]
+        
         # Log all settings for debugging
-        logger.info(f"Settings after validation: {settings}")
+        logger.debug(f"Settings after validation: {settings}")
         
         # No authentication: always set user_id = None
         user_id = None
         
         logger.info(f"Generating advanced word cloud for text of length {len(text)}")
+        feature_used = settings.get('cloud_mode', 'words')
+        text_length = len(text)
+        
+        # Output is reproducible for a given seed, so the inputs identify the
+        # response and a matching If-None-Match needs no rendering at all
+        settings['seed'] = resolve_seed(text, settings)
+        representation = GENERATE_MIMETYPES[
+            request.accept_mimetypes.best_match(list(GENERATE_MIMETYPES), default='application/json')
+        ]
+        inline_image = request.args.get('inline_image', '').lower() == 'true'
+        fields = _requested_fields(data)
+        unknown = sorted(fields - set(RESPONSE_FIELDS)) if fields else []
+        if unknown:
+            return jsonify({
+                'success': False,
+                'error': f"Unknown fields: {', '.join(unknown)}"
+            }), 400
+        if fields is not None and representation != 'json':
+            fields.add('image')
+        fingerprint = generation_fingerprint(
+            text, settings if fields is None else dict(settings, fields=sorted(fields))
+        )
+        etag = f"{fingerprint}-{representation}{'-inline' if inline_image else ''}"
+        # Image bytes are identical for identical inputs; the JSON also carries
+        # per-request timings and budget-dependent results, so it is only
+        # semantically equivalent and gets a weak validator
+        weak_etag = representation in ('json', 'multipart')
+        if etag_matches(request.if_none_match, etag):
+            record_cache('generate_etag', hits=1)
+            response = make_response('', 304)
+            response.set_etag(etag, weak=weak_etag)
+            response.vary.add('Accept')
+            _record_analytics('generate_wordcloud', NOT_MODIFIED_FEATURE, start_time, text_length=text_length)
+            return response
+        
+        record_cache('generate_etag', misses=1)
         
         # Generate word cloud with advanced analytics
-        image_base64, analytics = advanced_processor.generate_advanced_wordcloud(text, settings)
+        image_png, analytics = advanced_processor.generate_advanced_wordcloud(
+            text, settings, fields=None if fields is None else sorted(fields)
+        )
+        
+        if representation in ('png', 'webp'):
+            _record_analytics('generate_wordcloud', feature_used, start_time, text_length=text_length)
+            if representation == 'webp':
+                response = Response(_png_to_webp(image_png), mimetype='image/webp')
+            else:
+                response = Response(image_png, mimetype='image/png')
+            response.set_etag(etag)
+            response.vary.add('Accept')
+            return response
         
         # Do not save to database with user_id, but you may still save as public or anonymous if needed
         wordcloud_record = None
@@ -321,66 +848,252 @@ def generate_advanced_wordcloud():
         #             background_color=settings.get('background_color', 'white'),
         #             width=settings.get('width', 800),
         #             height=settings.get('height', 600),
-        #             image_base64=image_base64,
         #             is_public=data.get('is_public', False)
         #         )
+        #         wordcloud_record.set_image(image_png, get_blob_store())
         #         wordcloud_record.set_settings(settings)
         #         wordcloud_record.set_word_frequencies(analytics['word_frequencies'])
         #         wordcloud_record.set_sentiment_analysis(analytics['sentiment_analysis'])
         #         wordcloud_record.set_tags(tags)
+        #         wordcloud_record.set_layout(analytics['layout'], settings.get('width', 800), settings.get('height', 600))
         #         db.session.add(wordcloud_record)
         #         db.session.commit()
-        #         analytics_record = Analytics(
-        #             user_id=user_id,
-        #             action='generate_wordcloud',
-        #             feature_used='wordcloud',
-        #             text_length=len(text),
-        #         )
-        #         db.session.add(analytics_record)
-        #         db.session.commit()
         #     except Exception as e:
         #         logger.error(f"Error saving word cloud to database: {str(e)}")
         #         # Continue execution despite DB error
         
-        # Convert any dictionaries with mixed keys to ensure all keys are strings
-        def ensure_str_keys(obj):
-            if isinstance(obj, dict):
-                return {str(k): ensure_str_keys(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [ensure_str_keys(item) for item in obj]
-            else:
-                return obj
-                
-        # Return the word cloud data
-        return jsonify({
+        # Return the word cloud data; non-string keys and numpy values are
+        # handled by the serializer, so the analytics are not copied first
+        response_data = {
             'success': True,
             'message': 'Word cloud generated successfully',
-            'image_base64': image_base64,
-            'word_frequencies': ensure_str_keys(analytics['word_frequencies']),
-            'word_context': ensure_str_keys(analytics['word_context']),
-            'sentiment_analysis': ensure_str_keys(analytics['sentiment_analysis']),
-            'top_words': ensure_str_keys(analytics.get('top_words', {})),
-            'text_statistics': ensure_str_keys(analytics['text_statistics']),
+            'seed': settings['seed'],
             'wordcloud_id': wordcloud_record.id if wordcloud_record else None
-        })
+        }
+        for key in RESPONSE_FIELDS:
+            if key in analytics and (fields is None or key in fields):
+                response_data[key] = analytics[key]
+        
+        if representation == 'multipart':
+            response = _multipart_mixed([
+                ('application/json', {}, dumps(response_data)),
+                ('image/png', {'Content-Disposition': 'inline; filename="wordcloud.png"'}, image_png)
+            ])
+        else:
+            if image_png is not None:
+                # The image goes into the bounded image cache and is fetched by URL
+                image_hash = get_image_cache().put(image_png)
+                response_data['image_hash'] = image_hash
+                response_data['image_url'] = f'/api/images/{image_hash}'
+                if inline_image:
+                    response_data['image_base64'] = base64.b64encode(image_png).decode('utf-8')
+            response = Response(dumps(response_data), mimetype='application/json')
+        _record_analytics('generate_wordcloud', feature_used, start_time, text_length=text_length)
+        response.set_etag(etag, weak=weak_etag)
+        response.vary.add('Accept')
+        return response
         
     except Exception as e:
         import traceback
         logger.error(f"Error in advanced word cloud generation: {str(e)}")
         logger.error(f"Full traceback: {traceback.format_exc()}")
+        _record_analytics('generate_wordcloud', feature_used, start_time, text_length=text_length,
+                          is_error=True, error_message=str(e))
         return jsonify({
             'success': False,
             'error': str(e),
             'traceback': traceback.format_exc()
         }), 500
 
+@app.route('/api/images/<image_hash>', methods=['GET'])
+def get_cached_image(image_hash):
+    """
+    Serve a rendered image by content hash.
+    
+    Looks in the image cache first, then in the permanent store of saved
+    word clouds; cached images disappear once evicted.
+    """
+    image_path, image_data = None, None
+    for blob_store in (get_image_cache(), get_blob_store()):
+        try:
+            image_path = blob_store.local_path(image_hash)
+            image_data = None if image_path else blob_store.get(image_hash)
+        except ValueError:
+            break
+        if image_path or image_data is not None:
+            break
+    if not image_path and image_data is None:
+        return jsonify({
+            'success': False,
+            'error': 'Image not found'
+        }), 404
+    image_source = image_path or io.BytesIO(image_data)
+    
+    # The URL names the content, so it can be cached forever
+    response = send_file(image_source, mimetype='image/png', conditional=True, etag=image_hash)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+# Word cloud listing
+def _encode_cursor(wordcloud):
+    """Encode the (created_at, id) keyset position of a record."""
+    raw = f"{wordcloud.created_at.isoformat()}|{wordcloud.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor):
+    """Decode a cursor produced by _encode_cursor."""
+    created_at, wordcloud_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+    return datetime.fromisoformat(created_at), int(wordcloud_id)
+
+@app.route('/api/wordclouds', methods=['GET'])
+def list_wordclouds():
+    """
+    List saved word clouds, newest first, with keyset pagination.
+    
+    Query parameters:
+    - limit: Page size (default: 20, max: 100)
+    - cursor: next_cursor value from the previous page
+    - user_id: Only clouds of this user (optional)
+    - public: 'true' to list only public clouds (optional)
+    """
+    try:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        cursor = request.args.get('cursor')
+        user_id = request.args.get('user_id', type=int)
+        public_only = request.args.get('public', '').lower() == 'true'
+        
+        query = WordCloud.summary_query()
+        if user_id is not None:
+            query = query.filter(WordCloud.user_id == user_id)
+        if public_only:
+            query = query.filter(WordCloud.is_public.is_(True))
+        
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = _decode_cursor(cursor)
+            except (ValueError, UnicodeDecodeError):
+                return jsonify({
+                    'success': False,
+                    'error': 'Invalid cursor'
+                }), 400
+            query = query.filter(db.or_(
+                WordCloud.created_at < cursor_created_at,
+                db.and_(WordCloud.created_at == cursor_created_at, WordCloud.id < cursor_id)
+            ))
+        
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(WordCloud.created_at.desc(), WordCloud.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return jsonify({
+            'success': True,
+            'wordclouds': [wordcloud.to_summary_dict() for wordcloud in rows],
+            'next_cursor': _encode_cursor(rows[-1]) if has_more else None
+        })
+        
+    except Exception as e:
+        logger.error(f"Error listing word clouds: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Failed to list word clouds: {str(e)}'
+        }), 500
+
 # Export endpoints
 @app.route('/api/export/<int:wordcloud_id>', methods=['GET'])
 def export_wordcloud(wordcloud_id):
-    """Export word cloud in various formats."""
+    """
+    Export word cloud in various formats.
+    
+    Query parameters:
+    - format: png, svg, json, csv or ndjson (default: png)
+    - dpi: Re-render the PNG from the word layout at this resolution (72-600)
+    - include_text: 'false' to leave out the original text (json, ndjson)
+    - include_image: 'false' to leave out the image reference (json, ndjson)
+    
+    CSV and NDJSON are streamed, gzip-compressed when the client accepts it.
+    """
+    start_time = time.perf_counter()
+    format_type = request.args.get('format', 'png')
+    response = make_response(_export_wordcloud(wordcloud_id, format_type))
+    _record_analytics('export', format_type, start_time, resource_id=wordcloud_id,
+                      is_error=response.status_code >= 400)
+    return response
+
+def _wordcloud_layout(wordcloud):
+    """
+    Return (layout, width, height) for drawing a saved word cloud.
+    
+    Uses the stored layout; records saved before layouts were stored are
+    laid out once, with the seed their image was generated with, and the
+    result is kept.
+    """
+    stored = wordcloud.get_layout()
+    if stored is not None:
+        return stored
+    
+    settings = wordcloud.get_settings()
+    seed = resolve_seed(wordcloud.original_text or '', settings)
+    wc = advanced_processor.wordcloud_processor.compute_layout(
+        wordcloud.get_word_frequencies(),
+        width=wordcloud.width or 800,
+        height=wordcloud.height or 600,
+        color_scheme=wordcloud.color_scheme or settings.get('color_scheme', 'viridis'),
+        background_color=_background_color(wordcloud),
+        prefer_horizontal=settings.get('prefer_horizontal', 0.7),
+        relative_scaling=settings.get('relative_scaling', 0.5),
+        max_words=settings.get('max_words', 200),
+        min_font_size=settings.get('min_font_size', 10),
+        max_font_size=settings.get('max_font_size', 100),
+        random_state=seed
+    )
+    layout = layout_from_wordcloud(wc)
+    wordcloud.set_layout(layout, wc.width, wc.height)
+    db.session.commit()
+    return layout, wc.width, wc.height
+
+def _background_color(wordcloud):
+    """Background color name of a saved word cloud."""
+    return wordcloud.background_color or wordcloud.get_settings().get('background_color', 'white')
+
+def _parse_dpi(value):
+    """
+    Parse a requested PNG resolution, clamped to 72-600 dpi.
+    
+    Returns:
+        The DPI, or None if none was requested
+    
+    Raises:
+        ValueError: If the value is not an integer
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"Invalid dpi: {value!r}")
+    return min(max(int(value), 72), 600)
+
+def _streaming_export(chunks, mimetype, download_name):
+    """Stream export chunks as an attachment, gzip-encoded if the client accepts it."""
+    compress = bool(request.accept_encodings['gzip'])
+    if compress:
+        chunks = gzip_chunks(chunks)
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+    return response
+
+def _export_wordcloud(wordcloud_id, format_type):
+    """Build the export response for a word cloud."""
     try:
-        format_type = request.args.get('format', 'png')
-        dpi = request.args.get('dpi', 300, type=int)
+        try:
+            dpi = _parse_dpi(request.args.get('dpi'))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'dpi must be an integer'
+            }), 400
         
         # Get word cloud from database
         wordcloud = WordCloud.query.get(wordcloud_id)
@@ -395,43 +1108,86 @@ def export_wordcloud(wordcloud_id):
         #     # Add authentication check here
         #     pass
         
-        if format_type == 'png':
-            # Return PNG image
-            import base64
-            image_data = base64.b64decode(wordcloud.image_base64)
+        if format_type == 'svg' or (format_type == 'png' and dpi is not None):
+            # Drawn from the word layout, so any resolution costs only rasterizing
+            layout, width, height = _wordcloud_layout(wordcloud)
+            background_color = translate_background_color(_background_color(wordcloud))
+            if format_type == 'svg':
+                return Response(
+                    render_layout_svg(layout, width, height, background_color),
+                    mimetype='image/svg+xml',
+                    headers={'Content-Disposition': f'attachment; filename=wordcloud_{wordcloud_id}.svg'}
+                )
+            scale = scale_for_dpi(dpi)
             return send_file(
-                io.BytesIO(image_data),
+                io.BytesIO(render_layout_png(layout, width, height, background_color, scale)),
+                mimetype='image/png',
+                as_attachment=True,
+                download_name=f'wordcloud_{wordcloud_id}_{dpi}dpi.png'
+            )
+        
+        if format_type == 'png':
+            blob_store = get_blob_store()
+            
+            # Move legacy inline images into the blob store on first access
+            if not wordcloud.image_hash and wordcloud.image_base64:
+                wordcloud.set_image(base64.b64decode(wordcloud.image_base64), blob_store)
+                db.session.commit()
+            
+            if not wordcloud.image_hash:
+                return jsonify({
+                    'success': False,
+                    'error': 'Word cloud has no image'
+                }), 404
+            
+            # Stream from disk; the content hash is a strong ETag and
+            # conditional=True answers If-None-Match and Range requests.
+            # The URL is per record, so clients revalidate rather than cache forever.
+            image_path = blob_store.local_path(wordcloud.image_hash)
+            if image_path:
+                image_source = image_path
+            else:
+                image_data = blob_store.get(wordcloud.image_hash)
+                if image_data is None:
+                    return jsonify({
+                        'success': False,
+                        'error': 'Word cloud image not found'
+                    }), 404
+                image_source = io.BytesIO(image_data)
+            
+            response = send_file(
+                image_source,
                 mimetype='image/png',
                 as_attachment=True,
-                download_name=f'wordcloud_{wordcloud_id}.png'
+                download_name=f'wordcloud_{wordcloud_id}.png',
+                conditional=True,
+                etag=wordcloud.image_hash
             )
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        
+        include_text = request.args.get('include_text', 'true').lower() != 'false'
+        include_image = request.args.get('include_image', 'true').lower() != 'false'
         
-        elif format_type == 'json':
+        if format_type == 'json':
             # Return JSON data
             return jsonify({
                 'success': True,
-                'wordcloud': wordcloud.to_dict()
+                'wordcloud': wordcloud.to_dict(include_text=include_text, include_image=include_image)
             })
         
         elif format_type == 'csv':
-            # Return CSV data
-            import csv
-            import io
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['Word', 'Frequency'])
-            
-            word_frequencies = wordcloud.get_word_frequencies()
-            for word, freq in sorted(word_frequencies.items(), key=lambda x: x[1], reverse=True):
-                writer.writerow([word, freq])
-            
-            output.seek(0)
-            return send_file(
-                io.BytesIO(output.getvalue().encode()),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=f'wordcloud_{wordcloud_id}.csv'
+            return _streaming_export(
+                csv_chunks(wordcloud.get_word_frequencies()),
+                'text/csv',
+                f'wordcloud_{wordcloud_id}.csv'
+            )
+        
+        elif format_type == 'ndjson':
+            return _streaming_export(
+                ndjson_chunks(wordcloud, include_text=include_text, include_image=include_image),
+                'application/x-ndjson',
+                f'wordcloud_{wordcloud_id}.ndjson'
             )
         
         else:
@@ -447,6 +1203,63 @@ def export_wordcloud(wordcloud_id):
             'error': f'Export failed: {str(e)}'
         }), 500
 
+@app.route('/api/wordclouds/<int:wordcloud_id>/recolor', methods=['POST'])
+def recolor_wordcloud(wordcloud_id):
+    """
+    Redraw a saved word cloud with new colors, keeping every word in place.
+    
+    JSON body:
+    - color_scheme: Colormap for the words (default: the saved scheme)
+    - background_color: Background color (default: the saved background)
+    - seed: Seed for the color choice (optional)
+    - format: png or svg (default: png)
+    - dpi: PNG resolution (optional, 72-600)
+    """
+    start_time = time.perf_counter()
+    data = request.get_json(silent=True) or {}
+    format_type = data.get('format', 'png')
+    try:
+        wordcloud = db.session.get(WordCloud, wordcloud_id)
+        if not wordcloud:
+            return jsonify({
+                'success': False,
+                'error': 'Word cloud not found'
+            }), 404
+        if format_type not in ('png', 'svg'):
+            return jsonify({
+                'success': False,
+                'error': 'Unsupported recolor format'
+            }), 400
+        try:
+            dpi = _parse_dpi(data.get('dpi'))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'dpi must be an integer'
+            }), 400
+        
+        layout, width, height = _wordcloud_layout(wordcloud)
+        color_scheme = data.get('color_scheme') or wordcloud.color_scheme or 'viridis'
+        layout = recolor_layout(layout, width, height, translate_color_scheme(color_scheme), data.get('seed'))
+        background_color = translate_background_color(data.get('background_color') or _background_color(wordcloud))
+        
+        if format_type == 'svg':
+            response = Response(render_layout_svg(layout, width, height, background_color), mimetype='image/svg+xml')
+        else:
+            scale = scale_for_dpi(dpi) if dpi else 1.0
+            response = Response(render_layout_png(layout, width, height, background_color, scale), mimetype='image/png')
+        _record_analytics('recolor', format_type, start_time, resource_id=wordcloud_id)
+        return response
+        
+    except Exception as e:
+        logger.error(f"Recolor error: {str(e)}")
+        _record_analytics('recolor', format_type, start_time, resource_id=wordcloud_id,
+                          is_error=True, error_message=str(e))
+        return jsonify({
+            'success': False,
+            'error': f'Recolor failed: {str(e)}'
+        }), 500
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -519,15 +1332,18 @@ def mask_preview():
 
 @app.route('/api/analytics/dashboard', methods=['GET'])
 def analytics_dashboard():
-    """Placeholder dashboard analytics endpoint."""
-    return jsonify({
-        'success': True,
-        'statistics': {
-            'total_users': 42,
-            'total_wordclouds': 123,
-            'active_sessions': 7
-        }
-    })
+    """Dashboard statistics, served from the analytics rollup tables."""
+    try:
+        return jsonify({
+            'success': True,
+            'statistics': dashboard_statistics()
+        })
+    except Exception as e:
+        logger.error(f"Error loading dashboard statistics: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Error loading dashboard statistics'
+        }), 500
 
 @app.route('/generator', methods=['GET'])
 def generator_page():
@@ -546,5 +1362,8 @@ def generator_page():
 #     pass
 
 if __name__ == '__main__':
+    # Spawned worker processes re-import the main script, and this one builds
+    # the whole app at import time; tag entities in threads instead
+    advanced_processor.entity_extractor.use_processes = False
     logger.info("Starting Professional Word Cloud Generator API...")
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Storage size and encode/decode time of the WordCloud column codecs.
+
+Builds Zipf-distributed word frequency maps of realistic sizes and compares
+the legacy json.dumps/json.loads text format with every codec whose
+libraries are installed.
+
+Usage:
+    python benchmarks/bench_column_codec.py [--sizes 1000 10000 50000] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.column_codec import ColumnCodec, SERIALIZERS, COMPRESSORS  # noqa: E402
+
+
+def frequency_map(size, seed=0):
+    """Word -> count map with Zipf-like counts and English-like word lengths."""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        length = max(2, int(rng.gauss(7, 2.5)))
+        words.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(length)))
+    return {word: max(1, int(10000 / rank)) for rank, word in enumerate(sorted(words), start=1)}
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def available_codecs():
+    codecs = []
+    for serializer in SERIALIZERS:
+        for compressor in COMPRESSORS:
+            try:
+                codecs.append(ColumnCodec(serializer, compressor))
+            except RuntimeError:
+                pass
+    return codecs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    codecs = available_codecs()
+    for size in args.sizes:
+        frequencies = frequency_map(size)
+        legacy = json.dumps(frequencies)
+        print(f"\n{size} words")
+        print(f"{'format':<18}{'bytes':>12}{'ratio':>8}{'encode ms':>12}{'decode ms':>12}")
+        print(f"{'legacy json text':<18}{len(legacy):>12}{1.0:>8.2f}"
+              f"{best_time(lambda: json.dumps(frequencies), args.repeat):>12.2f}"
+              f"{best_time(lambda: json.loads(legacy), args.repeat):>12.2f}")
+        for codec in codecs:
+            encoded = codec.encode(frequencies)
+            assert ColumnCodec.decode(encoded) == frequencies
+            print(f"{codec.name:<18}{len(encoded):>12}{len(encoded) / len(legacy):>8.2f}"
+                  f"{best_time(lambda: codec.encode(frequencies), args.repeat):>12.2f}"
+                  f"{best_time(lambda: ColumnCodec.decode(encoded), args.repeat):>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Concurrent read/write benchmark for the SQLite configuration.
+
+Runs reader threads (word cloud listing queries) against writer threads
+(analytics batches and word cloud inserts) on a scratch database, once with
+SQLite defaults and once with the tuned profile from utils.database, and
+reports throughput, latency and "database is locked" errors for each.
+
+Usage:
+    python benchmarks/bench_database.py [--threads 4] [--seconds 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, Analytics, User, WordCloud  # noqa: E402
+from utils.database import database_config, configure_sqlite_pragmas  # noqa: E402
+
+
+def make_engine(path, tuned, threads):
+    if tuned:
+        options = dict(database_config(os.path.dirname(path), threads)['SQLALCHEMY_ENGINE_OPTIONS'])
+        engine = create_engine(f'sqlite:///{path}', **options)
+        configure_sqlite_pragmas(engine)
+    else:
+        # Python's sqlite3 default lock timeout is 5 s; use a short one so
+        # contention surfaces as errors like it does under load
+        engine = create_engine(f'sqlite:///{path}', connect_args={'check_same_thread': False, 'timeout': 0.1})
+    db.metadata.create_all(engine)
+    return engine
+
+
+def seed(engine, rows):
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert().values(
+            id=1, username='bench', email='bench@example.com', password_hash='-'))
+        connection.execute(WordCloud.__table__.insert(), [
+            {'user_id': 1, 'title': f'Cloud {i}', 'created_at': datetime.utcnow(), 'is_public': i % 2 == 0,
+             'text_length': 1000, 'word_count': 200, 'unique_words': 80}
+            for i in range(rows)
+        ])
+
+
+def reader(engine, stop, stats):
+    query = select(WordCloud.__table__.c.id, WordCloud.__table__.c.title).order_by(
+        WordCloud.__table__.c.created_at.desc(), WordCloud.__table__.c.id.desc()).limit(20)
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                connection.execute(query).fetchall()
+            stats['latencies'].append(time.perf_counter() - start)
+        except OperationalError:
+            stats['errors'] += 1
+
+
+def writer(engine, stop, stats):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with engine.begin() as connection:
+                connection.execute(Analytics.__table__.insert(), [
+                    {'action': 'generate_wordcloud', 'feature_used': 'words', 'processing_time': 0.5,
+                     'text_length': 1000, 'is_error': False, 'timestamp': datetime.utcnow()}
+                    for _ in range(50)
+                ])
+                connection.execute(WordCloud.__table__.insert().values(
+                    user_id=1, title='bench', created_at=datetime.utcnow(), is_public=True))
+            stats['latencies'].append(time.perf_counter() - start)
+        except OperationalError:
+            stats['errors'] += 1
+
+
+def run(tuned, threads, seconds):
+    directory = tempfile.mkdtemp(prefix='wordcloud-bench-')
+    engine = make_engine(os.path.join(directory, 'bench.db'), tuned, threads)
+    seed(engine, 2000)
+
+    stop = threading.Event()
+    readers = [{'latencies': [], 'errors': 0} for _ in range(threads)]
+    writers = [{'latencies': [], 'errors': 0} for _ in range(2)]
+    workers = [threading.Thread(target=reader, args=(engine, stop, s)) for s in readers]
+    workers += [threading.Thread(target=writer, args=(engine, stop, s)) for s in writers]
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    engine.dispose()
+
+    def summarise(group):
+        latencies = sorted(l for s in group for l in s['latencies'])
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+        return len(latencies) / seconds, p95, sum(s['errors'] for s in group)
+
+    return summarise(readers), summarise(writers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=4, help='Reader threads')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Duration per profile')
+    args = parser.parse_args()
+
+    print(f"{'profile':<10}{'reads/s':>10}{'read p95 ms':>14}{'read errs':>11}"
+          f"{'writes/s':>10}{'write p95 ms':>14}{'write errs':>12}")
+    for name, tuned in (('default', False), ('tuned', True)):
+        (reads, read_p95, read_errors), (writes, write_p95, write_errors) = run(tuned, args.threads, args.seconds)
+        print(f"{name:<10}{reads:>10.0f}{read_p95:>14.2f}{read_errors:>11}"
+              f"{writes:>10.0f}{write_p95:>14.2f}{write_errors:>12}")
+
+
+if __name__ == '__main__':
+    main()
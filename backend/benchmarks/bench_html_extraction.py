@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+HTML text extraction: the shared lxml extractor versus the old BeautifulSoup path.
+
+Each page of the corpus has an article surrounded by typical page furniture
+(header, navigation, cookie banner, sidebar, related links, footer). Besides
+the time per page, quality is reported as content recall (share of article
+words that survive) and boilerplate leakage (share of furniture words that
+end up in the text). Saved pages passed with --pages are timed too; having
+no ground truth, only their extracted length is shown.
+
+Needs the benchmark requirements (pip install -r benchmarks/requirements.txt).
+
+Usage:
+    python benchmarks/bench_html_extraction.py [--pages DIR] [--repeat 5]
+"""
+
+import argparse
+import glob
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from utils.html_extractor import extract_html  # noqa: E402
+
+# Paragraphs in the article of each synthetic page
+PAGE_SIZES = {'small': 5, 'medium': 50, 'large': 500}
+
+
+def vocabulary(prefix, size, rng):
+    """Distinct made-up words, so content and furniture never share one."""
+    return [prefix + ''.join(rng.choice(string.ascii_lowercase) for _ in range(6)) for _ in range(size)]
+
+
+def synthetic_page(paragraphs, seed=0):
+    """Build a page and return (html bytes, content words, boilerplate words)."""
+    rng = random.Random(seed)
+    content = vocabulary('c', 400, rng)
+    furniture = vocabulary('b', 200, rng)
+
+    def sentence(words, length):
+        return ' '.join(rng.choice(words) for _ in range(length))
+
+    def links(count):
+        return ''.join(f'<li><a href="/{i}">{sentence(furniture, 2)}</a></li>' for i in range(count))
+
+    article = ''.join(
+        f'<p>{sentence(content, 40)} <a href="/ref">{sentence(content, 2)}</a> {sentence(content, 20)}</p>'
+        + (f'<h2>{sentence(content, 4)}</h2>' if i % 5 == 4 else '')
+        for i in range(paragraphs)
+    )
+    html = f'''<!DOCTYPE html><html><head><title>{sentence(content, 5)}</title>
+<style>body {{ font-family: sans-serif; }}</style><script>var analytics = {{}};</script></head>
+<body>
+<header class="site-header"><a href="/">{sentence(furniture, 2)}</a><ul class="menu">{links(8)}</ul></header>
+<nav class="breadcrumbs"><a href="/">{sentence(furniture, 1)}</a> / <a href="/blog">{sentence(furniture, 1)}</a></nav>
+<div class="cookie-banner">{sentence(furniture, 20)}<button>{sentence(furniture, 1)}</button></div>
+<div class="layout">
+<main><article><h1>{sentence(content, 6)}</h1>{article}</article></main>
+<aside class="sidebar"><h3>{sentence(furniture, 2)}</h3><ul>{links(15)}</ul></aside>
+</div>
+<div class="related-posts"><ul>{links(10)}</ul></div>
+<footer>{sentence(furniture, 30)}<ul>{links(6)}</ul></footer>
+<script>document.write("{sentence(furniture, 5)}");</script>
+</body></html>'''
+    return html.encode('utf-8'), set(content), set(furniture)
+
+
+def extract_beautifulsoup(content):
+    """The extraction FileProcessor used before the shared extractor."""
+    soup = BeautifulSoup(content, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+
+EXTRACTORS = {
+    'beautifulsoup (old)': extract_beautifulsoup,
+    'lxml, full text': lambda content: extract_html(content, main_content=False)['text'],
+    'lxml, main content': lambda content: extract_html(content)['text']
+}
+
+
+def timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0, result
+
+
+def quality(text, content_words, boilerplate_words):
+    words = set(text.split())
+    recall = len(words & content_words) / float(len(content_words))
+    leakage = len(words & boilerplate_words) / float(len(boilerplate_words))
+    return recall, leakage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pages', help='Directory of saved .html pages to time as well')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'page':<16}{'extractor':<22}{'ms':>10}{'MB/s':>8}{'recall':>9}{'leakage':>9}")
+    for label, paragraphs in PAGE_SIZES.items():
+        html, content_words, boilerplate_words = synthetic_page(paragraphs)
+        # Only words that actually made it into the page count
+        text_words = set(extract_beautifulsoup(html).split())
+        content_words &= text_words
+        boilerplate_words &= text_words
+        name = f'{label} {len(html) // 1024}KB'
+        for extractor, func in EXTRACTORS.items():
+            ms, text = timed(lambda: func(html), args.repeat)
+            recall, leakage = quality(text, content_words, boilerplate_words)
+            print(f"{name:<16}{extractor:<22}{ms:>10.2f}{len(html) / ms / 1000.0:>8.1f}"
+                  f"{recall:>9.1%}{leakage:>9.1%}")
+
+    if args.pages:
+        print(f"\n{'saved page':<32}{'extractor':<22}{'ms':>10}{'chars':>10}")
+        for path in sorted(glob.glob(os.path.join(args.pages, '*.htm*'))):
+            with open(path, 'rb') as file:
+                html = file.read()
+            for extractor, func in EXTRACTORS.items():
+                ms, text = timed(lambda: func(html), args.repeat)
+                print(f"{os.path.basename(path)[:30]:<32}{extractor:<22}{ms:>10.2f}{len(text):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Logging in the frequency-filter hot loop: per-word prints versus level-gated,
+sampled structured logging.
+
+The old filter printed two lines per word to stdout. The new one logs a
+sampled per-word decision only when debug is enabled, through the queue
+handler, so request threads never wait on the stream. Each variant filters
+the same frequency maps; output goes to /dev/null so only the cost of
+producing it is measured.
+
+Usage:
+    python benchmarks/bench_logging.py [--words 1000 10000 100000] [--repeat 5]
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.advanced_processor import AdvancedWordCloudProcessor  # noqa: E402
+from utils.structured_logging import configure_logging  # noqa: E402
+
+
+def frequency_map(words, seed=0):
+    rng = random.Random(seed)
+    return {f'word{i}': rng.randint(1, 50) for i in range(words)}
+
+
+def filter_with_prints(word_freq, min_frequency, max_frequency):
+    """The loop _process_text ran before: conversions and prints per word."""
+    print(f"DEBUG: Applying frequency filters: min={min_frequency}, max={max_frequency}")
+    filtered_word_freq = {}
+    for word, freq in word_freq.items():
+        include_word = True
+        if min_frequency is not None:
+            min_freq_value = int(min_frequency)
+            print(f"DEBUG: Checking word '{word}' with freq {freq} against min_freq {min_freq_value}")
+            if freq < min_freq_value:
+                include_word = False
+        if include_word and max_frequency is not None:
+            max_freq_value = int(max_frequency)
+            print(f"DEBUG: Checking word '{word}' with freq {freq} against max_freq {max_freq_value}")
+            if freq > max_freq_value:
+                include_word = False
+        if include_word:
+            filtered_word_freq[word] = freq
+    print(f"DEBUG: After filtering, {len(filtered_word_freq)} words remain")
+    return filtered_word_freq
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--words', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    processor = AdvancedWordCloudProcessor.__new__(AdvancedWordCloudProcessor)
+    devnull = open(os.devnull, 'w')
+    # The listener writes to whatever sys.stderr is when logging is configured
+    with contextlib.redirect_stderr(devnull):
+        handler = configure_logging('INFO')
+    logger = logging.getLogger('utils.advanced_processor')
+
+    def prints(word_freq):
+        with contextlib.redirect_stdout(devnull):
+            filter_with_prints(word_freq, 2, 40)
+
+    def logged(level):
+        def run(word_freq):
+            logger.setLevel(level)
+            processor._filter_frequencies(word_freq, 2, 40)
+        return run
+
+    variants = {
+        'print per word (old)': prints,
+        'logging, INFO': logged(logging.INFO),
+        'logging, DEBUG sampled': logged(logging.DEBUG)
+    }
+
+    print(f"{'words':>8}  {'variant':<24}{'ms':>10}{'ns/word':>10}")
+    for words in args.words:
+        word_freq = frequency_map(words)
+        for name, func in variants.items():
+            ms = timed(lambda: func(word_freq), args.repeat)
+            print(f"{words:>8}  {name:<24}{ms:>10.2f}{ms * 1e6 / words:>10.0f}")
+    logger.setLevel(logging.NOTSET)
+    print(f"\nrecords dropped by the queue handler: {handler.dropped}")
+
+
+if __name__ == '__main__':
+    main()
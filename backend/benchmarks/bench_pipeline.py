@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Generation pipeline benchmark suite with stored baselines.
+
+Every stage of a generate request is timed on fixed corpora from 1 KB to
+1 MB: text processing (_process_text), word context, sentiment, statistics,
+layout and PNG encoding, plus mask creation for each shape and every
+FileProcessor extractor on files built from the same text.
+
+Corpora are reproducible: "synthetic" is seeded Zipf-distributed prose over
+the vocabulary of the repository's sample text, "sample" is that text
+itself repeated. Further plain-text corpora, e.g. public-domain books, can be
+added with --corpus; each is cut or repeated to every size.
+
+Results are best-of-N milliseconds. --save writes them as the baseline;
+otherwise, when a baseline exists, each result is compared with it and the
+script exits with status 1 if any is slower by more than --threshold
+(and by at least --min-delta ms, so sub-millisecond jitter is ignored).
+Baselines are only comparable on the same machine and dependency versions,
+which are recorded with them.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 1 10 100 1024] [--stages ...]
+        [--corpus FILE ...] [--repeat 5] [--save] [--baseline PATH] [--threshold 0.15]
+        [--min-delta 1.0]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib  # noqa: E402
+matplotlib.use('Agg')
+from matplotlib.backends.backend_pdf import PdfPages  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from utils.advanced_processor import AdvancedWordCloudProcessor  # noqa: E402
+from utils.file_processor import FileProcessor  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_TEXT = os.path.join(os.path.dirname(os.path.dirname(BENCH_DIR)), 'sample_text.txt')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baselines', 'pipeline.json')
+
+# Corpus sizes in KB
+DEFAULT_SIZES = [1, 10, 100, 1024]
+
+MASK_SHAPES = ['none', 'circle', 'diamond', 'star', 'triangle', 'cloud', 'heart']
+
+# Rendering a PDF is slow, so PDF fixtures stop at this size (KB)
+MAX_PDF_KB = 100
+
+# Lines of text per PDF page
+PDF_LINES_PER_PAGE = 50
+
+
+def sample_text():
+    with open(SAMPLE_TEXT, encoding='utf-8') as file:
+        return file.read()
+
+
+def synthetic_text(size, seed=0):
+    """Seeded prose whose word frequencies follow Zipf's law."""
+    rng = random.Random(seed)
+    vocabulary = sorted(set(re.findall(r'[a-z]+', sample_text().lower())))
+    rng.shuffle(vocabulary)
+    weights = [1.0 / rank for rank in range(1, len(vocabulary) + 1)]
+    sentences = []
+    length = 0
+    while length < size:
+        words = rng.choices(vocabulary, weights, k=rng.randint(6, 24))
+        sentence = ' '.join(words).capitalize() + rng.choice('...!?')
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return ' '.join(sentences)[:size]
+
+
+def fit_to_size(text, size):
+    """Repeat or cut text to `size` characters, ending on a word boundary."""
+    text = ' '.join(text.split())
+    repeated = (text + ' ') * (size // max(len(text), 1) + 1)
+    return repeated[:size].rsplit(' ', 1)[0]
+
+
+def corpora(sizes, extra_files):
+    """{(corpus name, size KB): text} for every corpus and size."""
+    sources = {'sample': sample_text()}
+    for path in extra_files:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            sources[os.path.splitext(os.path.basename(path))[0]] = file.read()
+
+    texts = {}
+    for kb in sizes:
+        texts[('synthetic', kb)] = synthetic_text(kb * 1024)
+        for name, source in sources.items():
+            texts[(name, kb)] = fit_to_size(source, kb * 1024)
+    return texts
+
+
+def lines_of(text, width=90):
+    words = text.split()
+    lines, line = [], []
+    for word in words:
+        if sum(len(w) + 1 for w in line) + len(word) > width:
+            lines.append(' '.join(line))
+            line = []
+        line.append(word)
+    if line:
+        lines.append(' '.join(line))
+    return lines
+
+
+def write_fixtures(text, kb, directory):
+    """Write the text as each supported file type; {extension: path or None if unavailable}."""
+    lines = lines_of(text)
+    base = os.path.join(directory, f'corpus_{kb}kb')
+    fixtures = {}
+
+    with open(base + '.txt', 'w', encoding='utf-8') as file:
+        file.write(text)
+    fixtures['.txt'] = base + '.txt'
+
+    with open(base + '.html', 'w', encoding='utf-8') as file:
+        file.write('<html><head><title>Benchmark corpus</title></head><body><article>')
+        file.write(''.join(f'<p>{line}</p>' for line in lines))
+        file.write('</article></body></html>')
+    fixtures['.html'] = base + '.html'
+
+    from docx import Document
+    document = Document()
+    for line in lines:
+        document.add_paragraph(line)
+    document.save(base + '.docx')
+    fixtures['.docx'] = base + '.docx'
+
+    frame = pd.DataFrame({'id': range(len(lines)), 'text': lines})
+    frame.to_csv(base + '.csv', index=False)
+    fixtures['.csv'] = base + '.csv'
+    try:
+        frame.to_excel(base + '.xlsx', index=False)
+        fixtures['.xlsx'] = base + '.xlsx'
+    except ImportError:
+        fixtures['.xlsx'] = None
+
+    if kb <= MAX_PDF_KB:
+        with PdfPages(base + '.pdf') as pdf:
+            for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+                fig = plt.figure(figsize=(8.5, 11))
+                for row, line in enumerate(lines[start:start + PDF_LINES_PER_PAGE]):
+                    fig.text(0.05, 0.97 - row * 0.019, line, fontsize=7, family='monospace')
+                pdf.savefig(fig)
+                plt.close(fig)
+        fixtures['.pdf'] = base + '.pdf'
+    else:
+        fixtures['.pdf'] = None
+    return fixtures
+
+
+def timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0, result
+
+
+TEXT_STAGES = ['process_text', 'word_context', 'sentiment', 'statistics', 'layout', 'encode']
+
+
+def text_stages(processor, text, selected):
+    """(stage, callable) pairs for one corpus, sharing the processed text between stages."""
+    wordcloud_processor = processor.wordcloud_processor
+    _, tokens, word_freq, sentences = processor._process_text(text)
+    state = {}
+
+    def layout():
+        state['wc'] = wordcloud_processor.compute_layout(word_freq, random_state=42)
+        return state['wc']
+
+    if 'encode' in selected and 'layout' not in selected:
+        layout()
+
+    return [
+        ('process_text', lambda: processor._process_text(text)),
+        ('word_context', lambda: processor._extract_word_context(word_freq, sentences)),
+        ('sentiment', lambda: processor._analyze_sentiment(text)),
+        ('statistics', lambda: processor._calculate_statistics(text, tokens, word_freq)),
+        ('layout', layout),
+        ('encode', lambda: wordcloud_processor.image_to_png(state['wc']))
+    ]
+
+
+def run(args):
+    """Time every selected stage; {'stage/corpus/size': ms}."""
+    processor = AdvancedWordCloudProcessor()
+    file_processor = FileProcessor()
+    results = {}
+
+    def record(key, ms):
+        results[key] = round(ms, 3)
+        print(f"{key:<44}{ms:>12.2f}", flush=True)
+
+    selected = set(args.stages) if args.stages else set(TEXT_STAGES + ['mask', 'extract'])
+    for (corpus, kb), text in corpora(args.sizes, args.corpus).items():
+        if selected.isdisjoint(TEXT_STAGES):
+            break
+        for stage, func in text_stages(processor, text, selected):
+            if stage in selected:
+                record(f'{stage}/{corpus}/{kb}kb', timed(func, args.repeat)[0])
+
+    if 'mask' in selected:
+        for shape in MASK_SHAPES:
+            record(f'mask/{shape}', timed(lambda: processor.wordcloud_processor.create_mask(shape), args.repeat)[0])
+
+    if 'extract' in selected:
+        directory = tempfile.mkdtemp(prefix='bench_pipeline_')
+        try:
+            for kb in args.sizes:
+                fixtures = write_fixtures(synthetic_text(kb * 1024), kb, directory)
+                for ext, path in fixtures.items():
+                    if path is None:
+                        print(f"{f'extract{ext}/synthetic/{kb}kb':<44}{'skipped':>12}")
+                        continue
+                    ms, result = timed(lambda: file_processor.extract_text_from_file(path), args.repeat)
+                    if not result['success']:
+                        print(f"{f'extract{ext}/synthetic/{kb}kb':<44}{'failed':>12}  {result['error']}")
+                        continue
+                    record(f'extract{ext}/synthetic/{kb}kb', ms)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def environment():
+    import numpy
+    import wordcloud
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'numpy': numpy.__version__,
+        'pandas': pd.__version__,
+        'wordcloud': wordcloud.__version__
+    }
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Print the change against the baseline; return the regressed keys."""
+    if baseline['environment'] != environment():
+        print("\nwarning: baseline was recorded in a different environment:")
+        print(json.dumps(baseline['environment'], indent=2))
+
+    print(f"\n{'benchmark':<44}{'baseline':>12}{'now':>12}{'change':>10}")
+    regressions = []
+    for key, ms in results.items():
+        before = baseline['results'].get(key)
+        if before is None:
+            print(f"{key:<44}{'-':>12}{ms:>12.2f}{'new':>10}")
+            continue
+        change = (ms - before) / before if before else 0.0
+        flag = ''
+        if change > threshold and ms - before > min_delta:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        print(f"{key:<44}{before:>12.2f}{ms:>12.2f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Corpus sizes in KB')
+    parser.add_argument('--stages', nargs='+',
+                        help='Stages to run: process_text word_context sentiment statistics layout encode mask extract')
+    parser.add_argument('--corpus', nargs='+', default=[], help='Extra plain-text corpora')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save', action='store_true', help='Store the results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Slowdown reported as a regression')
+    parser.add_argument('--min-delta', type=float, default=1.0,
+                        help='Slowdowns smaller than this many ms are noise, never a regression')
+    args = parser.parse_args()
+
+    print(f"{'benchmark':<44}{'ms':>12}")
+    results = run(args)
+
+    if args.save:
+        # Merge, so a partial run only replaces the benchmarks it ran
+        stored = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                stored = json.load(file)['results']
+        stored.update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as file:
+            json.dump({
+                'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'environment': environment(),
+                'repeat': args.repeat,
+                'results': dict(sorted(stored.items()))
+            }, file, indent=2)
+        print(f"\nbaseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+            return 1
+        print("\nno regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Recolor/re-export from a stored layout versus a full generate.
+
+"generate" places the words (generate_from_frequencies) and renders a PNG;
+"recolor" unpacks the stored layout, assigns a new colormap and renders the
+same PNG without placement. High-DPI re-exports are timed as well.
+
+Usage:
+    python benchmarks/bench_recolor.py [--words 200] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wordcloud import WordCloud  # noqa: E402
+
+from utils.cloud_layout import (  # noqa: E402
+    layout_from_wordcloud, pack_layout, unpack_layout, recolor_layout,
+    render_layout_png, render_layout_svg, scale_for_dpi
+)
+
+WIDTH, HEIGHT = 800, 600
+
+
+def frequency_map(size, seed=0):
+    rng = random.Random(seed)
+    words = {''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10))) for _ in range(size)}
+    return {word: max(1, int(500 / rank)) for rank, word in enumerate(sorted(words), start=1)}
+
+
+def timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--words', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    frequencies = frequency_map(args.words * 2)
+
+    def generate():
+        wc = WordCloud(width=WIDTH, height=HEIGHT, background_color='#ffffff', colormap='viridis',
+                       max_words=args.words, random_state=1).generate_from_frequencies(frequencies)
+        return wc, render_layout_png(layout_from_wordcloud(wc), WIDTH, HEIGHT, '#ffffff')
+
+    generate_ms, (wc, _) = timed(generate, args.repeat)
+    packed = pack_layout(layout_from_wordcloud(wc), WIDTH, HEIGHT)
+
+    def recolor(scale=1.0):
+        layout, width, height = unpack_layout(packed)
+        layout = recolor_layout(layout, width, height, 'plasma', random_state=2)
+        return render_layout_png(layout, width, height, '#000000', scale)
+
+    recolor_ms, _ = timed(recolor, args.repeat)
+    print300_ms, _ = timed(lambda: recolor(scale_for_dpi(300)), args.repeat)
+    svg_ms, _ = timed(lambda: render_layout_svg(unpack_layout(packed)[0], WIDTH, HEIGHT, '#ffffff'), args.repeat)
+
+    print(f"{len(wc.layout_)} words placed, packed layout {len(packed)} bytes")
+    print(f"{'full generate (placement + PNG)':<36}{generate_ms:>10.1f} ms")
+    print(f"{'recolor from layout (PNG)':<36}{recolor_ms:>10.1f} ms  ({generate_ms / recolor_ms:.1f}x faster)")
+    print(f"{'recolor + 300 dpi PNG':<36}{print300_ms:>10.1f} ms")
+    print(f"{'SVG from layout':<36}{svg_ms:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Store word cloud images in the blob store
+
+Revision ID: 3a0200ad3476
+Revises: ad36b1eeaff7
+Create Date: 2026-10-19 09:12:31.482913
+
+"""
+import base64
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+from utils.blob_store import LocalBlobStore
+
+
+# revision identifiers, used by Alembic.
+revision = '3a0200ad3476'
+down_revision = 'ad36b1eeaff7'
+branch_labels = None
+depends_on = None
+
+
+word_cloud = sa.table(
+    'word_cloud',
+    sa.column('id', sa.Integer),
+    sa.column('image_hash', sa.String),
+    sa.column('image_base64', sa.Text)
+)
+
+
+def upgrade():
+    with op.batch_alter_table('word_cloud', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_word_cloud_image_hash'), ['image_hash'], unique=False)
+
+    # Move inline base64 images into the blob store, one row at a time
+    blob_store = LocalBlobStore(current_app.config['BLOB_STORAGE_PATH'])
+    connection = op.get_bind()
+    ids = [row.id for row in connection.execute(
+        sa.select(word_cloud.c.id).where(word_cloud.c.image_base64.isnot(None))
+    )]
+    for wordcloud_id in ids:
+        image_base64 = connection.execute(
+            sa.select(word_cloud.c.image_base64).where(word_cloud.c.id == wordcloud_id)
+        ).scalar()
+        image_hash = blob_store.put(base64.b64decode(image_base64))
+        connection.execute(
+            word_cloud.update()
+            .where(word_cloud.c.id == wordcloud_id)
+            .values(image_hash=image_hash, image_base64=None)
+        )
+
+
+def downgrade():
+    # Inline the images again before dropping the hash column
+    blob_store = LocalBlobStore(current_app.config['BLOB_STORAGE_PATH'])
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(word_cloud.c.id, word_cloud.c.image_hash).where(word_cloud.c.image_hash.isnot(None))
+    ).fetchall()
+    for row in rows:
+        image_data = blob_store.get(row.image_hash)
+        if image_data is None:
+            continue
+        connection.execute(
+            word_cloud.update()
+            .where(word_cloud.c.id == row.id)
+            .values(image_base64=base64.b64encode(image_data).decode('utf-8'))
+        )
+
+    with op.batch_alter_table('word_cloud', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_word_cloud_image_hash'))
+        batch_op.drop_column('image_hash')
@@ -0,0 +1,133 @@
+"""Add hourly and daily analytics rollup tables
+
+Revision ID: 5d1e7b3f9a40
+Revises: 8c2566f2b692
+Create Date: 2026-10-19 11:26:52.904417
+
+"""
+from bisect import bisect_left
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1e7b3f9a40'
+down_revision = '8c2566f2b692'
+branch_labels = None
+depends_on = None
+
+
+# Upper bounds (seconds) of the processing-time buckets, frozen from
+# utils.analytics_rollup.LATENCY_BUCKETS; anything slower falls in the
+# open-ended last bucket
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 60.0]
+
+# Analytics rows read per query during the backfill
+BACKFILL_CHUNK_SIZE = 5000
+
+ROLLUP_TRUNCATE = {
+    'analytics_hourly_rollup': lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    'analytics_daily_rollup': lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+analytics = sa.table('analytics',
+    sa.column('id', sa.Integer()),
+    sa.column('timestamp', sa.DateTime()),
+    sa.column('action', sa.String()),
+    sa.column('feature_used', sa.String()),
+    sa.column('processing_time', sa.Float()),
+    sa.column('is_error', sa.Boolean()),
+    sa.column('text_length', sa.Integer()),
+)
+
+
+def _rollup_table(name):
+    return sa.table(name,
+        sa.column('bucket_start', sa.DateTime()),
+        sa.column('action', sa.String()),
+        sa.column('feature_used', sa.String()),
+        sa.column('latency_bucket', sa.Integer()),
+        sa.column('event_count', sa.Integer()),
+        sa.column('error_count', sa.Integer()),
+        sa.column('processing_time_total', sa.Float()),
+        sa.column('text_length_total', sa.BigInteger()),
+    )
+
+
+def _backfill(bind):
+    """
+    Aggregate every existing analytics row into the rollup tables.
+
+    Rows are read in id order, a chunk at a time, and summed in Python the
+    way the app's incremental rollups are, so the backfill runs on any
+    dialect. Bucket starts are bound as DateTime values, which keeps them in
+    the format later ORM upserts compare against.
+    """
+    totals = {name: {} for name in ROLLUP_TRUNCATE}
+    last_id = None
+    while True:
+        query = sa.select(analytics).order_by(analytics.c.id).limit(BACKFILL_CHUNK_SIZE)
+        if last_id is not None:
+            query = query.where(analytics.c.id > last_id)
+        rows = bind.execute(query).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        for row in rows:
+            timestamp = row.timestamp or datetime.utcnow()
+            processing_time = row.processing_time or 0.0
+            latency_bucket = bisect_left(LATENCY_BUCKETS, processing_time)
+            for name, truncate in ROLLUP_TRUNCATE.items():
+                key = (truncate(timestamp), row.action or '', row.feature_used or '', latency_bucket)
+                sums = totals[name].setdefault(key, [0, 0, 0.0, 0])
+                sums[0] += 1
+                sums[1] += 1 if row.is_error else 0
+                sums[2] += processing_time
+                sums[3] += row.text_length or 0
+
+    for name, buckets in totals.items():
+        if buckets:
+            op.bulk_insert(_rollup_table(name), [
+                {
+                    'bucket_start': bucket_start, 'action': action, 'feature_used': feature_used,
+                    'latency_bucket': latency_bucket, 'event_count': sums[0], 'error_count': sums[1],
+                    'processing_time_total': sums[2], 'text_length_total': sums[3],
+                }
+                for (bucket_start, action, feature_used, latency_bucket), sums in buckets.items()
+            ])
+
+
+def _create_rollup_table(name):
+    op.create_table(name,
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('action', sa.String(length=50), nullable=False),
+    sa.Column('feature_used', sa.String(length=50), nullable=False),
+    sa.Column('latency_bucket', sa.Integer(), nullable=False),
+    sa.Column('event_count', sa.Integer(), nullable=False),
+    sa.Column('error_count', sa.Integer(), nullable=False),
+    sa.Column('processing_time_total', sa.Float(), nullable=False),
+    sa.Column('text_length_total', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('bucket_start', 'action', 'feature_used', 'latency_bucket', name=f'uq_{name}_key')
+    )
+    with op.batch_alter_table(name, schema=None) as batch_op:
+        batch_op.create_index(batch_op.f(f'ix_{name}_bucket_start'), ['bucket_start'], unique=False)
+
+
+def upgrade():
+    _create_rollup_table('analytics_hourly_rollup')
+    _create_rollup_table('analytics_daily_rollup')
+
+    # Backfill the rollups from existing analytics rows
+    _backfill(op.get_bind())
+
+
+def downgrade():
+    for name in ('analytics_daily_rollup', 'analytics_hourly_rollup'):
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{name}_bucket_start'))
+        op.drop_table(name)
@@ -0,0 +1,67 @@
+"""Store structured word cloud columns with the column codec
+
+Revision ID: b7f3c9d21e85
+Revises: 5d1e7b3f9a40
+Create Date: 2026-10-19 12:48:09.117352
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+from utils.column_codec import ColumnCodec, codec_from_name
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7f3c9d21e85'
+down_revision = '5d1e7b3f9a40'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = ('settings', 'word_frequencies', 'sentiment_analysis', 'topic_analysis', 'readability_metrics', 'tags')
+
+word_cloud = sa.table(
+    'word_cloud',
+    sa.column('id', sa.Integer),
+    *(sa.column(name, sa.LargeBinary) for name in COLUMNS)
+)
+
+
+def _rewrite_rows(convert):
+    """Rewrite every non-null structured value, a chunk of rows at a time."""
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(word_cloud).where(word_cloud.c.id > last_id).order_by(word_cloud.c.id).limit(500)
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            values = {name: convert(getattr(row, name)) for name in COLUMNS if getattr(row, name) is not None}
+            if values:
+                connection.execute(word_cloud.update().where(word_cloud.c.id == row.id).values(**values))
+        last_id = rows[-1].id
+
+
+def upgrade():
+    with op.batch_alter_table('word_cloud', schema=None) as batch_op:
+        for name in COLUMNS:
+            batch_op.alter_column(name, existing_type=sa.Text(), type_=sa.LargeBinary(),
+                                  postgresql_using=f"convert_to({name}, 'UTF8')")
+
+    # Re-encode legacy JSON text; rows that already carry a codec header are left alone
+    codec = codec_from_name(current_app.config['COLUMN_CODEC'])
+    _rewrite_rows(lambda value: value if ColumnCodec.is_encoded(value) else codec.encode(ColumnCodec.decode(value)))
+
+
+def downgrade():
+    _rewrite_rows(lambda value: json.dumps(ColumnCodec.decode(value)).encode('utf-8'))
+
+    with op.batch_alter_table('word_cloud', schema=None) as batch_op:
+        for name in COLUMNS:
+            batch_op.alter_column(name, existing_type=sa.LargeBinary(), type_=sa.Text(),
+                                  postgresql_using=f"convert_from({name}, 'UTF8')")
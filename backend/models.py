@@ -2,7 +2,8 @@ from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-import json
+from utils.column_codec import EncodedJSON
+from utils.cloud_layout import pack_layout, unpack_layout
 
 db = SQLAlchemy()
 
@@ -42,20 +43,31 @@ class User(UserMixin, db.Model):
         }
 
 class WordCloud(db.Model):
-    """WordCloud model for storing generated word clouds."""
+    """WordCloud model for storing generated word clouds.
+    
+    Heavy columns are deferred in groups ('text', 'analytics', 'image', 'layout') and
+    only loaded when accessed, so listing and count queries stay cheap.
+    """
+    __table_args__ = (
+        # Keyset pagination on (created_at, id), globally, per user and for public clouds
+        db.Index('ix_word_cloud_created_at_id', 'created_at', 'id'),
+        db.Index('ix_word_cloud_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_word_cloud_is_public_created_at_id', 'is_public', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
     # Text and processing data
-    original_text = db.Column(db.Text)
-    processed_text = db.Column(db.Text)
+    original_text = db.deferred(db.Column(db.Text), group='text')
+    processed_text = db.deferred(db.Column(db.Text), group='text')
     text_length = db.Column(db.Integer)
     word_count = db.Column(db.Integer)
     unique_words = db.Column(db.Integer)
     
     # Word cloud settings
-    settings = db.Column(db.Text)  # JSON string of settings
+    settings = db.Column(EncodedJSON)  # Settings dictionary
     mask_shape = db.Column(db.String(50))
     color_scheme = db.Column(db.String(50))
     background_color = db.Column(db.String(20))
@@ -63,55 +75,107 @@ class WordCloud(db.Model):
     height = db.Column(db.Integer)
     
     # Generated data
-    word_frequencies = db.Column(db.Text)  # JSON string
-    sentiment_analysis = db.Column(db.Text)  # JSON string
-    topic_analysis = db.Column(db.Text)  # JSON string
-    readability_metrics = db.Column(db.Text)  # JSON string
+    # Structured values are stored with the configured column codec (see utils.column_codec)
+    word_frequencies = db.deferred(db.Column(EncodedJSON), group='analytics')
+    sentiment_analysis = db.deferred(db.Column(EncodedJSON), group='analytics')
+    topic_analysis = db.deferred(db.Column(EncodedJSON), group='analytics')
+    readability_metrics = db.deferred(db.Column(EncodedJSON), group='analytics')
     
     # File storage
     image_path = db.Column(db.String(255))
-    image_base64 = db.Column(db.Text)  # For immediate display
+    image_hash = db.Column(db.String(64), index=True)  # Content hash of the PNG in the blob store
+    image_base64 = db.deferred(db.Column(db.Text), group='image')  # Legacy inline image, moved to the blob store on access
+    layout = db.deferred(db.Column(db.LargeBinary), group='layout')  # Packed word placement (see utils.cloud_layout)
     
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_public = db.Column(db.Boolean, default=False)
-    tags = db.Column(db.Text)  # JSON string of tags
+    tags = db.Column(EncodedJSON)  # List of tags
     
     def get_settings(self):
         """Get settings as dictionary."""
-        return json.loads(self.settings) if self.settings else {}
+        return self.settings or {}
     
     def set_settings(self, settings_dict):
         """Set settings from dictionary."""
-        self.settings = json.dumps(settings_dict)
+        self.settings = settings_dict
     
     def get_word_frequencies(self):
         """Get word frequencies as dictionary."""
-        return json.loads(self.word_frequencies) if self.word_frequencies else {}
+        return self.word_frequencies or {}
     
     def set_word_frequencies(self, frequencies_dict):
         """Set word frequencies from dictionary."""
-        self.word_frequencies = json.dumps(frequencies_dict)
+        self.word_frequencies = frequencies_dict
     
     def get_sentiment_analysis(self):
         """Get sentiment analysis as dictionary."""
-        return json.loads(self.sentiment_analysis) if self.sentiment_analysis else {}
+        return self.sentiment_analysis or {}
     
     def set_sentiment_analysis(self, sentiment_dict):
         """Set sentiment analysis from dictionary."""
-        self.sentiment_analysis = json.dumps(sentiment_dict)
+        self.sentiment_analysis = sentiment_dict
     
     def get_tags(self):
         """Get tags as list."""
-        return json.loads(self.tags) if self.tags else []
+        return self.tags or []
     
     def set_tags(self, tags_list):
         """Set tags from list."""
-        self.tags = json.dumps(tags_list)
+        self.tags = tags_list
     
-    def to_dict(self):
+    def get_layout(self):
+        """Get the stored word placement as (layout, width, height), or None."""
+        return unpack_layout(self.layout) if self.layout else None
+    
+    def set_layout(self, layout, width, height):
+        """Store the word placement in packed form."""
+        self.layout = pack_layout(layout, width, height)
+    
+    def set_image(self, image_bytes, blob_store):
+        """Store PNG bytes in the blob store and keep only the hash."""
+        self.image_hash = blob_store.put(image_bytes)
+        self.image_base64 = None
+    
+    # Columns needed by listing screens; everything else stays unloaded
+    SUMMARY_COLUMNS = (
+        'id', 'title', 'user_id', 'text_length', 'word_count', 'unique_words',
+        'mask_shape', 'color_scheme', 'image_hash', 'created_at', 'is_public', 'tags'
+    )
+    
+    @classmethod
+    def summary_query(cls):
+        """Query that loads only the summary columns."""
+        return cls.query.options(db.load_only(*(getattr(cls, name) for name in cls.SUMMARY_COLUMNS)))
+    
+    def to_summary_dict(self):
+        """Lightweight representation for listings."""
         return {
+            'id': self.id,
+            'title': self.title,
+            'user_id': self.user_id,
+            'text_length': self.text_length,
+            'word_count': self.word_count,
+            'unique_words': self.unique_words,
+            'mask_shape': self.mask_shape,
+            'color_scheme': self.color_scheme,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'is_public': self.is_public,
+            'tags': self.get_tags(),
+            'image_url': f'/api/export/{self.id}?format=png' if self.image_hash else None
+        }
+    
+    def to_dict(self, include_text=False, include_image=True, include_frequencies=True):
+        """
+        Full representation of the word cloud.
+        
+        Args:
+            include_text: Add the original text (loads the deferred 'text' group)
+            include_image: Add the image hash and URL
+            include_frequencies: Add the word frequency map
+        """
+        data = {
             'id': self.id,
             'title': self.title,
             'user_id': self.user_id,
@@ -124,14 +188,20 @@ class WordCloud(db.Model):
             'width': self.width,
             'height': self.height,
             'settings': self.get_settings(),
-            'word_frequencies': self.get_word_frequencies(),
             'sentiment_analysis': self.get_sentiment_analysis(),
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'is_public': self.is_public,
-            'tags': self.get_tags(),
-            'image_base64': self.image_base64
+            'tags': self.get_tags()
         }
+        if include_frequencies:
+            data['word_frequencies'] = self.get_word_frequencies()
+        if include_text:
+            data['original_text'] = self.original_text
+        if include_image:
+            data['image_hash'] = self.image_hash
+            data['image_url'] = f'/api/export/{self.id}?format=png'
+        return data
 
 class Analytics(db.Model):
     """Analytics model for tracking user actions and system usage."""
@@ -160,4 +230,50 @@ class Analytics(db.Model):
             'text_length': self.text_length,
             'processing_time': self.processing_time,
             'is_error': self.is_error
-        } 
\ No newline at end of file
+        } 
+
+class RollupMixin:
+    """
+    Columns shared by the analytics rollup tables.
+    
+    One row aggregates the events of a time bucket for an action/feature pair
+    whose processing time fell into one latency bucket, so percentiles can be
+    estimated by summing rows across latency buckets.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, nullable=False, index=True)
+    action = db.Column(db.String(50), nullable=False, default='')
+    feature_used = db.Column(db.String(50), nullable=False, default='')
+    latency_bucket = db.Column(db.Integer, nullable=False, default=0)  # Index into LATENCY_BUCKETS
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    processing_time_total = db.Column(db.Float, nullable=False, default=0.0)  # Seconds
+    text_length_total = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'bucket_start': self.bucket_start.isoformat() if self.bucket_start else None,
+            'action': self.action,
+            'feature_used': self.feature_used,
+            'latency_bucket': self.latency_bucket,
+            'event_count': self.event_count,
+            'error_count': self.error_count,
+            'processing_time_total': self.processing_time_total,
+            'text_length_total': self.text_length_total
+        }
+
+class AnalyticsHourlyRollup(RollupMixin, db.Model):
+    """Analytics events aggregated per hour."""
+    __tablename__ = 'analytics_hourly_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('bucket_start', 'action', 'feature_used', 'latency_bucket',
+                            name='uq_analytics_hourly_rollup_key'),
+    )
+
+class AnalyticsDailyRollup(RollupMixin, db.Model):
+    """Analytics events aggregated per day."""
+    __tablename__ = 'analytics_daily_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('bucket_start', 'action', 'feature_used', 'latency_bucket',
+                            name='uq_analytics_daily_rollup_key'),
+    )
@@ -7,9 +7,12 @@ Uses waitress WSGI server for production deployment.
 import os
 import sys
 from waitress import serve
-from app import app
 
 if __name__ == '__main__':
+    # Imported here, not at module level: spawned worker processes re-import
+    # this script and must not build a second copy of the app
+    from app import app
+
     # Set production environment variables
     os.environ['FLASK_ENV'] = 'production'
     os.environ['DEBUG'] = '0'
@@ -23,7 +26,7 @@ if __name__ == '__main__':
     
     try:
         # Start the waitress server
-        serve(app, host='0.0.0.0', port=port, threads=4)
+        serve(app, host='0.0.0.0', port=port, threads=app.config['SERVER_THREADS'])
     except KeyboardInterrupt:
         print("\nServer stopped by user")
     except Exception as e:
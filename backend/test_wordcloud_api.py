@@ -1 +1,1606 @@
- 
\ No newline at end of file
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.file_processor import FileProcessor
+from utils.url_fetcher import UrlFetcher
+
+PAGE = b'<html><head><title>Stand-in</title><script>var x = 1;</script></head><body><p>Hello word cloud world</p></body></html>'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves a few fixed pages and records what each request asked for."""
+
+    requests_seen = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        StandInHandler.requests_seen.append((self.path, dict(self.headers)))
+        if self.path == '/etag':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._send_page(ETag='"v1"')
+        elif self.path == '/last-modified':
+            if self.headers.get('If-Modified-Since') == 'Mon, 05 Oct 2026 10:00:00 GMT':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._send_page(**{'Last-Modified': 'Mon, 05 Oct 2026 10:00:00 GMT'})
+        elif self.path == '/plain':
+            self._send_page()
+        elif self.path == '/slow':
+            time.sleep(1)
+            self._send_page()
+        elif self.path == '/big-declared':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(10 * 1024 * 1024))
+            self.end_headers()
+        elif self.path == '/big-undeclared':
+            # No Content-Length: the body runs until the connection closes
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            try:
+                for _ in range(1024):
+                    self.wfile.write(b'<p>' + b'x' * 16 * 1024 + b'</p>')
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            self.close_connection = True
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def _send_page(self, **headers):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(PAGE)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+
+@pytest.fixture(scope='module')
+def stand_in():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def processor():
+    StandInHandler.requests_seen.clear()
+    return FileProcessor()
+
+
+@pytest.fixture
+def url_executor():
+    from concurrent.futures import ThreadPoolExecutor
+
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+def test_extracts_text_and_title(stand_in, processor):
+    result = processor.extract_text_from_url(f'{stand_in}/plain')
+
+    assert result['success']
+    assert 'Hello word cloud world' in result['text']
+    assert 'var x' not in result['text']
+    assert result['title'] == 'Stand-in'
+    assert result['from_cache'] is False
+
+
+def test_etag_revalidation_reuses_cached_text(stand_in, processor):
+    first = processor.extract_text_from_url(f'{stand_in}/etag')
+    second = processor.extract_text_from_url(f'{stand_in}/etag')
+
+    assert first['text'] == second['text']
+    assert (first['from_cache'], second['from_cache']) == (False, True)
+    assert StandInHandler.requests_seen[1][1].get('If-None-Match') == '"v1"'
+    assert processor.url_fetcher.stats()['hits'] == 1
+
+
+def test_last_modified_revalidation(stand_in, processor):
+    processor.extract_text_from_url(f'{stand_in}/last-modified')
+    second = processor.extract_text_from_url(f'{stand_in}/last-modified')
+
+    assert second['from_cache'] is True
+    assert StandInHandler.requests_seen[1][1].get('If-Modified-Since') == 'Mon, 05 Oct 2026 10:00:00 GMT'
+
+
+def test_responses_without_validators_are_not_cached(stand_in, processor):
+    processor.extract_text_from_url(f'{stand_in}/plain')
+    second = processor.extract_text_from_url(f'{stand_in}/plain')
+
+    assert second['from_cache'] is False
+    assert 'If-None-Match' not in StandInHandler.requests_seen[1][1]
+
+
+def test_cache_entries_expire(stand_in):
+    fetcher = UrlFetcher(max_size=1024 * 1024, cache_ttl=0)
+    parse = lambda body, encoding, response: body
+
+    fetcher.fetch(f'{stand_in}/etag', parse)
+    _, from_cache = fetcher.fetch(f'{stand_in}/etag', parse)
+
+    assert from_cache is False
+    assert fetcher.stats()['hits'] == 0
+
+
+def test_declared_size_over_cap_is_rejected(stand_in, processor):
+    result = processor.extract_text_from_url(f'{stand_in}/big-declared')
+
+    assert not result['success']
+    assert 'exceeds maximum allowed size' in result['error']
+
+
+def test_undeclared_size_over_cap_aborts_while_streaming(stand_in, processor):
+    processor.url_fetcher.max_size = 256 * 1024
+    result = processor.extract_text_from_url(f'{stand_in}/big-undeclared')
+
+    assert not result['success']
+    assert 'exceeds maximum allowed size (262144 bytes)' in result['error']
+
+
+def test_http_errors_are_reported(stand_in, processor):
+    result = processor.extract_text_from_url(f'{stand_in}/missing')
+
+    assert not result['success']
+    assert result['error'].startswith('Error fetching URL')
+
+
+def test_batch_fetch_deduplicates_and_keeps_order(stand_in, processor, url_executor):
+    results = processor.extract_text_from_urls([
+        f'{stand_in}/plain',
+        f'{stand_in}/missing',
+        f'{stand_in}/plain#section',
+        f'{stand_in.upper().replace("HTTP://", "http://")}/plain'
+    ], url_executor)
+
+    assert [result['url'] for result in results] == [f'{stand_in}/plain', f'{stand_in}/missing']
+    assert [result['success'] for result in results] == [True, False]
+    assert [path for path, _ in StandInHandler.requests_seen].count('/plain') == 1
+
+
+def test_batch_fetch_reports_timeouts(stand_in, processor, url_executor):
+    results = processor.extract_text_from_urls([f'{stand_in}/slow', f'{stand_in}/plain'], url_executor, timeout=0.5)
+
+    assert [result['success'] for result in results] == [False, True]
+    assert results[0]['error'] == 'Timed out after 0.5 seconds'
+
+
+def test_batch_fetches_get_the_remaining_deadline_as_timeout(stand_in, processor, url_executor, monkeypatch):
+    timeouts = []
+    get = processor.url_fetcher.session.get
+
+    def recording_get(url, **kwargs):
+        timeouts.append(kwargs['timeout'])
+        return get(url, **kwargs)
+
+    monkeypatch.setattr(processor.url_fetcher.session, 'get', recording_get)
+    processor.extract_text_from_urls([f'{stand_in}/plain'], url_executor, timeout=2)
+
+    assert 0 < timeouts[0] <= 2
+
+
+def test_host_slots_are_dropped_once_idle(stand_in, processor, url_executor):
+    processor.extract_text_from_urls([f'{stand_in}/plain', f'{stand_in}/etag', f'{stand_in}/slow'], url_executor)
+
+    assert processor.url_fetcher._host_slots == {}
+
+
+def test_fetch_stage_excludes_parsing(stand_in):
+    from utils.metrics import record_stages
+
+    def slow_parse(body, encoding, response):
+        time.sleep(0.2)
+        return body
+
+    with record_stages() as stages:
+        UrlFetcher(max_size=1024 * 1024).fetch(f'{stand_in}/plain', slow_parse)
+
+    (fetch_seconds,) = [seconds for stage, seconds, _ in stages if stage == 'fetch']
+    assert fetch_seconds < 0.2
+
+
+def test_host_wait_is_timed_apart_from_the_fetch(stand_in):
+    from utils.metrics import record_stages
+
+    fetcher = UrlFetcher(max_size=1024 * 1024, per_host_limit=1)
+    held = threading.Event()
+
+    def hold_host():
+        with fetcher._host_slot(f'{stand_in}/plain'):
+            held.set()
+            time.sleep(0.3)
+
+    holder = threading.Thread(target=hold_host)
+    holder.start()
+    held.wait(5)
+    with record_stages() as stages:
+        fetcher.fetch(f'{stand_in}/plain', lambda body, encoding, response: body)
+    holder.join()
+
+    timings = {stage: seconds for stage, seconds, _ in stages}
+    assert timings['host_wait'] >= 0.2
+    assert timings['fetch'] < 0.2
+
+
+# HTML extraction
+
+ARTICLE = ' '.join(['The committee met on Tuesday to review the harbour budget.'] * 6)
+
+
+def test_html_extraction_drops_page_furniture():
+    from utils.html_extractor import extract_html
+
+    page = f"""<html><head><title> Harbour
+        news </title><style>p {{ color: red }}</style></head><body>
+        <header><h1>Site name</h1></header>
+        <nav><a href="/">Home</a> <a href="/about">About us</a></nav>
+        <div class="cookie-banner">We use cookies to improve your experience</div>
+        <script>trackVisitor();</script>
+        <p>{ARTICLE}</p>
+        <footer>Copyright notice</footer>
+    </body></html>"""
+    result = extract_html(page)
+
+    assert result['title'] == 'Harbour news'
+    assert result['text'] == ARTICLE
+    assert extract_html(page, main_content=False)['text'].startswith('Site name')
+
+
+def test_html_extraction_keeps_only_a_substantial_main_element():
+    from utils.html_extractor import extract_html
+
+    page = f"<html><body><div>Weather: sunny</div><main><p>{ARTICLE}</p></main></body></html>"
+    thin = "<html><body><p>" + ARTICLE + "</p><main>Short note</main></body></html>"
+
+    assert extract_html(page)['text'] == ARTICLE
+    assert extract_html(thin)['text'] == f'{ARTICLE} Short note'
+
+
+def test_html_extraction_decodes_non_utf8_and_mislabeled_pages():
+    from utils.html_extractor import extract_html
+
+    latin = '<html><head><meta charset="iso-8859-1"></head><body><p>Un caf\xe9 cr\xe8me</p></body></html>'
+
+    # Declared by the server, or only by the page itself
+    assert extract_html(latin.encode('cp1252'), encoding='cp1252')['text'] == 'Un caf\xe9 cr\xe8me'
+    assert extract_html(latin.encode('latin-1'))['text'] == 'Un caf\xe9 cr\xe8me'
+    # Server label that does not fit the bytes, and a UTF-8 page whose meta is wrong
+    assert extract_html(latin.encode('latin-1'), encoding='utf-8')['text'] == 'Un caf\xe9 cr\xe8me'
+    assert extract_html(latin.encode('utf-8'))['text'] == 'Un caf\xe9 cr\xe8me'
+    assert extract_html(latin.encode('latin-1'), encoding='no-such-charset')['text'] == 'Un caf\xe9 cr\xe8me'
+
+
+@pytest.mark.parametrize('content', [b'', b'   ', b'\x00\x01\xff\xfe<<<>>>', bytes(range(256)) * 4])
+def test_html_extraction_survives_empty_and_garbage_bodies(content):
+    from utils.html_extractor import extract_html
+
+    result = extract_html(content)
+
+    assert set(result) == {'text', 'title'}
+    assert result['title'] == ''
+
+
+# Topic model service
+
+def _topic_documents(count, seed=0):
+    import random
+    rng = random.Random(seed)
+    vocabulary = [f'term{i}' for i in range(40)]
+    return [[rng.choice(vocabulary) for _ in range(30)] for _ in range(count)]
+
+
+def test_topic_update_publishes_a_copy(tmp_path):
+    from utils.topic_service import TopicModelService
+
+    service = TopicModelService(str(tmp_path), num_topics=3, min_documents=5, background_retrain=False)
+    assert service.train(_topic_documents(20)) == 1
+    published = service.model
+
+    assert service.update(_topic_documents(5, seed=1)) == 2
+    assert service.model is not published
+    assert service.infer(_topic_documents(1)[0])['model_version'] == 2
+
+
+def test_failed_topic_training_backs_off(tmp_path):
+    from utils.topic_service import TopicModelService
+
+    service = TopicModelService(str(tmp_path), min_documents=2, retrain_every=10, background_retrain=False)
+    for _ in range(3):
+        service.add_document(['same'])
+
+    # One distinct word is filtered out entirely, so nothing can be trained
+    assert service.train() is None
+    assert service._next_train_at == 13
+
+
+# Keyword document-frequency table
+
+def test_document_frequency_table_round_trips(tmp_path):
+    from utils.keyword_index import DocumentFrequencyTable
+
+    path = str(tmp_path / 'df.npz')
+    table = DocumentFrequencyTable(path, flush_every=1000)
+    table.add_document(['word', 'cloud', 'word'])
+    table.add_document(['word'])
+    table.save()
+
+    loaded = DocumentFrequencyTable(path)
+    assert loaded.num_documents == 2
+    assert loaded.document_frequencies == {'word': 2, 'cloud': 1}
+    assert loaded.score(['cloud', 'word'])[0][0] == 'cloud'
+
+
+def test_concurrent_saves_leave_a_readable_table(tmp_path):
+    from utils.keyword_index import DocumentFrequencyTable
+
+    path = str(tmp_path / 'df.npz')
+    table = DocumentFrequencyTable(path, flush_every=1)
+    threads = [
+        threading.Thread(target=table.add_document, args=([f'term{i}', 'shared'],))
+        for i in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    table.save()
+
+    assert DocumentFrequencyTable(path).document_frequencies['shared'] == 20
+    assert sorted(os.listdir(tmp_path)) == ['df.npz']
+
+
+def test_pruning_stops_at_the_low_water_mark(tmp_path):
+    from utils.keyword_index import DocumentFrequencyTable
+
+    table = DocumentFrequencyTable(str(tmp_path / 'df.npz'), flush_every=1000, max_terms=10, prune_to=0.5)
+    for i in range(10):
+        table.add_document([f'common{i}'])
+        table.add_document([f'common{i}'])
+    table.add_document(['rare'])
+
+    assert len(table.document_frequencies) == 5
+    assert 'rare' not in table.document_frequencies
+
+
+def test_periodic_saves_run_off_the_calling_thread(tmp_path, monkeypatch):
+    from utils.keyword_index import DocumentFrequencyTable
+
+    table = DocumentFrequencyTable(str(tmp_path / 'df.npz'), flush_every=2)
+    saved_by = []
+    release = threading.Event()
+
+    def slow_save():
+        saved_by.append(threading.current_thread().name)
+        release.wait(5)
+
+    monkeypatch.setattr(table, 'save', slow_save)
+    table.add_document(['a'])
+    table.add_document(['b'])
+    # A second flush while the first is still writing does not start another
+    assert not table.flush_async()
+    release.set()
+    table._flush_thread.join()
+
+    assert saved_by == ['df-table-flush']
+
+
+# Phrase extraction
+
+def _phrase_extractor(segments, **kwargs):
+    from utils.phrase_extractor import PhraseExtractor
+
+    extractor = PhraseExtractor(**kwargs)
+    for segment in segments:
+        extractor.add_segment(segment.split())
+    return extractor
+
+
+def test_collocations_are_accepted_and_chance_pairs_are_not():
+    segments = ['machine learning models'] * 5 + ['red fox', 'blue fox', 'red car', 'blue car', 'green tree', 'old tree']
+    extractor = _phrase_extractor(segments, min_count=2)
+
+    phrases = {phrase: count for phrase, count, _ in extractor.phrases()}
+
+    assert phrases['machine learning models'] == 5
+    assert 'red fox' not in phrases
+
+
+def test_phrase_frequencies_subtract_covered_words():
+    segments = ['new york city'] * 4 + ['new ideas']
+    frequencies = _phrase_extractor(segments, min_count=2).frequencies()
+
+    assert frequencies['new york city'] == 4
+    assert frequencies['new'] == 1
+    assert 'york' not in frequencies
+    assert 'new york' not in frequencies
+
+
+def test_phrases_do_not_span_segments():
+    extractor = _phrase_extractor(['alpha beta', 'gamma delta'] * 3, min_count=1, threshold=-1.0)
+
+    assert 'beta gamma' not in {phrase for phrase, _, _ in extractor.phrases()}
+
+
+def test_llr_scoring_ranks_collocations():
+    segments = ['strong tea'] * 6 + ['strong man', 'weak tea', 'hot tea', 'tall man']
+    extractor = _phrase_extractor(segments, scoring='llr', min_count=2, threshold=0.0)
+
+    scores = {phrase: score for phrase, _, score in extractor.phrases()}
+
+    assert scores['strong tea'] > 0
+
+
+def test_ngram_tables_are_pruned_by_lossy_counting():
+    extractor = _phrase_extractor([f'w{i} w{i + 1}' for i in range(50)] + ['keep this'] * 3,
+                                  max_ngram=2, max_ngrams=10)
+
+    assert len(extractor.ngram_counts[2]) <= 11
+    assert extractor.prune_floor[2] > 0
+    assert extractor._ngram_count([extractor.token_ids['keep'], extractor.token_ids['this']]) == 3
+
+
+# Named-entity extraction
+
+def _fake_tagger(sentences):
+    # Capitalized words stand in for entities; 'Acme' is an organization
+    return [
+        [('ORGANIZATION' if word == 'Acme' else 'PERSON', word)
+         for word in sentence.rstrip('.').split()[1:] if word.istitle()]
+        for sentence in sentences
+    ]
+
+
+@pytest.fixture
+def entity_extractor(monkeypatch):
+    import utils.entity_extractor as entity_module
+
+    monkeypatch.setattr(entity_module, 'sent_tokenize', lambda text: [s.strip() + '.' for s in text.split('.') if s.strip()])
+    monkeypatch.setattr(entity_module, 'tag_sentences', _fake_tagger)
+    extractor = entity_module.EntityExtractor(batch_size=1, use_processes=False)
+    yield extractor
+    extractor.shutdown()
+
+
+def test_entities_are_grouped_and_sentences_cached(entity_extractor):
+    result = entity_extractor.extract('Then Alice met Bob. Later Alice joined Acme.')
+
+    assert result['groups']['persons'] == {'Alice': 2, 'Bob': 1}
+    assert result['groups']['organizations'] == {'Acme': 1}
+    assert not result['partial']
+    assert len(entity_extractor._cache) == 2
+
+
+def test_entity_tagging_failures_are_raised(entity_extractor, monkeypatch):
+    import utils.entity_extractor as entity_module
+
+    def broken(sentences):
+        raise RuntimeError('tagger data missing')
+
+    monkeypatch.setattr(entity_module, 'tag_sentences', broken)
+
+    with pytest.raises(entity_module.EntityTaggingError, match='tagger data missing'):
+        entity_extractor.extract('Then Alice met Bob.')
+
+
+def test_extract_entities_reports_tagging_failures(app_module, entity_extractor, monkeypatch):
+    import utils.entity_extractor as entity_module
+
+    def broken(sentences):
+        raise RuntimeError('tagger data missing')
+
+    monkeypatch.setattr(entity_module, 'tag_sentences', broken)
+    monkeypatch.setattr(app_module.advanced_processor, 'entity_extractor', entity_extractor)
+
+    with pytest.raises(entity_module.EntityTaggingError):
+        app_module.advanced_processor.extract_entities('Then Alice met Bob.')
+
+
+def test_entity_worker_module_imports_no_app_code():
+    import subprocess
+    import sys
+
+    # What a spawned worker loads to unpickle its task
+    loaded = subprocess.run(
+        [sys.executable, '-c', 'import sys, utils.entity_worker; print(" ".join(sys.modules))'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+    ).stdout.split()
+
+    assert not [name for name in loaded if name == 'app' or (name.startswith('utils.') and name != 'utils.entity_worker')]
+
+
+def test_entity_worker_processes_are_spawned():
+    from utils.entity_extractor import EntityExtractor
+
+    extractor = EntityExtractor(max_workers=1)
+    try:
+        assert extractor._get_executor()._mp_context.get_start_method() == 'spawn'
+    finally:
+        extractor.shutdown()
+
+
+# Analytics time budget
+
+def test_budget_runs_stages_in_priority_order_and_skips_expensive_ones():
+    from utils.budget import AnalyticsStage, BudgetScheduler
+
+    order = []
+    stages = [
+        AnalyticsStage('slow', lambda: order.append('slow'), priority=2, cost_ms=10000, default='skipped'),
+        AnalyticsStage('fast', lambda: order.append('fast') or 'done', priority=1, cost_ms=0),
+    ]
+
+    results, report = BudgetScheduler('500').run(stages, text_length=100)
+
+    assert order == ['fast']
+    assert results == {'fast': 'done', 'slow': 'skipped'}
+    assert report['time_budget_ms'] == 500.0
+    assert report['skipped'] == ['slow']
+
+
+def test_budget_aware_stage_reports_truncation():
+    from utils.budget import AnalyticsStage, BudgetScheduler
+
+    stage = AnalyticsStage('entities', lambda remaining_ms: ({'partial': True}, True),
+                           priority=1, cost_ms=0, accepts_budget=True)
+
+    results, report = BudgetScheduler(1000).run([stage], text_length=100)
+
+    assert results['entities'] == {'partial': True}
+    assert report['truncated'] == ['entities']
+
+
+def test_failed_stage_falls_back_to_its_default():
+    from utils.budget import AnalyticsStage, BudgetScheduler
+
+    def broken():
+        raise RuntimeError('boom')
+
+    results, report = BudgetScheduler().run([AnalyticsStage('topics', broken, 1, 0, default={})], 100)
+
+    assert results['topics'] == {}
+    assert report['stages']['topics'] == {'status': 'failed', 'error': 'boom'}
+
+
+@pytest.mark.parametrize('value', ['abc', -1, float('nan'), True, [5]])
+def test_invalid_time_budgets_are_rejected(value):
+    from utils.budget import BudgetScheduler
+
+    with pytest.raises(ValueError):
+        BudgetScheduler(value)
+
+
+# Blob store
+
+def test_blob_store_round_trips_and_deduplicates(tmp_path):
+    from utils.blob_store import BlobStore, LocalBlobStore
+
+    store = LocalBlobStore(str(tmp_path))
+    blob_hash = store.put(b'png bytes')
+
+    assert blob_hash == BlobStore.content_hash(b'png bytes')
+    assert store.put(b'png bytes') == blob_hash
+    assert store.get(blob_hash) == b'png bytes'
+    assert store.exists(blob_hash)
+
+    store.delete(blob_hash)
+    assert not store.exists(blob_hash)
+    assert store.get(blob_hash) is None
+
+
+def test_blob_store_rejects_malformed_hashes(tmp_path):
+    from utils.blob_store import LocalBlobStore
+
+    with pytest.raises(ValueError):
+        LocalBlobStore(str(tmp_path)).get('../../etc/passwd')
+
+
+def test_incomplete_blob_store_cannot_be_instantiated():
+    from utils.blob_store import BlobStore
+
+    class WriteOnlyStore(BlobStore):
+        def put(self, data):
+            return self.content_hash(data)
+
+    with pytest.raises(TypeError):
+        WriteOnlyStore()
+
+
+# Flask app on a scratch database
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The app module, configured before import; skipped where NLTK data is missing."""
+    root = tmp_path_factory.mktemp('app')
+    os.environ.update({
+        'SQLITE_DATABASE': str(root / 'test.db'),
+        'BLOB_STORAGE_PATH': str(root / 'blobs'),
+        'IMAGE_CACHE_PATH': str(root / 'image_cache'),
+        'PROFILE_STORAGE_PATH': str(root / 'profiles'),
+        'ADMISSION_ENABLED': '0',
+        # As deployed behind one proxy, so tests can pose as distinct clients
+        'PROXY_TRUSTED_HOPS': '1'
+    })
+    try:
+        import app as app_module
+    except LookupError as e:
+        pytest.skip(f'NLTK data unavailable: {e}')
+    return app_module
+
+
+@pytest.fixture
+def client(app_module):
+    from models import db
+
+    with app_module.app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app_module.app.test_client()
+
+
+def add_wordclouds(app_module, count, created_at=None, **columns):
+    from datetime import datetime, timedelta
+    from models import db, User, WordCloud
+
+    with app_module.app.app_context():
+        user = User.query.first()
+        if user is None:
+            user = User(username='owner', email='owner@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+        start = created_at or datetime(2026, 1, 1)
+        ids = []
+        for i in range(count):
+            wordcloud = WordCloud(title=f'cloud {i}', user_id=user.id, original_text='heavy text',
+                                  created_at=start if created_at else start + timedelta(minutes=i), **columns)
+            db.session.add(wordcloud)
+            db.session.flush()
+            ids.append(wordcloud.id)
+        db.session.commit()
+        return ids
+
+
+# Word cloud listing
+
+def test_listing_pages_through_every_cloud_once(app_module, client):
+    ids = add_wordclouds(app_module, 5)
+
+    seen, cursor = [], None
+    while True:
+        page = client.get('/api/wordclouds', query_string={'limit': 2, **({'cursor': cursor} if cursor else {})}).get_json()
+        seen.extend(wordcloud['id'] for wordcloud in page['wordclouds'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == list(reversed(ids))
+
+
+def test_listing_breaks_created_at_ties_by_id(app_module, client):
+    from datetime import datetime
+
+    ids = add_wordclouds(app_module, 3, created_at=datetime(2026, 1, 1))
+
+    first = client.get('/api/wordclouds?limit=2').get_json()
+    second = client.get(f"/api/wordclouds?limit=2&cursor={first['next_cursor']}").get_json()
+
+    assert [w['id'] for w in first['wordclouds'] + second['wordclouds']] == list(reversed(ids))
+    assert second['next_cursor'] is None
+
+
+def test_listing_rejects_malformed_cursors(client):
+    response = client.get('/api/wordclouds?cursor=not-a-cursor')
+
+    assert response.status_code == 400
+
+
+def test_summary_query_leaves_heavy_columns_unloaded(app_module, client):
+    from sqlalchemy import inspect
+    from models import WordCloud
+
+    add_wordclouds(app_module, 1)
+    with app_module.app.app_context():
+        wordcloud = WordCloud.summary_query().first()
+        unloaded = inspect(wordcloud).unloaded
+
+    assert {'original_text', 'word_frequencies', 'image_base64', 'layout'} <= unloaded
+
+
+# Analytics rollups
+
+@pytest.fixture
+def db_app(tmp_path):
+    """A bare Flask app with the models' tables on a scratch SQLite file."""
+    from flask import Flask
+    from models import db
+
+    flask_app = Flask(__name__)
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(flask_app)
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+
+
+def analytics_events():
+    from datetime import datetime
+
+    at = datetime(2026, 3, 1, 10, 15)
+    return [
+        dict(timestamp=at, action='generate_wordcloud', feature_used='advanced_wordcloud', processing_time=0.3, text_length=100),
+        dict(timestamp=at, action='generate_wordcloud', feature_used='advanced_wordcloud', processing_time=0.4, text_length=200),
+        dict(timestamp=at, action='generate_wordcloud', feature_used='advanced_wordcloud', processing_time=70.0,
+             is_error=True, error_message='boom'),
+        dict(timestamp=at, action='generate_wordcloud', feature_used='not_modified', processing_time=0.001),
+        dict(timestamp=datetime(2026, 3, 2, 9), action='export', feature_used='png', processing_time=0.05)
+    ]
+
+
+def test_dashboard_counts_only_successful_generations(db_app):
+    from models import db, Analytics
+    from utils.analytics_rollup import dashboard_statistics, register_rollup_listener
+
+    register_rollup_listener()
+    db.session.add_all(Analytics(**event) for event in analytics_events())
+    db.session.commit()
+
+    from datetime import datetime
+    statistics = dashboard_statistics(now=datetime(2026, 3, 2, 12))
+
+    assert statistics['total_wordclouds'] == 2
+    assert statistics['total_exports'] == 1
+    assert statistics['by_action']['generate_wordcloud'] == {
+        'events': 4, 'errors': 1, 'features': {'advanced_wordcloud': 3, 'not_modified': 1}
+    }
+    assert statistics['all_time']['events'] == 5
+
+
+def test_percentiles_interpolate_within_latency_buckets():
+    from utils.analytics_rollup import LATENCY_BUCKETS, estimate_percentile, latency_bucket
+
+    assert latency_bucket(0.01) == 0
+    assert latency_bucket(0.3) == LATENCY_BUCKETS.index(0.5)
+    assert latency_bucket(1000) == len(LATENCY_BUCKETS) - 1
+    # Ten events between 0.25 s and 0.5 s: the median sits halfway through
+    assert estimate_percentile({latency_bucket(0.3): 10}, 0.5) == pytest.approx(0.375)
+
+
+def test_rollup_migration_backfill_matches_incremental_rollups(tmp_path):
+    import importlib.util
+    import sqlalchemy as sa
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+    from models import Analytics, AnalyticsDailyRollup, AnalyticsHourlyRollup
+    from utils.analytics_rollup import update_rollups
+
+    spec = importlib.util.spec_from_file_location(
+        'rollup_migration', os.path.join(os.path.dirname(__file__), 'migrations', 'versions', '5d1e7b3f9a40_analytics_rollups.py')
+    )
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    # Several chunks, so buckets spanning chunk boundaries are summed once
+    migration.BACKFILL_CHUNK_SIZE = 2
+
+    def rollup_rows(engine):
+        with engine.connect() as connection:
+            return {
+                table.name: sorted(tuple(row)[1:] for row in connection.execute(sa.select(table)))
+                for table in (AnalyticsHourlyRollup.__table__, AnalyticsDailyRollup.__table__)
+            }
+
+    events = analytics_events()
+    migrated = sa.create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    Analytics.__table__.create(migrated)
+    with migrated.begin() as connection:
+        for event in events:
+            connection.execute(Analytics.__table__.insert().values(**event))
+        with Operations.context(MigrationContext.configure(connection)):
+            migration.upgrade()
+
+    incremental = sa.create_engine(f"sqlite:///{tmp_path / 'incremental.db'}")
+    for table in (AnalyticsHourlyRollup.__table__, AnalyticsDailyRollup.__table__):
+        table.create(incremental)
+    with incremental.begin() as connection:
+        update_rollups(connection, events)
+
+    assert rollup_rows(migrated) == rollup_rows(incremental)
+
+    # Later events land in the backfilled rows rather than duplicating their buckets
+    with migrated.begin() as connection:
+        update_rollups(connection, events[:1])
+    with incremental.begin() as connection:
+        update_rollups(connection, events[:1])
+    assert rollup_rows(migrated) == rollup_rows(incremental)
+
+
+# Buffered analytics writes
+
+@pytest.fixture
+def stopped_buffer(db_app):
+    """A buffer whose writer thread has exited, so tests drive flush() themselves."""
+    from utils.analytics_buffer import AnalyticsBuffer
+
+    buffer = AnalyticsBuffer(db_app, max_queue_size=10, batch_size=2, flush_interval=0.1)
+    buffer.close()
+    return buffer
+
+
+def test_buffer_writes_events_and_rollups_in_batches(stopped_buffer):
+    from models import db, Analytics, AnalyticsDailyRollup
+
+    for i in range(5):
+        assert stopped_buffer.record('export', feature_used='png', processing_time=0.1, text_length=i)
+
+    assert stopped_buffer.flush() == 5
+    stats = stopped_buffer.stats()
+    assert (stats['written'], stats['batches'], stats['queued']) == (5, 3, 0)
+    assert Analytics.query.count() == 5
+    assert db.session.query(db.func.sum(AnalyticsDailyRollup.event_count)).scalar() == 5
+    assert db.session.query(db.func.sum(AnalyticsDailyRollup.text_length_total)).scalar() == 10
+
+
+def test_full_buffer_drops_instead_of_blocking(stopped_buffer):
+    results = [stopped_buffer.record('export') for _ in range(11)]
+
+    assert results == [True] * 10 + [False]
+    assert stopped_buffer.stats()['dropped'] == 1
+
+
+def test_failed_batches_are_counted(stopped_buffer):
+    from models import db
+
+    db.drop_all()
+    stopped_buffer.record('export')
+
+    stopped_buffer.flush()
+
+    assert stopped_buffer.stats()['failed'] == 1
+
+
+# Column codec
+
+CODEC_MODULES = {'json': None, 'orjson': 'orjson', 'msgpack': 'msgpack', 'none': None, 'zlib': None, 'zstd': 'zstandard'}
+
+
+@pytest.mark.parametrize('serializer', ['json', 'orjson', 'msgpack'])
+@pytest.mark.parametrize('compressor', ['none', 'zlib', 'zstd'])
+def test_codec_round_trips(serializer, compressor):
+    from utils.column_codec import MAGIC, ColumnCodec
+
+    for name in (serializer, compressor):
+        if CODEC_MODULES[name]:
+            pytest.importorskip(CODEC_MODULES[name])
+    codec = ColumnCodec(serializer, compressor)
+    small = {'word': 3}
+    large = {f'word{i}': i for i in range(200)}
+
+    for value in (small, large, ['a', 'b'], 'text', None):
+        encoded = codec.encode(value)
+        assert encoded[0] == MAGIC
+        assert ColumnCodec.decode(encoded) == value
+    # Short values skip compression, long ones are compressed when a compressor is set
+    assert codec.encode(small)[1] & 0x0F == 0
+    assert bool(codec.encode(large)[1] & 0x0F) == (compressor != 'none')
+
+
+def test_codec_decodes_legacy_json_rows():
+    from utils.column_codec import ColumnCodec
+
+    assert ColumnCodec.decode('{"word": 3}') == {'word': 3}
+    assert ColumnCodec.decode(b'["a", "b"]') == ['a', 'b']
+    assert ColumnCodec.decode(None) is None
+    assert not ColumnCodec.is_encoded('{"word": 3}')
+
+
+def test_codec_rejects_unknown_format_bytes():
+    from utils.column_codec import MAGIC, ColumnCodec
+
+    with pytest.raises(ValueError):
+        ColumnCodec.decode(bytes((MAGIC, 0xF0)) + b'{}')
+    with pytest.raises(ValueError):
+        ColumnCodec('pickle', 'none')
+
+
+def test_encoded_columns_read_every_stored_format(db_app):
+    from models import db, User, WordCloud
+    from utils.column_codec import ColumnCodec, get_default_codec, set_default_codec
+
+    user = User(username='owner', email='owner@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    previous = get_default_codec()
+    try:
+        set_default_codec(ColumnCodec('json', 'zlib'))
+        db.session.add(WordCloud(title='encoded', user_id=user.id, word_frequencies={f'w{i}': i for i in range(100)}))
+        db.session.commit()
+    finally:
+        set_default_codec(previous)
+    db.session.execute(db.text(
+        "INSERT INTO word_cloud (title, user_id, word_frequencies) VALUES ('legacy', :user_id, :frequencies)"
+    ), {'user_id': user.id, 'frequencies': '{"old": 1}'})
+    db.session.commit()
+    db.session.expire_all()
+
+    frequencies = {wordcloud.title: wordcloud.get_word_frequencies() for wordcloud in WordCloud.query.all()}
+
+    assert frequencies['encoded'] == {f'w{i}': i for i in range(100)}
+    assert frequencies['legacy'] == {'old': 1}
+
+
+# Streamed exports
+
+def test_csv_export_streams_in_chunks_most_frequent_first():
+    import csv
+    import io
+    from utils.export_stream import ROWS_PER_CHUNK, csv_chunks
+
+    frequencies = {f'word{i}': i for i in range(ROWS_PER_CHUNK + 5)}
+
+    chunks = list(csv_chunks(frequencies))
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+
+    assert len(chunks) == 2
+    assert rows[0] == ['Word', 'Frequency']
+    assert rows[1] == [f'word{ROWS_PER_CHUNK + 4}', str(ROWS_PER_CHUNK + 4)]
+    assert len(rows) == ROWS_PER_CHUNK + 6
+
+
+def test_ndjson_export_emits_metadata_text_and_words():
+    import json
+    from datetime import datetime
+    from models import WordCloud
+    from utils.export_stream import ndjson_chunks
+
+    wordcloud = WordCloud(id=7, title='cloud', user_id=1, original_text='alpha beta alpha',
+                          word_frequencies={'beta': 1, 'alpha': 2}, image_hash='ab' * 32,
+                          created_at=datetime(2026, 1, 1), updated_at=datetime(2026, 1, 1))
+
+    records = [json.loads(line) for line in b''.join(ndjson_chunks(wordcloud)).decode('utf-8').splitlines()]
+    bare = [json.loads(line) for line in b''.join(
+        ndjson_chunks(wordcloud, include_text=False, include_image=False)
+    ).decode('utf-8').splitlines()]
+
+    assert [record['type'] for record in records] == ['wordcloud', 'text', 'word', 'word']
+    assert records[0]['image_hash'] == 'ab' * 32 and 'word_frequencies' not in records[0]
+    assert records[1]['original_text'] == 'alpha beta alpha'
+    assert [(r['word'], r['frequency']) for r in records[2:]] == [('alpha', 2), ('beta', 1)]
+    assert [record['type'] for record in bare] == ['wordcloud', 'word', 'word']
+    assert 'image_hash' not in bare[0]
+
+
+def test_gzip_export_is_a_single_member():
+    import gzip
+    from utils.export_stream import gzip_chunks
+
+    chunks = [b'Word,Frequency\r\n', b'alpha,2\r\n' * 1000, b'beta,1\r\n']
+
+    assert gzip.decompress(b''.join(gzip_chunks(iter(chunks)))) == b''.join(chunks)
+
+
+# Rendering from a stored layout
+
+@pytest.fixture(scope='module')
+def placed_cloud():
+    from wordcloud import WordCloud
+    from utils.cloud_layout import layout_from_wordcloud
+
+    wc = WordCloud(width=200, height=100, random_state=1)
+    wc.generate_from_frequencies({'alpha': 10, 'beta': 6, 'gamma': 3, 'delta': 1})
+    return layout_from_wordcloud(wc), 200, 100
+
+
+def test_layout_renders_at_scale_without_replacing_words(placed_cloud):
+    import io
+    from PIL import Image
+    from utils.cloud_layout import render_layout_png, scale_for_dpi
+
+    layout, width, height = placed_cloud
+
+    image = Image.open(io.BytesIO(render_layout_png(layout, width, height, 'white', scale=2)))
+    transparent = Image.open(io.BytesIO(render_layout_png(layout, width, height, None)))
+
+    assert image.size == (400, 200)
+    assert transparent.mode == 'RGBA'
+    assert scale_for_dpi(144) == 2.0
+    assert scale_for_dpi(0) == pytest.approx(1 / 72)
+
+
+def test_layout_renders_as_svg(placed_cloud):
+    from utils.cloud_layout import render_layout_svg
+
+    svg = render_layout_svg(*placed_cloud, 'white')
+
+    assert svg.startswith('<svg')
+    for word in ('alpha', 'beta', 'gamma', 'delta'):
+        assert f'>{word}</text>' in svg
+
+
+def test_recolor_keeps_every_word_in_place(placed_cloud):
+    from utils.cloud_layout import recolor_layout
+
+    layout, width, height = placed_cloud
+
+    recolored = recolor_layout(layout, width, height, 'plasma', random_state=3)
+
+    assert [entry[:4] for entry in recolored] == [entry[:4] for entry in layout]
+    assert [entry[4] for entry in recolored] != [entry[4] for entry in layout]
+
+
+# Packed layouts
+
+def test_packed_layout_round_trips(placed_cloud):
+    from PIL import ImageColor
+    from utils.cloud_layout import pack_layout, unpack_layout
+
+    layout, width, height = placed_cloud
+
+    unpacked, unpacked_width, unpacked_height = unpack_layout(pack_layout(layout, width, height))
+
+    assert (unpacked_width, unpacked_height) == (width, height)
+    assert [entry[0][0] for entry in unpacked] == [entry[0][0] for entry in layout]
+    # Counts are stored as float32
+    assert [entry[0][1] for entry in unpacked] == pytest.approx([entry[0][1] for entry in layout])
+    assert [entry[1:4] for entry in unpacked] == [entry[1:4] for entry in layout]
+    assert [ImageColor.getrgb(entry[4]) for entry in unpacked] == [ImageColor.getrgb(entry[4])[:3] for entry in layout]
+
+
+def test_packed_layout_keeps_non_ascii_words_and_empty_layouts():
+    from utils.cloud_layout import pack_layout, unpack_layout
+
+    layout = [[['café', 2.0], 20, [5, 6], None, 'rgb(1, 2, 3)'], [['naïve', 1.0], 12, [30, 40], 2, '#ffffff']]
+
+    assert unpack_layout(pack_layout(layout, 100, 50))[0] == [
+        [['café', 2.0], 20, [5, 6], None, 'rgb(1, 2, 3)'], [['naïve', 1.0], 12, [30, 40], 2, 'rgb(255, 255, 255)']
+    ]
+    assert unpack_layout(pack_layout([], 100, 50)) == ([], 100, 50)
+    with pytest.raises(ValueError):
+        unpack_layout(b'XXX' + pack_layout([], 100, 50)[3:])
+
+
+def test_layout_fallback_uses_the_generation_seed(app_module, client):
+    from models import db, WordCloud
+    from utils.cloud_layout import layout_from_wordcloud
+
+    frequencies = {'alpha': 10, 'beta': 6, 'gamma': 3, 'delta': 2, 'epsilon': 1}
+    (wordcloud_id,) = add_wordclouds(app_module, 1, word_frequencies=frequencies, width=300, height=200,
+                                     settings={'seed': 1234})
+    with app_module.app.app_context():
+        wordcloud = db.session.get(WordCloud, wordcloud_id)
+        layout, _, _ = app_module._wordcloud_layout(wordcloud)
+        expected = layout_from_wordcloud(app_module.advanced_processor.wordcloud_processor.compute_layout(
+            frequencies, width=300, height=200, random_state=1234
+        ))
+
+    assert [entry[:4] for entry in layout] == [entry[:4] for entry in expected]
+
+
+def test_invalid_dpi_is_rejected(app_module, client):
+    (wordcloud_id,) = add_wordclouds(app_module, 1, word_frequencies={'alpha': 1})
+
+    assert client.get(f'/api/export/{wordcloud_id}?format=png&dpi=high').status_code == 400
+    assert client.post(f'/api/wordclouds/{wordcloud_id}/recolor', json={'dpi': 'high'}).status_code == 400
+    assert client.post(f'/api/wordclouds/{wordcloud_id}/recolor', json={'dpi': [300]}).status_code == 400
+
+
+# Response serialization and revalidation
+
+def test_etags_match_weakly_and_across_compressed_variants():
+    from werkzeug.http import parse_etags
+    from utils.serialization import etag_matches
+
+    assert etag_matches(parse_etags('W/"abc-json"'), 'abc-json')
+    assert etag_matches(parse_etags('"abc-json-gzip"'), 'abc-json')
+    assert etag_matches(parse_etags('*'), 'abc-json')
+    assert not etag_matches(parse_etags('"abc-png"'), 'abc-json')
+
+
+def test_compression_tags_strong_etags_with_the_coding():
+    from flask import Response
+    from werkzeug.http import parse_accept_header
+    from utils.serialization import compress_response
+
+    accept_gzip = parse_accept_header('gzip')
+    body = b'{"words":' + b'"alpha",' * 500 + b'"end"}'
+
+    strong = Response(body, mimetype='application/json')
+    strong.set_etag('abc-png')
+    weak = Response(body, mimetype='application/json')
+    weak.set_etag('abc-json', weak=True)
+    small = Response(b'{}', mimetype='application/json')
+
+    assert compress_response(strong, accept_gzip).get_etag() == ('abc-png-gzip', False)
+    assert compress_response(weak, accept_gzip).get_etag() == ('abc-json', True)
+    assert weak.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in compress_response(small, accept_gzip).headers
+
+
+def test_dumps_handles_numpy_values_and_non_string_keys():
+    import json
+    import numpy as np
+    from utils.serialization import dumps
+
+    payload = {'count': np.int64(3), 'scores': np.array([0.5, 1.5]), 1: 'one', 'tags': {'a'}}
+
+    assert json.loads(dumps(payload)) == {'count': 3, 'scores': [0.5, 1.5], '1': 'one', 'tags': ['a']}
+
+
+GENERATE_TEXT = 'Word clouds show frequent words. Frequent words are drawn large, rare words small. ' * 3
+
+
+def test_generated_json_gets_a_weak_etag_and_revalidates(app_module, client):
+    body = {'text': GENERATE_TEXT, 'settings': {'seed': 7}}
+
+    response = client.post('/api/generate_wordcloud?fields=word_frequencies', json=body)
+    etag, weak = response.get_etag()
+    revalidated = client.post('/api/generate_wordcloud?fields=word_frequencies', json=body,
+                              headers={'If-None-Match': response.headers['ETag']})
+
+    assert response.status_code == 200
+    assert weak
+    assert revalidated.status_code == 304
+    assert revalidated.get_etag() == (etag, True)
+
+
+def test_generated_png_keeps_a_strong_etag(app_module, client):
+    response = client.post('/api/generate_wordcloud', json={'text': GENERATE_TEXT, 'settings': {'seed': 7}},
+                           headers={'Accept': 'image/png'})
+
+    assert response.mimetype == 'image/png'
+    assert response.get_etag()[1] is False
+
+
+def test_fields_limit_the_generated_json(app_module, client):
+    response = client.post('/api/generate_wordcloud?fields=word_frequencies,top_words',
+                           json={'text': GENERATE_TEXT})
+    unknown = client.post('/api/generate_wordcloud?fields=word_frequencies,colour', json={'text': GENERATE_TEXT})
+
+    data = response.get_json()
+    assert {'word_frequencies', 'top_words'} <= set(data)
+    assert not {'image_url', 'sentiment_analysis', 'text_statistics'} & set(data)
+    assert unknown.status_code == 400
+
+
+# Image cache
+
+def test_image_cache_evicts_expired_then_least_recently_used(tmp_path):
+    from utils.blob_store import LocalBlobCache
+
+    cache = LocalBlobCache(str(tmp_path), max_bytes=250, max_age=3600, evict_interval=3600)
+    now = time.time()
+    hashes = [cache.put(bytes([i]) * 100) for i in range(4)]
+    for age, blob_hash in zip((7200, 300, 200, 100), hashes):
+        os.utime(cache.local_path(blob_hash), (now - age, now - age))
+    # Reading the oldest unexpired blob makes it the most recently used
+    assert cache.get(hashes[1]) == bytes([1]) * 100
+
+    assert cache.evict() == 2
+    assert [cache.exists(blob_hash) for blob_hash in hashes] == [False, True, False, True]
+
+
+def test_image_cache_put_runs_an_eviction_pass(tmp_path):
+    from utils.blob_store import LocalBlobCache
+
+    cache = LocalBlobCache(str(tmp_path), max_bytes=150, evict_interval=0)
+    first = cache.put(b'a' * 100)
+    os.utime(cache.local_path(first), (time.time() - 60, time.time() - 60))
+
+    second = cache.put(b'b' * 100)
+
+    assert not cache.exists(first)
+    assert cache.exists(second)
+
+
+def test_generated_images_go_to_the_cache_not_the_permanent_store(app_module, client):
+    from utils.blob_store import BlobStore
+
+    response = client.post('/api/generate_wordcloud?fields=image', json={'text': GENERATE_TEXT})
+    image_hash = response.get_json()['image_hash']
+    saved_hash = BlobStore.content_hash(b'saved image')
+    with app_module.app.app_context():
+        assert app_module.get_image_cache().exists(image_hash)
+        assert not app_module.get_blob_store().exists(image_hash)
+        app_module.get_blob_store().put(b'saved image')
+
+    assert client.get(f'/api/images/{image_hash}').mimetype == 'image/png'
+    assert client.get(f'/api/images/{saved_hash}').data == b'saved image'
+    assert client.get(f"/api/images/{'0' * 64}").status_code == 404
+    assert client.get('/api/images/not-a-hash').status_code == 404
+
+
+# Batch URL endpoint
+
+def test_process_urls_fetches_duplicates_once(client, stand_in):
+    StandInHandler.requests_seen.clear()
+    response = client.post('/api/process_urls', json={'urls': [
+        f'{stand_in}/plain', f'{stand_in}/plain#intro', f'{stand_in}/plain'
+    ]})
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert [result['url'] for result in body['results']] == [f'{stand_in}/plain']
+    assert body['duplicates'] == 2
+    assert body['word_frequencies']['world'] == 1
+    assert [path for path, _ in StandInHandler.requests_seen].count('/plain') <= 1
+
+
+def test_process_urls_reports_partial_failure(client, stand_in):
+    response = client.post('/api/process_urls', json={'urls': [f'{stand_in}/missing', f'{stand_in}/etag']})
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body['success']
+    assert (body['fetched'], body['failed']) == (1, 1)
+    assert body['results'][0]['error'].startswith('Error fetching URL')
+    assert 'cloud' in body['word_frequencies']
+
+
+def test_process_urls_times_out_slow_pages(app_module, client, stand_in, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'URL_BATCH_TIMEOUT', 0.5)
+
+    response = client.post('/api/process_urls', json={'urls': [f'{stand_in}/slow', f'{stand_in}/last-modified']})
+    results = response.get_json()['results']
+
+    assert response.status_code == 200
+    assert [result['success'] for result in results] == [False, True]
+    assert results[0]['error'] == 'Timed out after 0.5 seconds'
+
+
+# Admission control
+
+def test_token_bucket_spends_refills_and_reports_the_wait(monkeypatch):
+    import utils.admission as admission
+
+    clock = [100.0]
+    monkeypatch.setattr(admission.time, 'monotonic', lambda: clock[0])
+    buckets = admission.TokenBuckets(rate=2.0, capacity=4.0)
+
+    assert buckets.take('a', 3.0) == 0
+    assert buckets.take('a', 3.0) == pytest.approx(1.0)
+    assert buckets.take('b', 3.0) == 0
+    clock[0] += 1.0
+    assert buckets.take('a', 3.0) == 0
+
+
+def test_token_bucket_refund_is_capped_at_capacity():
+    from utils.admission import TokenBuckets
+
+    buckets = TokenBuckets(rate=0.001, capacity=4.0)
+    buckets.take('a', 3.0)
+    buckets.refund('a', 3.0)
+    buckets.refund('a', 3.0)
+
+    assert buckets.take('a', 4.0) == 0
+    assert buckets.take('a', 0.5) > 0
+
+
+def test_lane_queues_then_rejects_and_times_out():
+    from utils.admission import Lane
+
+    lane = Lane('heavy', max_concurrent=1, max_queue=1, timeout=0.1)
+    assert lane.acquire()
+
+    waiter = threading.Thread(target=lambda: results.append(lane.acquire()))
+    results = []
+    waiter.start()
+    while lane.stats()['waiting'] == 0:
+        time.sleep(0.01)
+    assert not lane.acquire()
+    waiter.join()
+
+    assert results == [False]
+    assert lane.stats()['rejected'] == 1 and lane.stats()['timed_out'] == 1
+    lane.release(2.0)
+    assert lane.acquire()
+    assert lane.retry_after() >= 1
+
+
+def test_admission_throttles_with_429_and_refunds_on_503():
+    from utils.admission import AdmissionController, AdmissionRejected, Lane, TokenBuckets
+
+    buckets = TokenBuckets(rate=0.5, capacity=1.0)
+    controller = AdmissionController(buckets, Lane('heavy', 1, 0, 0.1), Lane('light', 1, 0, 0.1), heavy_cost=0.5)
+
+    heavy = controller.admit('a', 0.6)
+    with pytest.raises(AdmissionRejected) as busy:
+        controller.admit('b', 0.6)
+    assert (busy.value.status, busy.value.retry_after) == (503, 1)
+    # b never ran, so its bucket is full again
+    assert buckets.take('b', 1.0) == 0
+
+    with pytest.raises(AdmissionRejected) as throttled:
+        controller.admit('a', 0.6)
+    assert throttled.value.status == 429
+    assert throttled.value.retry_after == 1
+    controller.release(heavy, time.perf_counter())
+    assert controller.stats()['throttled'] == 1
+
+
+def test_requests_are_limited_per_forwarded_client(app_module, client, monkeypatch):
+    from utils.admission import AdmissionController, Lane, TokenBuckets
+
+    controller = AdmissionController(TokenBuckets(rate=0.001, capacity=0.01),
+                                     Lane('heavy', 1, 0, 0.1), Lane('light', 4, 0, 0.1))
+    monkeypatch.setitem(app_module.app.extensions, 'admission', controller)
+
+    def status(client_address):
+        return client.get('/api/wordclouds', headers={'X-Forwarded-For': client_address}).status_code
+
+    assert status('203.0.113.1') == 200
+    throttled = client.get('/api/wordclouds', headers={'X-Forwarded-For': '203.0.113.1'})
+    assert status('203.0.113.2') == 200
+
+    assert throttled.status_code == 429
+    assert int(throttled.headers['Retry-After']) >= 1
+
+
+# Prometheus metrics
+
+def test_counters_merge_threads_and_escape_labels():
+    from utils.metrics import Registry
+
+    registry = Registry()
+    requests_total = registry.counter('test_requests_total', 'Requests.', ('endpoint',))
+    workers = [threading.Thread(target=requests_total.inc, kwargs={'endpoint': 'generate'}) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    requests_total.inc(2, endpoint='say "hi"\n')
+
+    assert registry.expose().splitlines() == [
+        '# HELP test_requests_total Requests.',
+        '# TYPE test_requests_total counter',
+        'test_requests_total{endpoint="generate"} 3',
+        'test_requests_total{endpoint="say \\"hi\\"\\n"} 2'
+    ]
+
+
+def test_histograms_expose_cumulative_buckets():
+    from utils.metrics import Registry
+
+    registry = Registry()
+    latency = registry.histogram('test_seconds', 'Latency.', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value)
+
+    assert registry.expose().splitlines()[2:] == [
+        'test_seconds_bucket{le="0.1"} 1',
+        'test_seconds_bucket{le="1"} 3',
+        'test_seconds_bucket{le="+Inf"} 4',
+        'test_seconds_sum 6.05',
+        'test_seconds_count 4'
+    ]
+
+
+def test_failing_collectors_do_not_break_the_scrape():
+    from utils.metrics import Registry
+
+    def broken():
+        raise RuntimeError('gone')
+
+    registry = Registry()
+    registry.register_collector(lambda: [('test_queue_depth', 'gauge', 'Queued.', [({'queue': 'analytics'}, 7)])])
+
+    assert registry.expose(extra_collectors=[broken]).splitlines() == [
+        '# HELP test_queue_depth Queued.',
+        '# TYPE test_queue_depth gauge',
+        'test_queue_depth{queue="analytics"} 7'
+    ]
+
+
+def test_metrics_endpoint_serves_the_exposition_format(app_module, client):
+    from utils.metrics import CONTENT_TYPE
+
+    client.get('/api/wordclouds')
+    response = client.get('/metrics')
+
+    assert response.headers['Content-Type'] == CONTENT_TYPE
+    assert 'wordcloud_http_requests_total{endpoint="list_wordclouds",method="GET",status="200"}' in response.get_data(as_text=True)
+
+
+def test_process_collector_skips_rss_without_a_source(monkeypatch):
+    import builtins
+    import utils.metrics as metrics
+
+    real_open = builtins.open
+
+    def no_proc(path, *args, **kwargs):
+        if path == '/proc/self/statm':
+            raise FileNotFoundError(path)
+        return real_open(path, *args, **kwargs)
+
+    # As on Windows: no /proc and no resource module
+    monkeypatch.setattr(builtins, 'open', no_proc)
+    monkeypatch.setattr(metrics, 'resource', None)
+    names = [name for name, *_ in metrics._process()]
+
+    assert 'process_resident_memory_bytes' not in names
+    assert 'process_cpu_seconds_total' in names
+
+
+def test_analytics_stages_report_their_metric_names():
+    from utils.budget import AnalyticsStage, BudgetScheduler
+    from utils.metrics import record_stages
+
+    stages = [AnalyticsStage('text_statistics', lambda: {}, priority=1, cost_ms=0, metric_name='stats'),
+              AnalyticsStage('word_context', lambda: {}, priority=2, cost_ms=0)]
+    with record_stages() as observed:
+        results, report = BudgetScheduler().run(stages, text_length=10)
+
+    assert [stage for stage, *_ in observed] == ['stats', 'word_context']
+    assert set(results) == set(report['stages']) == {'text_statistics', 'word_context'}
+
+
+# Structured logging
+
+def _queued_logger(name, queue_size=10):
+    import logging
+    import queue
+    from utils.structured_logging import DroppingQueueHandler
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger, handler
+
+
+def test_json_log_lines_keep_request_id_fields_and_traceback():
+    import json
+    from utils.structured_logging import JsonFormatter, log_fields, request_id_var
+
+    logger, handler = _queued_logger('test.structured.json')
+    token = request_id_var.set('req-42')
+    try:
+        try:
+            raise ValueError('bad layout')
+        except ValueError:
+            logger.exception('Generation failed for %s', 'cloud-7', extra=log_fields(words=12))
+    finally:
+        request_id_var.reset(token)
+
+    # Formatted as the listener thread would, after the queue handler prepared it
+    entry = json.loads(JsonFormatter().format(handler.queue.get_nowait()))
+
+    assert entry['request_id'] == 'req-42'
+    assert entry['message'] == 'Generation failed for cloud-7'
+    assert entry['level'] == 'ERROR'
+    assert entry['words'] == 12
+    assert entry['exception'].startswith('Traceback') and 'ValueError: bad layout' in entry['exception']
+    assert 'exc_text' not in entry
+
+
+def test_full_log_queue_drops_and_counts_records():
+    logger, handler = _queued_logger('test.structured.full', queue_size=2)
+
+    for number in range(5):
+        logger.info('record %d', number)
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_debug_sampler_is_off_unless_debug_and_samples_every_nth():
+    import logging
+    from utils.structured_logging import DebugSampler
+
+    logger = logging.getLogger('test.structured.sampler')
+    logger.setLevel(logging.INFO)
+    assert not DebugSampler(logger, 3)
+
+    logger.setLevel(logging.DEBUG)
+    sample = DebugSampler(logger, 3)
+    assert sample
+    assert [sample.hit() for _ in range(7)] == [True, False, False, True, False, False, True]
+    assert DebugSampler(logger, 0).every == 1
+
+
+# Request profiling
+
+def _profiled_work():
+    from utils.metrics import stage_timer
+
+    with stage_timer('count'):
+        deadline = time.perf_counter() + 0.1
+        while time.perf_counter() < deadline:
+            sorted(str(number) for number in range(500))
+
+
+@pytest.mark.parametrize('mode', ['cprofile', 'sampling'])
+def test_request_profile_reports_functions_stages_and_memory(mode):
+    from utils.profiling import RequestProfile
+
+    profile = RequestProfile(mode, 'requested', endpoint='generate_advanced_wordcloud')
+    assert profile.start()
+    # One request at a time holds the profilers
+    assert not RequestProfile(mode, 'sampled').start()
+    _profiled_work()
+    result = profile.finish(200)
+
+    assert (result['mode'], result['status']) == (mode, 200)
+    assert [stage['stage'] for stage in result['stages']] == ['count']
+    assert result['memory']['scope'] == 'process' and result['memory']['peak_bytes'] >= 0
+    assert result['profile']['top_functions']
+    if mode == 'sampling':
+        assert result['profile']['samples'] > 0
+        assert any('_profiled_work' in stack for stack in result['profile']['collapsed_stacks'])
+    else:
+        assert '_profiled_work' in result['profile']['text']
+
+
+def test_failed_profile_start_releases_the_profilers(monkeypatch):
+    import tracemalloc
+    import utils.profiling as profiling
+
+    def broken_recorder():
+        raise RuntimeError('recorder unavailable')
+
+    was_tracing = tracemalloc.is_tracing()
+    monkeypatch.setattr(profiling, 'record_stages', broken_recorder)
+    with pytest.raises(RuntimeError):
+        profiling.RequestProfile('cprofile', 'requested').start()
+    assert tracemalloc.is_tracing() == was_tracing
+
+    monkeypatch.undo()
+    profile = profiling.RequestProfile('sampling', 'requested')
+    assert profile.start()
+    profile.finish()
+
+
+def test_profile_admin_needs_the_configured_token(app_module, monkeypatch):
+    app = app_module.app
+
+    monkeypatch.setitem(app.config, 'PROFILE_ADMIN_TOKEN', None)
+    with app.test_request_context(headers={'X-Admin-Token': ''}):
+        assert not app_module._is_profile_admin()
+
+    monkeypatch.setitem(app.config, 'PROFILE_ADMIN_TOKEN', 's3cret')
+    with app.test_request_context():
+        assert not app_module._is_profile_admin()
+    with app.test_request_context(headers={'X-Admin-Token': 'guess'}):
+        assert not app_module._is_profile_admin()
+    with app.test_request_context(headers={'X-Admin-Token': 's3cret'}):
+        assert app_module._is_profile_admin()
+
+
+@pytest.mark.parametrize('mode', ['cprofile', 'sampling'])
+def test_admin_endpoints_serve_stored_profiles(app_module, client, monkeypatch, mode):
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_ADMIN_TOKEN', 's3cret')
+    admin = {'X-Admin-Token': 's3cret'}
+
+    # Profiling is disabled, but the admin token authorizes opting in
+    assert 'X-Profile-ID' not in client.get('/api/wordclouds', headers={'X-Profile': mode}).headers
+    profile_id = client.get('/api/wordclouds', headers={'X-Profile': mode, **admin}).headers['X-Profile-ID']
+
+    assert client.get('/api/admin/profiles').status_code == 403
+    assert client.get(f'/api/admin/profiles/{profile_id}', headers={'X-Admin-Token': 'guess'}).status_code == 403
+
+    listed = client.get('/api/admin/profiles', headers=admin).get_json()['profiles']
+    assert profile_id in [summary['id'] for summary in listed]
+    assert all('profile' not in summary for summary in listed)
+
+    stored = client.get(f'/api/admin/profiles/{profile_id}', headers=admin).get_json()['profile']
+    assert (stored['mode'], stored['endpoint'], stored['status']) == (mode, 'list_wordclouds', 200)
+
+    text = client.get(f'/api/admin/profiles/{profile_id}?format=text', headers=admin)
+    assert text.mimetype == 'text/plain'
+    assert client.get(f'/api/admin/profiles/{"0" * 32}', headers=admin).status_code == 404
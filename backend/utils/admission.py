@@ -0,0 +1,360 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rough cost of a request in CPU seconds on the reference server, per
+# endpoint before size adjustments. Anything unlisted is cheap.
+ENDPOINT_BASE_COSTS = {
+    'generate_advanced_wordcloud': 0.3,
+    'test_simple_wordcloud': 0.3,
+    'upload_file': 0.2,
+    'process_url': 0.5,
+    'process_urls': 0.2,  # Per URL
+    'recolor_wordcloud': 0.1,
+    'export_wordcloud': 0.02,
+    'mask_preview': 0.02
+}
+DEFAULT_COST = 0.01
+
+# Requests estimated at this cost or more go through the heavy lane
+HEAVY_COST = 0.25
+
+# Never admission-controlled, so monitoring keeps working under load
+EXEMPT_ENDPOINTS = {'health_check', 'metrics', 'static'}
+
+# Processing cost of text per 100k characters, and the extra for lemmatizing
+TEXT_COST_PER_100K = 0.5
+LEMMATIZE_COST_PER_100K = 0.5
+# Extracting text from an upload, per MB
+UPLOAD_COST_PER_MB = 1.0
+
+
+def estimate_cost(endpoint: Optional[str], payload: Optional[Dict] = None,
+                  content_length: int = 0, args: Optional[Dict] = None) -> float:
+    """
+    Estimate what a request will cost before running it.
+
+    Text endpoints scale with the text length, lemmatizing, the optional
+    analytics and the canvas size; uploads with the body size; PNG exports
+    and recolors with the square of the requested DPI.
+
+    Args:
+        endpoint: Flask endpoint name
+        payload: Parsed JSON body, if any
+        content_length: Request body size in bytes
+        args: Query string parameters
+
+    Returns:
+        Estimated cost in approximate CPU seconds
+    """
+    cost = ENDPOINT_BASE_COSTS.get(endpoint, DEFAULT_COST)
+    payload = payload if isinstance(payload, dict) else {}
+    args = args or {}
+
+    if endpoint in ('generate_advanced_wordcloud', 'test_simple_wordcloud'):
+        settings = payload.get('settings') if isinstance(payload.get('settings'), dict) else {}
+        text = payload.get('text')
+        units = (len(text) if isinstance(text, str) else content_length) / 100000.0
+        cost += units * TEXT_COST_PER_100K
+        if settings.get('lemmatize'):
+            cost += units * LEMMATIZE_COST_PER_100K
+        if settings.get('cloud_mode') in ('phrases', 'entities'):
+            cost += units * TEXT_COST_PER_100K
+        cost += 0.1 * len(settings.get('extra_analytics') or [])
+        try:
+            area = float(settings.get('width', 800)) * float(settings.get('height', 600)) / (800 * 600)
+            words = float(settings.get('max_words', 200)) / 200
+            cost *= max(1.0, area, words)
+        except (TypeError, ValueError):
+            pass
+    elif endpoint == 'process_urls':
+        urls = payload.get('urls')
+        cost *= max(1, len(urls) if isinstance(urls, list) else 1)
+    elif endpoint == 'upload_file':
+        cost += content_length / (1024.0 * 1024.0) * UPLOAD_COST_PER_MB
+    elif endpoint in ('export_wordcloud', 'recolor_wordcloud'):
+        try:
+            dpi = float(args.get('dpi') or payload.get('dpi') or 72)
+        except (TypeError, ValueError):
+            dpi = 72
+        cost *= max(1.0, (dpi / 72.0) ** 2)
+    return cost
+
+
+class TokenBuckets:
+    """
+    In-process token buckets, one per client.
+
+    Each client earns `rate` cost units per second up to `capacity`; a
+    request spends its estimated cost. The least recently seen clients are
+    forgotten beyond max_clients, which only ever refills their bucket.
+    """
+
+    def __init__(self, rate: float, capacity: float, max_clients: int = 10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client: str, cost: float) -> float:
+        """
+        Spend tokens for a request.
+
+        Returns:
+            0 if the request may proceed, otherwise seconds until it could
+        """
+        cost = min(cost, self.capacity)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def refund(self, client: str, cost: float) -> None:
+        """Give back the tokens of a request that was turned away after take()."""
+        with self._lock:
+            state = self._buckets.get(client)
+            if state is not None:
+                tokens, updated = state
+                self._buckets[client] = (min(self.capacity, tokens + min(cost, self.capacity)), updated)
+
+
+# Refill and spend a bucket atomically on the Redis server, using its clock
+# so every node agrees. Returns the wait in seconds as a string, since Lua
+# numbers come back from Redis truncated to integers.
+_REDIS_TAKE = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+# Give tokens back, capped at the capacity; a bucket that expired meanwhile
+# is already full
+_REDIS_REFUND = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    redis.call('HSET', KEYS[1], 'tokens', math.min(tonumber(ARGV[1]), tokens + tonumber(ARGV[2])))
+end
+return 0
+"""
+
+
+class RedisTokenBuckets:
+    """
+    Token buckets kept in Redis, so limits hold across several nodes.
+
+    Same interface as TokenBuckets. If Redis is unreachable requests are
+    let through rather than failing.
+    """
+
+    def __init__(self, client, rate: float, capacity: float, prefix: str = 'admission:bucket:'):
+        """
+        Args:
+            client: redis.Redis connection
+            rate: Cost units earned per second
+            capacity: Bucket size in cost units
+            prefix: Key prefix for the per-client hashes
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.prefix = prefix
+        self._take = client.register_script(_REDIS_TAKE)
+        self._refund = client.register_script(_REDIS_REFUND)
+
+    def take(self, client: str, cost: float) -> float:
+        try:
+            wait = self._take(keys=[self.prefix + client], args=[self.rate, self.capacity, min(cost, self.capacity)])
+        except Exception as e:
+            logger.warning(f"Redis token bucket unavailable, admitting request: {str(e)}")
+            return 0.0
+        return float(wait)
+
+    def refund(self, client: str, cost: float) -> None:
+        try:
+            self._refund(keys=[self.prefix + client], args=[self.capacity, min(cost, self.capacity)])
+        except Exception as e:
+            logger.warning(f"Redis token bucket unavailable, tokens not refunded: {str(e)}")
+
+
+class Lane:
+    """
+    Concurrency limit with a bounded wait queue.
+
+    Up to max_concurrent requests run at once; up to max_queue more wait
+    for a slot, for at most `timeout` seconds. Anything beyond that is
+    rejected straight away. Waiting requests still hold a server thread,
+    so the queue is kept short.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, timeout: float):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._average_duration = 1.0
+        self._counters = {'admitted': 0, 'rejected': 0, 'timed_out': 0}
+
+    def acquire(self) -> bool:
+        """Take a slot, waiting in the queue if needed; False if rejected."""
+        with self._cond:
+            if self._active < self.max_concurrent and not self._waiting:
+                self._active += 1
+                self._counters['admitted'] += 1
+                return True
+            if self._waiting >= self.max_queue:
+                self._counters['rejected'] += 1
+                return False
+
+            self._waiting += 1
+            deadline = time.monotonic() + self.timeout
+            try:
+                while self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timed_out'] += 1
+                        return False
+                    self._cond.wait(remaining)
+                self._active += 1
+                self._counters['admitted'] += 1
+                return True
+            finally:
+                self._waiting -= 1
+
+    def release(self, duration: float) -> None:
+        """Free a slot; duration feeds the Retry-After estimate."""
+        with self._cond:
+            self._active -= 1
+            self._average_duration = 0.8 * self._average_duration + 0.2 * duration
+            self._cond.notify()
+
+    def retry_after(self) -> int:
+        """Seconds until a rejected request is likely to get a slot."""
+        with self._cond:
+            backlog = (self._waiting + 1) / float(self.max_concurrent)
+            return max(1, math.ceil(self._average_duration * backlog))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(
+                self._counters,
+                active=self._active,
+                waiting=self._waiting,
+                max_concurrent=self.max_concurrent,
+                max_queue=self.max_queue
+            )
+
+
+class AdmissionRejected(Exception):
+    """A request was not admitted; carries the HTTP status and Retry-After."""
+
+    def __init__(self, status: int, retry_after: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Decides whether a request runs now, waits, or is turned away.
+
+    Each request spends its estimated cost from the client's token bucket
+    (429 when empty), then takes a slot in the heavy or light lane by cost
+    (503 when the lane and its queue are full, with the tokens refunded,
+    since the request never ran). Heavy work is capped below the server's
+    thread count, so light endpoints always find a thread.
+    """
+
+    def __init__(self, buckets, heavy: Lane, light: Lane, heavy_cost: float = HEAVY_COST):
+        """
+        Args:
+            buckets: TokenBuckets or RedisTokenBuckets
+            heavy: Lane for requests costing heavy_cost or more
+            light: Lane for everything else
+            heavy_cost: Cost threshold between the lanes
+        """
+        self.buckets = buckets
+        self.lanes = {'heavy': heavy, 'light': light}
+        self.heavy_cost = heavy_cost
+        self._lock = threading.Lock()
+        self._throttled = 0
+
+    def admit(self, client: str, cost: float) -> Lane:
+        """
+        Admit a request or raise AdmissionRejected.
+
+        Returns:
+            The lane holding the request's slot; pass it to release()
+        """
+        wait = self.buckets.take(client, cost)
+        if wait > 0:
+            with self._lock:
+                self._throttled += 1
+            raise AdmissionRejected(429, max(1, math.ceil(wait)), 'Too many requests, please slow down')
+
+        lane = self.lanes['heavy' if cost >= self.heavy_cost else 'light']
+        if not lane.acquire():
+            self.buckets.refund(client, cost)
+            raise AdmissionRejected(503, lane.retry_after(), 'Server is busy, please retry shortly')
+        return lane
+
+    @staticmethod
+    def release(lane: Lane, started: float) -> None:
+        lane.release(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            throttled = self._throttled
+        return {'throttled': throttled, **{name: lane.stats() for name, lane in self.lanes.items()}}
+
+
+def admission_from_config(config: Dict[str, Any]) -> AdmissionController:
+    """
+    Build the controller from Flask config.
+
+    ADMISSION_REDIS_URL switches the token buckets to Redis; the lanes are
+    always per process, since they guard this process's threads.
+    """
+    rate = config['ADMISSION_RATE']
+    burst = config['ADMISSION_BURST']
+    if config.get('ADMISSION_REDIS_URL'):
+        import redis
+        buckets = RedisTokenBuckets(redis.Redis.from_url(config['ADMISSION_REDIS_URL']), rate, burst)
+    else:
+        buckets = TokenBuckets(rate, burst)
+
+    timeout = config['ADMISSION_QUEUE_TIMEOUT']
+    heavy = Lane('heavy', config['ADMISSION_HEAVY_CONCURRENCY'], config['ADMISSION_HEAVY_QUEUE'], timeout)
+    light = Lane('light', config['ADMISSION_LIGHT_CONCURRENCY'], config['ADMISSION_LIGHT_QUEUE'], timeout)
+    return AdmissionController(buckets, heavy, light)
@@ -4,6 +4,8 @@ import base64
 import io
 import json
 import time
+import hashlib
+import logging
 from collections import Counter, defaultdict
 from typing import Dict, List, Optional, Tuple, Any
 import numpy as np
@@ -48,6 +50,16 @@ from wordcloud import WordCloud, STOPWORDS
 
 # Import WordCloudProcessor
 from utils.wordcloud_processor import WordCloudProcessor
+from utils.topic_service import TopicModelService
+from utils.keyword_index import DocumentFrequencyTable, candidate_terms
+from utils.phrase_extractor import PhraseExtractor
+from utils.entity_extractor import EntityExtractor
+from utils.budget import AnalyticsStage, BudgetScheduler, parse_budget_ms
+from utils.cloud_layout import layout_from_wordcloud
+from utils.metrics import observe_stage, stage_timer
+from utils.structured_logging import DebugSampler, log_fields
+
+logger = logging.getLogger(__name__)
 
 def convert_numpy_types(obj):
     """Convert numpy data types to native Python types for JSON serialization."""
@@ -66,6 +78,37 @@ def convert_numpy_types(obj):
     else:
         return obj
 
+# Parts of a generate response a client can select with fields=
+RESPONSE_FIELDS = (
+    'image', 'word_frequencies', 'top_words', 'text_statistics', 'word_context',
+    'sentiment_analysis', 'readability', 'keywords', 'topics', 'entities', 'budget'
+)
+
+# Bump when rendering changes so cached results and ETags are invalidated
+RENDER_VERSION = 1
+
+def generation_fingerprint(text: str, settings: Dict) -> str:
+    """SHA-256 over the text, canonical settings and renderer version."""
+    digest = hashlib.sha256()
+    digest.update(f'v{RENDER_VERSION}\0'.encode('utf-8'))
+    digest.update(json.dumps(settings, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+def resolve_seed(text: str, settings: Dict) -> int:
+    """
+    Return the layout/coloring seed for a request.
+    
+    An explicit 'seed' setting wins; otherwise the seed is derived from the
+    inputs, so identical requests render identical images.
+    """
+    seed = settings.get('seed')
+    if seed is not None:
+        return int(seed)
+    unseeded = {key: value for key, value in settings.items() if key != 'seed'}
+    return int(generation_fingerprint(text, unseeded)[:8], 16)
+
 class AdvancedWordCloudProcessor:
     """Advanced processing for word clouds with additional analytics."""
     
@@ -87,19 +130,31 @@ class AdvancedWordCloudProcessor:
         self.resources_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'resources')
         os.makedirs(self.resources_path, exist_ok=True)
         
+        # Shared topic model, trained across submitted documents
+        self.topic_service = TopicModelService(os.path.join(self.resources_path, 'topic_models'))
+        
+        # Corpus document frequencies for TF-IDF keyword scoring
+        self.keyword_index = DocumentFrequencyTable(os.path.join(self.resources_path, 'keyword_index', 'df_table.npz'))
+        
+        # Batched named-entity tagging with a per-sentence cache
+        self.entity_extractor = EntityExtractor()
+        
     def _ensure_nltk_resources(self):
         """Ensure required NLTK resources are downloaded."""
         resources = [
             ('punkt', 'tokenizers/punkt'),
             ('stopwords', 'corpora/stopwords'),
-            ('wordnet', 'corpora/wordnet')
+            ('wordnet', 'corpora/wordnet'),
+            ('averaged_perceptron_tagger_eng', 'taggers/averaged_perceptron_tagger_eng'),
+            ('maxent_ne_chunker_tab', 'chunkers/maxent_ne_chunker_tab'),
+            ('words', 'corpora/words')
         ]
         
         for name, path in resources:
             try:
                 nltk.data.find(path)
             except LookupError:
-                print(f"Downloading NLTK resource: {name}")
+                logger.info("Downloading NLTK resource", extra=log_fields(resource=name))
                 nltk.download(name, quiet=True)
     
     def detect_language(self, text: str) -> str:
@@ -107,7 +162,7 @@ class AdvancedWordCloudProcessor:
         try:
             return detect(text)
         except Exception as e:
-            print(f"DEBUG: Language detection failed: {e}")
+            logger.debug("Language detection failed", extra=log_fields(error=str(e)))
             return 'en'
     
     def preprocess_text(self, text: str, remove_stopwords: bool = True, 
@@ -146,107 +201,61 @@ class AdvancedWordCloudProcessor:
         
         return tokens
     
-    def extract_entities(self, text: str) -> Dict[str, List[str]]:
-        """Extract named entities from text."""
+    def extract_entities(self, text: str, time_budget: float = None) -> Dict[str, List[str]]:
+        """
+        Extract named entities from text, most frequent first per entity type.
+
+        Raises:
+            EntityTaggingError: If tagging failed; the caller reports it
+                rather than returning an empty result
+        """
         try:
-            tokens = word_tokenize(text)
-            pos_tags = pos_tag(tokens)
-            named_entities = ne_chunk(pos_tags)
-            
-            entities = defaultdict(list)
-            for chunk in named_entities:
-                if hasattr(chunk, 'label'):
-                    entity_type = chunk.label()
-                    entity_text = ' '.join(c[0] for c in chunk.leaves())
-                    entities[entity_type].append(entity_text)
-            
-            return dict(entities)
+            result = self.entity_extractor.extract(text, time_budget=time_budget)
         except Exception as e:
-            print(f"DEBUG: Entity extraction failed: {e}")
-            return {}
+            logger.error("Entity extraction failed", extra=log_fields(error=str(e)))
+            raise
+        return {
+            entity_type: [name for name, _ in sorted(counts.items(), key=lambda x: x[1], reverse=True)]
+            for entity_type, counts in result['entities'].items()
+        }
     
     def extract_keywords(self, text: str, top_k: int = 20) -> List[Tuple[str, float]]:
-        """Extract keywords using TF-IDF."""
+        """Extract keywords using TF-IDF against the corpus document frequencies."""
         try:
-            # Preprocess text
-            processed_text = ' '.join(self.preprocess_text(text, lemmatize=True))
-            
-            # Create TF-IDF vectorizer
-            vectorizer = TfidfVectorizer(
-                max_features=top_k,
-                stop_words='english',
-                ngram_range=(1, 2)
-            )
-            
-            tfidf_matrix = vectorizer.fit_transform([processed_text])
-            feature_names = vectorizer.get_feature_names_out()
-            
-            # Get TF-IDF scores
-            scores = tfidf_matrix.toarray()[0]
+            # Unigram and bigram candidates from the preprocessed token stream
+            terms = candidate_terms(self.preprocess_text(text, lemmatize=True), max_ngram=2)
             
-            # Create keyword-score pairs
-            keywords = list(zip(feature_names, scores))
-            keywords.sort(key=lambda x: x[1], reverse=True)
+            self.keyword_index.add_document(terms)
             
-            return keywords
+            return self.keyword_index.score(terms, top_k=top_k)
         except Exception as e:
-            print(f"DEBUG: Keyword extraction failed: {e}")
+            logger.warning("Keyword extraction failed", extra=log_fields(error=str(e)))
             return []
     
     def perform_topic_modeling(self, text: str, num_topics: int = 5) -> Dict[str, Any]:
-        """Perform topic modeling using LDA."""
+        """
+        Infer topics for the text with the shared topic model.
+        
+        The document is also recorded for the next background retrain.
+        Until enough documents have been collected no model exists and
+        an empty topic list is returned.
+        """
         try:
             # Preprocess text
             tokens = self.preprocess_text(text, lemmatize=True)
             
             if len(tokens) < 10:
-                return {'topics': [], 'coherence': 0.0, 'num_topics': 0}
+                return {'topics': [], 'coherence': 0.0, 'num_topics': 0, 'model_version': self.topic_service.version}
             
-            # Create dictionary
-            dictionary = corpora.Dictionary([tokens])
-            
-            # Create document-term matrix
-            doc_term_matrix = [dictionary.doc2bow(tokens)]
-            
-            # Train LDA model
-            lda_model = LdaModel(
-                doc_term_matrix,
-                num_topics=num_topics,
-                id2word=dictionary,
-                passes=15,
-                random_state=42
-            )
-            
-            # Extract topics
-            topics = []
-            for topic_id, topic in lda_model.show_topics(num_topics=num_topics, num_words=10, formatted=False):
-                topic_words = [word for word, _ in topic]
-                topics.append({
-                    'topic_id': topic_id,
-                    'words': topic_words
-                })
-            
-            # Calculate coherence
-            try:
-                coherence_model = CoherenceModel(
-                    model=lda_model, 
-                    texts=[tokens], 
-                    dictionary=dictionary, 
-                    coherence='c_v'
-                )
-                coherence = coherence_model.get_coherence()
-            except Exception as e:
-                print(f"DEBUG: Coherence calculation failed: {e}")
-                coherence = 0.0
+            self.topic_service.add_document(tokens)
             
-            return {
-                'topics': topics,
-                'coherence': coherence,
-                'num_topics': len(topics)
-            }
+            result = self.topic_service.infer(tokens, num_words=10)
+            result['topics'] = result['topics'][:num_topics]
+            result['num_topics'] = len(result['topics'])
+            return result
         except Exception as e:
-            print(f"DEBUG: Topic modeling failed: {e}")
-            return {'topics': [], 'coherence': 0.0, 'num_topics': 0}
+            logger.warning("Topic modeling failed", extra=log_fields(error=str(e)))
+            return {'topics': [], 'coherence': 0.0, 'num_topics': 0, 'model_version': None}
     
     def analyze_readability(self, text: str) -> Dict[str, float]:
         """Analyze text readability using multiple metrics."""
@@ -266,7 +275,7 @@ class AdvancedWordCloudProcessor:
                 'sentence_count': textstat.sentence_count(text)
             }
         except Exception as e:
-            print(f"DEBUG: Readability analysis failed: {e}")
+            logger.warning("Readability analysis failed", extra=log_fields(error=str(e)))
             return {
                 'flesch_reading_ease': 0.0,
                 'flesch_kincaid_grade': 0.0,
@@ -304,7 +313,7 @@ class AdvancedWordCloudProcessor:
                         'subjectivity': sentence_blob.sentiment.subjectivity
                     })
                 except Exception as e:
-                    print(f"DEBUG: Sentence sentiment analysis failed for sentence: {e}")
+                    logger.debug("Sentence sentiment analysis failed", extra=log_fields(error=str(e)))
                     continue
             
             # Sentiment categories
@@ -336,7 +345,7 @@ class AdvancedWordCloudProcessor:
                 }
             }
         except Exception as e:
-            print(f"DEBUG: Sentiment analysis failed: {e}")
+            logger.warning("Sentiment analysis failed", extra=log_fields(error=str(e)))
             return {
                 'polarity': 0.0,
                 'subjectivity': 0.0,
@@ -406,24 +415,42 @@ class AdvancedWordCloudProcessor:
         
         return f"data:image/png;base64,{img_b64}"
     
-    def generate_advanced_wordcloud(self, text: str, settings: Dict = None) -> Tuple[str, Dict]:
+    def generate_advanced_wordcloud(self, text: str, settings: Dict = None,
+                                    fields: Optional[List[str]] = None) -> Tuple[Optional[bytes], Dict]:
         """
         Generate a word cloud with comprehensive analytics.
         
         Args:
             text (str): The text to process
             settings (Dict): Dictionary of settings for customization
+            fields (List[str]): Parts of RESPONSE_FIELDS to compute; None means
+                the image and the default analytics. Stages that are not
+                selected do not run, and without 'image' nothing is rendered
             
         Returns:
-            Tuple of (image_base64, analytics_dict)
+            Tuple of (PNG image bytes or None, analytics_dict)
         """
         if not settings:
             settings = {}
             
-        print(f"DEBUG: generate_advanced_wordcloud called with settings: {settings}")
+        logger.debug("Generating advanced word cloud", extra=log_fields(text_length=len(text), settings=settings))
         
         start_time = time.time()
         
+        # The budget covers the whole request; analytics stages get what the
+        # image and frequencies leave over
+        scheduler = BudgetScheduler(settings.get('time_budget_ms'))
+        
+        # Phrase mode counts bigrams and trigrams in the same pass as words
+        cloud_mode = settings.get('cloud_mode', 'words')
+        phrase_extractor = None
+        if cloud_mode == 'phrases':
+            phrase_extractor = PhraseExtractor(
+                max_ngram=settings.get('max_ngram', 3),
+                min_count=settings.get('phrase_min_count', 2),
+                scoring=settings.get('phrase_scoring', 'npmi')
+            )
+        
         # Process text with all options
         processed_text, tokens, word_freq, sentences = self._process_text(
             text, 
@@ -433,13 +460,10 @@ class AdvancedWordCloudProcessor:
             min_word_length=settings.get('min_word_length', 2),
             remove_numbers=settings.get('remove_numbers', True),
             min_frequency=settings.get('min_frequency'),
-            max_frequency=settings.get('max_frequency')
+            max_frequency=settings.get('max_frequency'),
+            phrase_extractor=phrase_extractor
         )
         
-        # Generate word cloud using the WordCloudProcessor
-        # The wordcloud_processor.generate_wordcloud returns 5 values:
-        # (image_base64, word_frequencies, word_context, sentiment, top_words)
-        
         # Ensure min_frequency and max_frequency are properly typed or None
         min_freq = settings.get('min_frequency')
         max_freq = settings.get('max_frequency')
@@ -457,61 +481,171 @@ class AdvancedWordCloudProcessor:
             except (ValueError, TypeError):
                 max_freq = None
         
-        image_base64, wc_word_freq, wc_word_context, wc_sentiment, wc_top_words = self.wordcloud_processor.generate_wordcloud(
-            processed_text,
-            remove_stopwords=settings.get('remove_stopwords', True),
-            custom_stopwords=settings.get('custom_stopwords', []),
-            mask_shape=settings.get('mask_shape', 'none'),
-            min_frequency=min_freq,
-            max_frequency=max_freq,
-            width=settings.get('width', 800),
-            height=settings.get('height', 600),
-            color_scheme=settings.get('color_scheme', 'viridis'),
-            background_color=settings.get('background_color', 'white'),
-            prefer_horizontal=settings.get('prefer_horizontal', 0.7),
-            relative_scaling=settings.get('relative_scaling', 0.5),
-            max_words=settings.get('max_words', 200),
-            min_font_size=settings.get('min_font_size', 10),
-            max_font_size=settings.get('max_font_size', 100)
-        )
+        # Unigram counts drive the text statistics in every mode
+        token_freq = word_freq
         
-        # Extract word context
-        word_context = self._extract_word_context(word_freq, sentences)
-        
-        # Perform sentiment analysis
-        sentiment_analysis = self._analyze_sentiment(text)
+        entities = None
+        if cloud_mode == 'entities':
+            # Persons, organizations and places as separate frequency maps;
+            # the cloud shows the selected group or all of them
+            entity_budget_ms = parse_budget_ms(settings.get('entity_time_budget_ms', 5000))
+            entity_result = self.entity_extractor.extract(
+                text, time_budget=None if entity_budget_ms is None else entity_budget_ms / 1000.0
+            )
+            entities = dict(entity_result['groups'])
+            entities['partial'] = entity_result['partial']
+            
+            entity_group = settings.get('entity_group', 'all')
+            if entity_group in entity_result['groups']:
+                entity_freq = dict(entity_result['groups'][entity_group])
+            else:
+                entity_freq = {}
+                for counts in entity_result['groups'].values():
+                    for name, count in counts.items():
+                        entity_freq[name] = entity_freq.get(name, 0) + count
+            
+            word_freq = self._filter_frequencies(entity_freq, min_freq, max_freq)
+            if not word_freq:
+                raise ValueError("No named entities found in the text.")
+        elif phrase_extractor is not None:
+            word_freq = self._filter_frequencies(phrase_extractor.frequencies(), min_freq, max_freq)
+            if not word_freq:
+                raise ValueError("No words meet the frequency threshold criteria.")
+        
+        if cloud_mode in ('phrases', 'entities'):
+            cloud_freq = word_freq
+        else:
+            cloud_freq = self.wordcloud_processor.filtered_frequencies(
+                processed_text,
+                remove_stopwords=settings.get('remove_stopwords', True),
+                custom_stopwords=settings.get('custom_stopwords', []),
+                min_frequency=min_freq,
+                max_frequency=max_freq
+            )
         
-        # Calculate statistics
-        text_statistics = self._calculate_statistics(text, tokens, word_freq)
-        text_statistics['text_length'] = len(text)  # Ensure text_length is present
+        image_png = None
+        layout = None
+        if fields is None or 'image' in fields:
+            # Placement is kept so saved clouds can be recolored and re-exported
+            # without laying the words out again
+            with stage_timer('layout'):
+                wc = self.wordcloud_processor.compute_layout(
+                    cloud_freq,
+                    width=settings.get('width', 800),
+                    height=settings.get('height', 600),
+                    color_scheme=settings.get('color_scheme', 'viridis'),
+                    background_color=settings.get('background_color', 'white'),
+                    prefer_horizontal=settings.get('prefer_horizontal', 0.7),
+                    relative_scaling=settings.get('relative_scaling', 0.5),
+                    max_words=settings.get('max_words', 200),
+                    min_font_size=settings.get('min_font_size', 10),
+                    max_font_size=settings.get('max_font_size', 100),
+                    random_state=resolve_seed(text, settings)
+                )
+            with stage_timer('encode'):
+                image_png = self.wordcloud_processor.image_to_png(wc)
+            layout = layout_from_wordcloud(wc)
         
         # Extract top words
-        print(f"DEBUG: Extracting top words from word_freq: {word_freq}")
-        print(f"DEBUG: Type of first frequency value: {type(next(iter(word_freq.values()))).__name__}")
+        logger.debug("Extracting top words", extra=log_fields(unique_words=len(word_freq)))
         
         # Convert all frequency values to integers to avoid type comparison issues
         word_freq = {word: int(freq) if isinstance(freq, str) else freq for word, freq in word_freq.items()}
         
         top_words = {word: freq for word, freq in sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:50]}
         
+        # Remaining analytics run in priority order within the time budget
+        stages = self._analytics_stages(text, tokens, token_freq, word_freq, sentences, settings, fields)
+        stage_results, budget_report = scheduler.run(stages, len(text))
+        
+        text_statistics = stage_results.get('text_statistics') or {}
+        text_statistics['text_length'] = len(text)  # Ensure text_length is present
+        
         # Compile analytics
         analytics = {
             'word_frequencies': word_freq,
-            'word_context': word_context,
-            'sentiment_analysis': sentiment_analysis,
+            'word_context': stage_results.get('word_context') or {},
+            'sentiment_analysis': stage_results.get('sentiment_analysis') or {},
             'text_statistics': text_statistics,
             'top_words': top_words,
+            'budget': budget_report,
+            'layout': layout,
             'processing_time': round(time.time() - start_time, 2)
         }
+        for name in ('readability', 'keywords', 'topics', 'entities'):
+            if name in stage_results:
+                analytics[name] = stage_results[name]
+        if entities is not None:
+            analytics['entities'] = entities
         # Add mask_shape to text_statistics for frontend display
         analytics['text_statistics']['mask_shape'] = settings.get('mask_shape', 'none')
         
-        return image_base64, analytics
+        return image_png, analytics
+    
+    def _analytics_stages(self, text: str, tokens: List[str], token_freq: Dict[str, int],
+                          word_freq: Dict[str, int], sentences: List[str],
+                          settings: Dict, fields: Optional[List[str]] = None) -> List[AnalyticsStage]:
+        """
+        Declare the analytics stages for a request.
+        
+        Statistics, word context and sentiment always run when the budget
+        allows; readability, keywords, topics and entities are opt-in via
+        the extra_analytics setting. When fields are given, exactly the
+        selected stages are declared.
+        
+        Args:
+            text (str): Original input text
+            tokens (List[str]): Processed tokens
+            token_freq (Dict[str, int]): Unigram frequencies
+            word_freq (Dict[str, int]): Frequencies shown in the cloud
+            sentences (List[str]): Sentences of the text
+            settings (Dict): Request settings
+            fields (List[str]): Selected response fields, or None
+            
+        Returns:
+            List[AnalyticsStage]: Stages with priorities and cost estimates
+        """
+        stages = [
+            AnalyticsStage('text_statistics', lambda: self._calculate_statistics(text, tokens, token_freq),
+                           priority=1, cost_ms=2, cost_per_kb_ms=6, metric_name='stats'),
+            AnalyticsStage('word_context', lambda: self._extract_word_context(word_freq, sentences),
+                           priority=2, cost_ms=2, cost_per_kb_ms=3),
+            AnalyticsStage('sentiment_analysis', lambda: self._analyze_sentiment(text),
+                           priority=3, cost_ms=5, cost_per_kb_ms=12, metric_name='sentiment')
+        ]
+        
+        extras = set(settings.get('extra_analytics') or [])
+        if fields is not None:
+            extras |= set(fields)
+        if 'readability' in extras:
+            stages.append(AnalyticsStage('readability', lambda: self.analyze_readability(text),
+                                         priority=4, cost_ms=5, cost_per_kb_ms=10))
+        if 'keywords' in extras:
+            stages.append(AnalyticsStage('keywords', lambda: self.extract_keywords(text),
+                                         priority=5, cost_ms=5, cost_per_kb_ms=10))
+        if 'topics' in extras:
+            stages.append(AnalyticsStage('topics', lambda: self.perform_topic_modeling(text),
+                                         priority=6, cost_ms=10, cost_per_kb_ms=10))
+        if 'entities' in extras and settings.get('cloud_mode') != 'entities':
+            def entity_stage(remaining_ms):
+                time_budget = None if remaining_ms == float('inf') else remaining_ms / 1000.0
+                result = self.entity_extractor.extract(text, time_budget=time_budget)
+                groups = dict(result['groups'])
+                groups['partial'] = result['partial']
+                return groups, result['partial']
+            # Entities return partial results, so only a small slice is required up front
+            stages.append(AnalyticsStage('entities', entity_stage, priority=7, cost_ms=50,
+                                         accepts_budget=True))
+        
+        if fields is not None:
+            stages = [stage for stage in stages if stage.name in fields]
+        return stages
     
     def _process_text(self, text: str, remove_stopwords: bool = True, 
                       custom_stopwords: List[str] = None, lemmatize: bool = True, 
                       min_word_length: int = 2, remove_numbers: bool = True,
-                      min_frequency: Optional[int] = None, max_frequency: Optional[int] = None) -> Tuple[str, List[str], Dict[str, int], List[str]]:
+                      min_frequency: Optional[int] = None, max_frequency: Optional[int] = None,
+                      phrase_extractor: Optional[PhraseExtractor] = None) -> Tuple[str, List[str], Dict[str, int], List[str]]:
         """
         Process text with comprehensive options.
         
@@ -524,12 +658,15 @@ class AdvancedWordCloudProcessor:
             remove_numbers (bool): Whether to remove numbers
             min_frequency (int): Minimum frequency for a word to be included
             max_frequency (int): Maximum frequency for a word to be included
+            phrase_extractor (PhraseExtractor): If given, receives runs of adjacent
+                kept tokens so n-grams are counted in the same pass
             
         Returns:
             Tuple of (processed_text, tokens, word_freq, sentences)
         """
-        # Log input parameters for debugging
-        print(f"DEBUG _process_text: min_frequency={min_frequency} (type: {type(min_frequency).__name__}), max_frequency={max_frequency} (type: {type(max_frequency).__name__})")
+        logger.debug("Processing text", extra=log_fields(
+            text_length=len(text), min_frequency=min_frequency, max_frequency=max_frequency
+        ))
         
         # Initialize stopwords
         stopwords_set = set(STOPWORDS) if remove_stopwords else set()
@@ -539,94 +676,112 @@ class AdvancedWordCloudProcessor:
             stopwords_set.update(set(word.lower() for word in custom_stopwords))
         
         # Split text into sentences
+        tokenize_start = time.perf_counter()
+        tokenize_cpu_start = time.thread_time()
         sentences = sent_tokenize(text)
         
-        # Tokenize and process
+        # Tokenize and process. Each distinct word is lemmatized once; that
+        # time is measured separately from tokenizing.
         tokens = []
+        lemmas = {}
+        lemmatize_seconds = 0.0
         for sentence in sentences:
             words = word_tokenize(sentence.lower())
+            segment_start = len(tokens)
             
             # Filter tokens
             for word in words:
                 # Remove punctuation and clean
                 word = re.sub(r'[^\w\s]', '', word)
                 
-                # Skip empty words
-                if not word:
-                    continue
-                
-                # Skip numbers if requested
-                if remove_numbers and word.isdigit():
-                    continue
-                
-                # Skip short words
-                if len(word) < min_word_length:
-                    continue
-                
-                # Skip stopwords
-                if word.lower() in stopwords_set:
+                # Skip empty words, numbers if requested, short words and stopwords
+                if (not word
+                        or (remove_numbers and word.isdigit())
+                        or len(word) < min_word_length
+                        or word.lower() in stopwords_set):
+                    # A dropped token ends the current run of adjacent tokens
+                    if phrase_extractor is not None:
+                        phrase_extractor.add_segment(tokens[segment_start:])
+                        segment_start = len(tokens)
                     continue
                 
                 # Lemmatize if requested
                 if lemmatize:
-                    word = self.lemmatizer.lemmatize(word)
+                    lemma = lemmas.get(word)
+                    if lemma is None:
+                        lemma_start = time.perf_counter()
+                        lemma = lemmas[word] = self.lemmatizer.lemmatize(word)
+                        lemmatize_seconds += time.perf_counter() - lemma_start
+                    word = lemma
                 
                 tokens.append(word)
+            
+            if phrase_extractor is not None:
+                phrase_extractor.add_segment(tokens[segment_start:])
+        
+        # Lemmatization is CPU-bound, so its wall time stands in for its CPU time
+        observe_stage('tokenize', time.perf_counter() - tokenize_start - lemmatize_seconds,
+                      time.thread_time() - tokenize_cpu_start - lemmatize_seconds)
+        if lemmatize:
+            observe_stage('lemmatize', lemmatize_seconds, lemmatize_seconds)
         
         # Count word frequencies
-        word_freq = Counter(tokens)
-        print(f"DEBUG: Word frequency count complete. Found {len(word_freq)} unique words.")
+        with stage_timer('count'):
+            word_freq = Counter(tokens)
+        logger.debug("Word frequency count complete", extra=log_fields(unique_words=len(word_freq)))
         
-        # Apply frequency filters
+        # Apply frequency filters. Thresholds are converted once, outside the
+        # loop; one that cannot be converted is ignored.
         if min_frequency is not None or max_frequency is not None:
-            print(f"DEBUG: Applying frequency filters: min={min_frequency}, max={max_frequency}")
-            filtered_word_freq = {}
-            for word, freq in word_freq.items():
+            thresholds = {}
+            for name, value in (('min_frequency', min_frequency), ('max_frequency', max_frequency)):
                 try:
-                    include_word = True
-                    
-                    if min_frequency is not None:
-                        try:
-                            min_freq_value = int(min_frequency)
-                            print(f"DEBUG: Checking word '{word}' with freq {freq} against min_freq {min_freq_value}")
-                            # Convert frequency to int for comparison if it's a string
-                            freq_value = int(freq) if isinstance(freq, str) else freq
-                            if freq_value < min_freq_value:
-                                include_word = False
-                        except (ValueError, TypeError) as e:
-                            print(f"DEBUG: Error converting min_frequency: {e}")
-                            # If conversion fails, skip min_frequency check
-                            pass
-                            
-                    if include_word and max_frequency is not None:
-                        try:
-                            max_freq_value = int(max_frequency)
-                            print(f"DEBUG: Checking word '{word}' with freq {freq} against max_freq {max_freq_value}")
-                            # Convert frequency to int for comparison if it's a string
-                            freq_value = int(freq) if isinstance(freq, str) else freq
-                            if freq_value > max_freq_value:
-                                include_word = False
-                        except (ValueError, TypeError) as e:
-                            print(f"DEBUG: Error converting max_frequency: {e}")
-                            # If conversion fails, skip max_frequency check
-                            pass
-                            
-                    if include_word:
-                        filtered_word_freq[word] = freq
-                        
+                    thresholds[name] = int(value) if value is not None else None
                 except (ValueError, TypeError) as e:
-                    print(f"DEBUG: Error in frequency filtering for word '{word}': {e}")
-                    # If conversion fails, include the word anyway
-                    filtered_word_freq[word] = freq
-                    
-            print(f"DEBUG: After filtering, {len(filtered_word_freq)} words remain")
-            word_freq = filtered_word_freq
+                    logger.warning("Ignoring invalid frequency threshold",
+                                   extra=log_fields(threshold=name, value=value, error=str(e)))
+                    thresholds[name] = None
+            word_freq = self._filter_frequencies(word_freq, thresholds['min_frequency'], thresholds['max_frequency'])
         
         # Join tokens back into text for word cloud generation
         processed_text = ' '.join(word for word in tokens if word in word_freq)
         
         return processed_text, tokens, dict(word_freq), sentences
     
+    def _filter_frequencies(self, frequencies: Dict[str, int],
+                            min_frequency: Optional[int] = None,
+                            max_frequency: Optional[int] = None) -> Dict[str, int]:
+        """
+        Apply minimum and maximum frequency thresholds to a frequency map.
+        
+        Args:
+            frequencies (Dict[str, int]): Term frequency dictionary
+            min_frequency (int): Minimum frequency for a term to be included
+            max_frequency (int): Maximum frequency for a term to be included
+            
+        Returns:
+            Dict[str, int]: Filtered frequency dictionary
+        """
+        filtered = {
+            term: freq for term, freq in frequencies.items()
+            if (min_frequency is None or freq >= min_frequency)
+            and (max_frequency is None or freq <= max_frequency)
+        }
+        
+        # Per-term decisions are logged for a sample of terms only
+        sample = DebugSampler(logger, 1000)
+        if sample:
+            for term, freq in frequencies.items():
+                if sample.hit():
+                    logger.debug("Frequency filter decision", extra=log_fields(
+                        term=term, frequency=freq, included=term in filtered,
+                        min_frequency=min_frequency, max_frequency=max_frequency
+                    ))
+            logger.debug("Frequency filters applied", extra=log_fields(
+                terms=len(frequencies), remaining=len(filtered)
+            ))
+        return filtered
+    
     def _extract_word_context(self, word_freq: Dict[str, int], sentences: List[str]) -> Dict[str, List[str]]:
         """
         Extract context for top words.
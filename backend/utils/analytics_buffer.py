@@ -0,0 +1,156 @@
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+import logging
+
+from flask import current_app
+
+from models import db, Analytics
+from utils.analytics_rollup import update_rollups
+
+logger = logging.getLogger(__name__)
+
+# Analytics columns written by the buffer; every row carries all of them so
+# the batch can go out as a single executemany
+EVENT_COLUMNS = (
+    'user_id', 'timestamp', 'action', 'feature_used', 'resource_id',
+    'text_length', 'processing_time', 'referrer', 'user_agent',
+    'ip_address', 'is_error', 'error_message'
+)
+
+
+class AnalyticsBuffer:
+    """
+    In-process buffer for Analytics events, written in batches.
+
+    record() only appends to a bounded queue, so request handlers never wait
+    on the database. A background thread drains the queue and writes a
+    batch with one bulk INSERT (plus the rollup upserts) whenever
+    batch_size events are waiting or flush_interval seconds have passed.
+    When the queue is full, new events are dropped and counted rather than
+    blocking the caller.
+    """
+
+    def __init__(self, app, max_queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 2.0):
+        """
+        Initialize the buffer and start the writer thread.
+
+        Args:
+            app: Flask app whose database the events are written to
+            max_queue_size: Events held in memory before new ones are dropped
+            batch_size: Events written per bulk insert
+            flush_interval: Seconds before a partial batch is written
+        """
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._counters = {'recorded': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+
+        self._thread = threading.Thread(target=self._run, name='analytics-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, action: str, **fields: Any) -> bool:
+        """
+        Queue an analytics event without blocking.
+
+        Args:
+            action: Event action, e.g. 'generate_wordcloud' or 'export'
+            **fields: Other Analytics column values
+
+        Returns:
+            False if the event was dropped because the queue is full
+        """
+        fields['action'] = action
+        fields.setdefault('timestamp', datetime.utcnow())
+        fields.setdefault('is_error', False)
+        row = {column: fields.get(column) for column in EVENT_COLUMNS}
+
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('recorded')
+        return True
+
+    def flush(self) -> int:
+        """Write all queued events now and return how many were written."""
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return written
+            self._write(batch)
+            written += len(batch)
+
+    def close(self):
+        """Stop the writer thread after writing what is queued."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        """Return buffer counters and the current queue depth."""
+        with self._lock:
+            counters = dict(self._counters)
+        counters['queued'] = self._queue.qsize()
+        counters['capacity'] = self._queue.maxsize
+        return counters
+
+    def _run(self):
+        while not self._stopped.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            batch = []
+            while len(batch) < self.batch_size and not self._stopped.is_set():
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(timeout, 0.5)))
+                except queue.Empty:
+                    continue
+                batch.extend(self._drain(self.batch_size - len(batch)))
+            if batch:
+                self._write(batch)
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        """Bulk insert a batch and fold it into the rollups in one transaction."""
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(Analytics.__table__.insert(), batch)
+                    update_rollups(connection, batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} analytics events: {str(e)}")
+            self._count('failed', len(batch))
+            return
+        self._count('written', len(batch))
+        self._count('batches')
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+
+def get_analytics_buffer() -> AnalyticsBuffer:
+    """Return the analytics buffer registered on the current Flask app."""
+    return current_app.extensions['analytics_buffer']
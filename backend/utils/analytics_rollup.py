@@ -0,0 +1,229 @@
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List
+import logging
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import db, Analytics, AnalyticsHourlyRollup, AnalyticsDailyRollup
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the processing-time buckets; the last is open-ended
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 60.0, float('inf')]
+
+ROLLUP_TABLES = (
+    (AnalyticsHourlyRollup.__table__, lambda ts: ts.replace(minute=0, second=0, microsecond=0)),
+    (AnalyticsDailyRollup.__table__, lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0)),
+)
+
+# feature_used of generate requests answered with 304 from the client's cache
+NOT_MODIFIED_FEATURE = 'not_modified'
+
+ROLLUP_KEY = ('bucket_start', 'action', 'feature_used', 'latency_bucket')
+ROLLUP_SUMS = ('event_count', 'error_count', 'processing_time_total', 'text_length_total')
+
+
+def latency_bucket(processing_time: float) -> int:
+    """Return the index of the latency bucket for a processing time in seconds."""
+    return bisect_left(LATENCY_BUCKETS, processing_time or 0.0)
+
+
+def update_rollups(connection, events: Iterable[Dict[str, Any]]) -> None:
+    """
+    Fold analytics events into the hourly and daily rollup tables.
+
+    Events are pre-aggregated in memory and written with one upsert per
+    table, adding to existing rows.
+
+    Args:
+        connection: SQLAlchemy connection, inside the caller's transaction
+        events: Dictionaries with Analytics column values
+    """
+    events = list(events)
+    if not events:
+        return
+
+    for table, truncate in ROLLUP_TABLES:
+        totals = defaultdict(lambda: [0, 0, 0.0, 0])
+        for item in events:
+            timestamp = item.get('timestamp') or datetime.utcnow()
+            key = (
+                truncate(timestamp),
+                item.get('action') or '',
+                item.get('feature_used') or '',
+                latency_bucket(item.get('processing_time'))
+            )
+            row = totals[key]
+            row[0] += 1
+            row[1] += 1 if item.get('is_error') else 0
+            row[2] += item.get('processing_time') or 0.0
+            row[3] += item.get('text_length') or 0
+
+        rows = [dict(zip(ROLLUP_KEY + ROLLUP_SUMS, key + tuple(values))) for key, values in totals.items()]
+        _upsert(connection, table, rows)
+
+
+def _upsert(connection, table, rows: List[Dict[str, Any]]) -> None:
+    """Insert rollup rows, adding to the sums of rows that already exist."""
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(ROLLUP_KEY),
+            set_={name: table.c[name] + statement.excluded[name] for name in ROLLUP_SUMS}
+        )
+        connection.execute(statement, rows)
+        return
+
+    # Portable fallback: update, then insert rows that did not exist
+    for row in rows:
+        condition = sa.and_(*(table.c[name] == row[name] for name in ROLLUP_KEY))
+        result = connection.execute(
+            table.update().where(condition).values(
+                {name: table.c[name] + row[name] for name in ROLLUP_SUMS}
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+def _rollup_new_analytics(session, flush_context):
+    """after_flush hook folding newly inserted Analytics rows into the rollups."""
+    events = [
+        {
+            'timestamp': obj.timestamp,
+            'action': obj.action,
+            'feature_used': obj.feature_used,
+            'processing_time': obj.processing_time,
+            'is_error': obj.is_error,
+            'text_length': obj.text_length
+        }
+        for obj in session.new if isinstance(obj, Analytics)
+    ]
+    if events:
+        update_rollups(session.connection(), events)
+
+
+def register_rollup_listener() -> None:
+    """Update the rollups whenever Analytics rows are flushed through the ORM."""
+    if not event.contains(Session, 'after_flush', _rollup_new_analytics):
+        event.listen(Session, 'after_flush', _rollup_new_analytics)
+
+
+def estimate_percentile(bucket_counts: Dict[int, int], quantile: float) -> float:
+    """
+    Estimate a processing-time percentile from latency bucket counts.
+
+    Interpolates linearly inside the bucket containing the quantile.
+    """
+    total = sum(bucket_counts.values())
+    if total == 0:
+        return 0.0
+
+    target = quantile * total
+    cumulative = 0
+    for index in sorted(bucket_counts):
+        count = bucket_counts[index]
+        if cumulative + count >= target and count > 0:
+            lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+            upper = LATENCY_BUCKETS[index]
+            if upper == float('inf'):
+                return lower
+            return lower + (upper - lower) * (target - cumulative) / count
+        cumulative += count
+    return LATENCY_BUCKETS[-2]
+
+
+def _summarise(model, since: datetime = None) -> Dict[str, Any]:
+    """Aggregate a rollup table over a time window."""
+    columns = [
+        model.latency_bucket,
+        sa.func.sum(model.event_count),
+        sa.func.sum(model.error_count),
+        sa.func.sum(model.processing_time_total)
+    ]
+    query = db.session.query(*columns)
+    if since is not None:
+        query = query.filter(model.bucket_start >= since)
+    rows = query.group_by(model.latency_bucket).all()
+
+    bucket_counts = {bucket: int(count or 0) for bucket, count, _, _ in rows}
+    events = sum(bucket_counts.values())
+    errors = sum(int(error_count or 0) for _, _, error_count, _ in rows)
+    processing_time = sum(float(total or 0.0) for _, _, _, total in rows)
+
+    return {
+        'events': events,
+        'errors': errors,
+        'error_rate': round(errors / events, 4) if events else 0.0,
+        'avg_processing_time': round(processing_time / events, 3) if events else 0.0,
+        'p50_processing_time': round(estimate_percentile(bucket_counts, 0.50), 3),
+        'p95_processing_time': round(estimate_percentile(bucket_counts, 0.95), 3)
+    }
+
+
+def _successes(by_action: Dict[str, Any], action: str, ignored_features: Iterable[str] = ()) -> int:
+    """Events of an action that did not fail, leaving out the ignored features."""
+    entry = by_action.get(action)
+    if entry is None:
+        return 0
+    ignored = sum(entry['features'].get(feature, 0) for feature in ignored_features)
+    return max(0, entry['events'] - entry['errors'] - ignored)
+
+
+def dashboard_statistics(now: datetime = None) -> Dict[str, Any]:
+    """
+    Build dashboard statistics from the rollup tables only.
+
+    Args:
+        now: Reference time (defaults to the current UTC time)
+
+    Returns:
+        Dictionary of summaries per window, per-action totals and an hourly series
+    """
+    now = now or datetime.utcnow()
+    last_24_hours = now - timedelta(hours=24)
+
+    by_action = {}
+    rows = db.session.query(
+        AnalyticsDailyRollup.action,
+        AnalyticsDailyRollup.feature_used,
+        sa.func.sum(AnalyticsDailyRollup.event_count),
+        sa.func.sum(AnalyticsDailyRollup.error_count)
+    ).group_by(AnalyticsDailyRollup.action, AnalyticsDailyRollup.feature_used).all()
+    for action, feature_used, event_count, error_count in rows:
+        entry = by_action.setdefault(action or 'unknown', {'events': 0, 'errors': 0, 'features': {}})
+        entry['events'] += int(event_count or 0)
+        entry['errors'] += int(error_count or 0)
+        entry['features'][feature_used or 'unknown'] = int(event_count or 0)
+
+    hourly = db.session.query(
+        AnalyticsHourlyRollup.bucket_start,
+        sa.func.sum(AnalyticsHourlyRollup.event_count),
+        sa.func.sum(AnalyticsHourlyRollup.error_count)
+    ).filter(
+        AnalyticsHourlyRollup.bucket_start >= last_24_hours
+    ).group_by(AnalyticsHourlyRollup.bucket_start).order_by(AnalyticsHourlyRollup.bucket_start).all()
+
+    return {
+        'total_wordclouds': _successes(by_action, 'generate_wordcloud', ignored_features=(NOT_MODIFIED_FEATURE,)),
+        'total_exports': _successes(by_action, 'export'),
+        'last_24_hours': _summarise(AnalyticsHourlyRollup, since=last_24_hours),
+        'last_30_days': _summarise(AnalyticsDailyRollup, since=now - timedelta(days=30)),
+        'all_time': _summarise(AnalyticsDailyRollup),
+        'by_action': by_action,
+        'hourly': [
+            {
+                'bucket_start': bucket_start.isoformat(),
+                'events': int(event_count or 0),
+                'errors': int(error_count or 0)
+            }
+            for bucket_start, event_count, error_count in hourly
+        ]
+    }
@@ -0,0 +1,214 @@
+import os
+import time
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+import tempfile
+from typing import Optional
+import logging
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore(ABC):
+    """
+    Content-addressed storage for binary data such as rendered images.
+
+    Blobs are identified by the SHA-256 hex digest of their content, so
+    storing the same bytes twice is a no-op and the digest doubles as a
+    strong ETag. Subclasses implement the actual storage backend; one that
+    misses a method cannot be instantiated.
+    """
+
+    @staticmethod
+    def content_hash(data: bytes) -> str:
+        """Return the SHA-256 hex digest used as a blob's key."""
+        return hashlib.sha256(data).hexdigest()
+
+    @abstractmethod
+    def put(self, data: bytes) -> str:
+        """Store data and return its content hash."""
+
+    @abstractmethod
+    def get(self, blob_hash: str) -> Optional[bytes]:
+        """Return the stored bytes, or None if the blob does not exist."""
+
+    @abstractmethod
+    def exists(self, blob_hash: str) -> bool:
+        """Check whether a blob is stored."""
+
+    @abstractmethod
+    def delete(self, blob_hash: str) -> None:
+        """Remove a blob if present."""
+
+    def local_path(self, blob_hash: str) -> Optional[str]:
+        """
+        Return a filesystem path for the blob if the backend has one.
+
+        Lets callers stream straight from disk; backends without local
+        files return None and callers fall back to get().
+        """
+        return None
+
+
+class LocalBlobStore(BlobStore):
+    """Blob store backed by a local directory, sharded by hash prefix."""
+
+    def __init__(self, root: str):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory that holds the blobs
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def put(self, data: bytes) -> str:
+        blob_hash = self.content_hash(data)
+        path = self._path(blob_hash)
+        if os.path.exists(path):
+            return blob_hash
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file first so readers never see partial blobs
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return blob_hash
+
+    def get(self, blob_hash: str) -> Optional[bytes]:
+        path = self.local_path(blob_hash)
+        if path is None:
+            return None
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def exists(self, blob_hash: str) -> bool:
+        return os.path.exists(self._path(blob_hash))
+
+    def delete(self, blob_hash: str) -> None:
+        path = self._path(blob_hash)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def local_path(self, blob_hash: str) -> Optional[str]:
+        path = self._path(blob_hash)
+        return path if os.path.exists(path) else None
+
+    def _path(self, blob_hash: str) -> str:
+        if len(blob_hash) != 64 or not all(c in '0123456789abcdef' for c in blob_hash):
+            raise ValueError(f"Invalid blob hash: {blob_hash}")
+        return os.path.join(self.root, blob_hash[:2], blob_hash[2:4], blob_hash)
+
+
+class LocalBlobCache(LocalBlobStore):
+    """
+    Local blob store for transient results, bounded by size and age.
+
+    Reads refresh a blob's modification time, which serves as its last
+    use. An eviction pass, run from put() at most every `evict_interval`
+    seconds, removes blobs unused for `max_age` seconds and then the least
+    recently used until the total is under `max_bytes`.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 256 * 1024 * 1024,
+                 max_age: float = 24 * 3600, evict_interval: float = 60.0):
+        """
+        Initialize the cache.
+
+        Args:
+            root: Directory that holds the blobs
+            max_bytes: Total size kept after an eviction pass
+            max_age: Seconds a blob is kept after its last use
+            evict_interval: Minimum seconds between eviction passes
+        """
+        super().__init__(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self._evict_lock = threading.Lock()
+        self._next_eviction = 0.0
+
+    def put(self, data: bytes) -> str:
+        blob_hash = super().put(data)
+        self._touch(self._path(blob_hash))
+        if time.monotonic() >= self._next_eviction:
+            self.evict()
+        return blob_hash
+
+    def local_path(self, blob_hash: str) -> Optional[str]:
+        path = super().local_path(blob_hash)
+        if path is not None:
+            self._touch(path)
+        return path
+
+    def evict(self) -> int:
+        """
+        Remove expired blobs, then the least recently used over the size limit.
+
+        Returns:
+            Number of blobs removed
+        """
+        # One pass at a time; a put that finds a pass running skips it
+        if not self._evict_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._next_eviction = time.monotonic() + self.evict_interval
+            blobs = []
+            for directory, _, names in os.walk(self.root):
+                for name in names:
+                    # Temporary files of puts in progress are not blobs yet
+                    if len(name) != 64:
+                        continue
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    blobs.append((stat.st_mtime, stat.st_size, path))
+            blobs.sort()
+
+            expires = time.time() - self.max_age
+            total = sum(size for _, size, _ in blobs)
+            removed = 0
+            for mtime, size, path in blobs:
+                if mtime >= expires and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not evict cached blob {path}: {str(e)}")
+                    continue
+                total -= size
+                removed += 1
+            return removed
+        finally:
+            self._evict_lock.release()
+
+    @staticmethod
+    def _touch(path: str) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+
+def get_blob_store() -> BlobStore:
+    """Return the blob store registered on the current Flask app."""
+    return current_app.extensions['blob_store']
+
+
+def get_image_cache() -> BlobStore:
+    """Return the cache for rendered images that are not part of a saved word cloud."""
+    return current_app.extensions['image_cache']
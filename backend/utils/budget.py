@@ -0,0 +1,186 @@
+import math
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+from utils.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+
+def parse_budget_ms(value: Any) -> Optional[float]:
+    """
+    Validate a time budget given in milliseconds.
+
+    Args:
+        value: Budget as a number or numeric string; None means unlimited
+
+    Returns:
+        The budget as a float, or None
+
+    Raises:
+        ValueError: If the value is not a finite, non-negative number
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid time budget: {value!r}")
+    try:
+        budget = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid time budget: {value!r}") from None
+    if not math.isfinite(budget) or budget < 0:
+        raise ValueError(f"Time budget must be a non-negative number of milliseconds, got {value!r}")
+    return budget
+
+
+class AnalyticsStage:
+    """An analytics step with a declared cost, run by the BudgetScheduler."""
+
+    def __init__(self, name: str, func: Callable, priority: int,
+                 cost_ms: float, cost_per_kb_ms: float = 0.0,
+                 default: Any = None, accepts_budget: bool = False,
+                 metric_name: Optional[str] = None):
+        """
+        Declare a stage.
+
+        Args:
+            name: Stage name used in the budget report
+            func: Callable producing the stage result. Budget-aware stages are
+                called with the remaining milliseconds and return
+                (result, truncated)
+            priority: Lower runs first
+            cost_ms: Fixed cost estimate in milliseconds
+            cost_per_kb_ms: Additional estimated cost per KB of input text
+            default: Result used when the stage is skipped
+            accepts_budget: Whether func takes the remaining budget
+            metric_name: Pipeline stage label in /metrics; defaults to name
+        """
+        self.name = name
+        self.func = func
+        self.priority = priority
+        self.cost_ms = cost_ms
+        self.cost_per_kb_ms = cost_per_kb_ms
+        self.default = default
+        self.accepts_budget = accepts_budget
+        self.metric_name = metric_name or name
+
+
+class BudgetScheduler:
+    """
+    Run analytics stages in priority order until a time budget runs out.
+
+    A stage is skipped when its estimated cost exceeds the remaining budget.
+    Estimates start from the declared costs and are refined with an
+    exponentially weighted average of observed per-KB timings, shared by
+    all schedulers in the process.
+    """
+
+    _observed_ms_per_kb: Dict[str, float] = {}
+    _observed_lock = threading.Lock()
+    _smoothing = 0.2
+
+    def __init__(self, time_budget_ms: float = None, start_time: float = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            time_budget_ms: Total budget in milliseconds (a number or numeric
+                string); None means unlimited
+            start_time: time.perf_counter() value the budget is measured from
+
+        Raises:
+            ValueError: If the budget is not a non-negative number
+        """
+        self.time_budget_ms = parse_budget_ms(time_budget_ms)
+        self.start_time = start_time if start_time is not None else time.perf_counter()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start_time) * 1000.0
+
+    def remaining_ms(self) -> float:
+        if self.time_budget_ms is None:
+            return float('inf')
+        return max(0.0, self.time_budget_ms - self.elapsed_ms())
+
+    def estimate_ms(self, stage: AnalyticsStage, text_length: int) -> float:
+        """Estimate a stage's cost for a text of the given length."""
+        kb = text_length / 1024.0
+        declared = stage.cost_ms + stage.cost_per_kb_ms * kb
+        with self._observed_lock:
+            observed = self._observed_ms_per_kb.get(stage.name)
+        if observed is None:
+            return declared
+        return max(stage.cost_ms, observed * max(kb, 1.0))
+
+    def run(self, stages: List[AnalyticsStage], text_length: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Run stages in priority order within the budget.
+
+        Args:
+            stages: Stages to run
+            text_length: Input length in characters, used for estimates
+
+        Returns:
+            Tuple of (results by stage name, budget report)
+        """
+        results = {}
+        report = {}
+
+        for stage in sorted(stages, key=lambda s: s.priority):
+            estimate = self.estimate_ms(stage, text_length)
+            remaining = self.remaining_ms()
+
+            if estimate > remaining:
+                results[stage.name] = stage.default
+                report[stage.name] = {
+                    'status': 'skipped',
+                    'estimated_ms': round(estimate, 1)
+                }
+                continue
+
+            stage_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            truncated = False
+            try:
+                if stage.accepts_budget:
+                    result, truncated = stage.func(remaining)
+                else:
+                    result = stage.func()
+            except Exception as e:
+                logger.error(f"Analytics stage '{stage.name}' failed: {str(e)}")
+                results[stage.name] = stage.default
+                report[stage.name] = {'status': 'failed', 'error': str(e)}
+                continue
+            stage_ms = (time.perf_counter() - stage_start) * 1000.0
+            observe_stage(stage.metric_name, stage_ms / 1000.0, time.thread_time() - cpu_start)
+
+            results[stage.name] = result
+            report[stage.name] = {
+                'status': 'truncated' if truncated else 'completed',
+                'estimated_ms': round(estimate, 1),
+                'elapsed_ms': round(stage_ms, 1)
+            }
+            if not truncated:
+                self._observe(stage.name, stage_ms, text_length)
+
+        return results, {
+            'time_budget_ms': self.time_budget_ms,
+            'elapsed_ms': round(self.elapsed_ms(), 1),
+            'stages': report,
+            'skipped': [name for name, info in report.items() if info['status'] == 'skipped'],
+            'truncated': [name for name, info in report.items() if info['status'] == 'truncated']
+        }
+
+    @classmethod
+    def _observe(cls, name: str, stage_ms: float, text_length: int):
+        """Fold an observed timing into the shared per-KB estimate."""
+        kb = max(text_length / 1024.0, 1.0)
+        sample = stage_ms / kb
+        with cls._observed_lock:
+            previous = cls._observed_ms_per_kb.get(name)
+            if previous is None:
+                cls._observed_ms_per_kb[name] = sample
+            else:
+                cls._observed_ms_per_kb[name] = previous + cls._smoothing * (sample - previous)
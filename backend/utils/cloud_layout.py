@@ -0,0 +1,161 @@
+import io
+import struct
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageColor
+from wordcloud import WordCloud
+
+# Packed layout: magic, version, then width, height and entry count,
+# followed by a zlib-compressed body of fixed-size records and the words
+LAYOUT_MAGIC = b'WCL'
+LAYOUT_VERSION = 1
+_HEADER = struct.Struct('<3sBHHI')
+_RECORD = np.dtype([
+    ('count', '<f4'),
+    ('font_size', '<u2'),
+    ('y', '<u2'),
+    ('x', '<u2'),
+    ('rotated', 'u1'),
+    ('rgb', 'u1', (3,)),
+])
+
+# Resolution the layout's pixel coordinates are taken to have when an
+# export asks for a DPI; 300 dpi therefore renders at about 4x
+LAYOUT_DPI = 72
+
+
+def _canvas(layout: Sequence, width: int, height: int,
+            background_color: Optional[str], scale: float = 1.0) -> WordCloud:
+    """
+    Build a WordCloud that draws an existing layout without placing words.
+
+    Args:
+        layout: Entries in WordCloud.layout_ format:
+            ((word, count), font_size, (y, x), orientation, color)
+        width: Layout width in pixels
+        height: Layout height in pixels
+        background_color: Color code, or None for transparent
+        scale: Output size relative to the layout
+    """
+    wc = WordCloud(
+        width=width,
+        height=height,
+        background_color=background_color,
+        mode='RGBA' if background_color is None else 'RGB',
+        scale=scale
+    )
+    wc.layout_ = [
+        ((word, count), font_size, tuple(position), orientation, color)
+        for (word, count), font_size, position, orientation, color in layout
+    ]
+    return wc
+
+
+def render_layout_png(layout: Sequence, width: int, height: int,
+                      background_color: Optional[str], scale: float = 1.0) -> bytes:
+    """
+    Rasterize a stored layout to PNG at any scale.
+
+    Fonts are drawn at the scaled size, so large prints are sharp and cost
+    only the drawing, not another placement pass.
+
+    Returns:
+        PNG bytes
+    """
+    image = _canvas(layout, width, height, background_color, scale).to_image()
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue()
+
+
+def render_layout_svg(layout: Sequence, width: int, height: int,
+                      background_color: Optional[str]) -> str:
+    """Render a stored layout as an SVG document."""
+    return _canvas(layout, width, height, background_color).to_svg()
+
+
+def scale_for_dpi(dpi: int) -> float:
+    """Scale factor for rendering a layout at the requested DPI."""
+    return max(dpi, 1) / float(LAYOUT_DPI)
+
+
+def layout_from_wordcloud(wc: WordCloud) -> List:
+    """Plain-list copy of a generated WordCloud's layout."""
+    return [
+        [[word, float(count)], int(font_size), [int(position[0]), int(position[1])],
+         None if orientation is None else int(orientation), color]
+        for (word, count), font_size, position, orientation, color in wc.layout_
+    ]
+
+
+def pack_layout(layout: Sequence, width: int, height: int) -> bytes:
+    """
+    Pack a layout into a compact binary form for storage.
+
+    Each word costs 14 bytes plus its UTF-8 text before compression;
+    colors are stored as RGB.
+
+    Args:
+        layout: Entries in WordCloud.layout_ format
+        width: Layout width in pixels
+        height: Layout height in pixels
+
+    Returns:
+        Packed bytes, read back with unpack_layout
+    """
+    records = np.zeros(len(layout), dtype=_RECORD)
+    words = []
+    for index, ((word, count), font_size, position, orientation, color) in enumerate(layout):
+        records[index] = (
+            count, font_size, position[0], position[1],
+            orientation is not None, ImageColor.getrgb(color)[:3]
+        )
+        words.append(word)
+    body = records.tobytes() + '\0'.join(words).encode('utf-8')
+    return _HEADER.pack(LAYOUT_MAGIC, LAYOUT_VERSION, width, height, len(layout)) + zlib.compress(body, 6)
+
+
+def unpack_layout(data: bytes) -> Tuple[List, int, int]:
+    """
+    Read a layout written by pack_layout.
+
+    Returns:
+        Tuple of (layout, width, height)
+    """
+    magic, version, width, height, size = _HEADER.unpack_from(data)
+    if magic != LAYOUT_MAGIC or version != LAYOUT_VERSION:
+        raise ValueError("Unsupported layout format")
+    body = zlib.decompress(data[_HEADER.size:])
+    split = size * _RECORD.itemsize
+    records = np.frombuffer(body[:split], dtype=_RECORD)
+    words = body[split:].decode('utf-8').split('\0') if size else []
+
+    layout = [
+        [[word, float(record['count'])], int(record['font_size']), [int(record['y']), int(record['x'])],
+         int(Image.ROTATE_90) if record['rotated'] else None,
+         'rgb({}, {}, {})'.format(*(int(c) for c in record['rgb']))]
+        for word, record in zip(words, records)
+    ]
+    return layout, width, height
+
+
+def recolor_layout(layout: Sequence, width: int, height: int,
+                   colormap: str, random_state: int = None) -> List:
+    """
+    Assign new colors from a colormap without moving any word.
+
+    Args:
+        layout: Entries in WordCloud.layout_ format
+        width: Layout width in pixels
+        height: Layout height in pixels
+        colormap: Matplotlib colormap name
+        random_state: Seed for the color choice
+
+    Returns:
+        Recolored layout
+    """
+    wc = _canvas(layout, width, height, None)
+    wc.recolor(random_state=random_state, colormap=colormap)
+    return layout_from_wordcloud(wc)
@@ -0,0 +1,178 @@
+import json
+import zlib
+from typing import Any, Callable, Tuple
+
+import sqlalchemy as sa
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Encoded values start with MAGIC followed by a format byte:
+# high nibble = serializer, low nibble = compressor. 0xC1 is never valid
+# as the first byte of UTF-8 text, so legacy JSON rows are unambiguous.
+MAGIC = 0xC1
+
+SERIALIZERS = {'json': 0x1, 'orjson': 0x2, 'msgpack': 0x3}
+COMPRESSORS = {'none': 0x0, 'zlib': 0x1, 'zstd': 0x2}
+SERIALIZER_NAMES = {code: name for name, code in SERIALIZERS.items()}
+COMPRESSOR_NAMES = {code: name for name, code in COMPRESSORS.items()}
+
+# Values shorter than this are stored uncompressed whatever the codec says
+MIN_COMPRESS_SIZE = 256
+
+
+def _dumps_json(value: Any) -> bytes:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _dumps_orjson(value: Any) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _dumps_msgpack(value: Any) -> bytes:
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def _loads_msgpack(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def _serializer(name: str) -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    if name == 'orjson':
+        if orjson is None:
+            raise RuntimeError("orjson is not installed")
+        return _dumps_orjson, orjson.loads
+    if name == 'msgpack':
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed")
+        return _dumps_msgpack, _loads_msgpack
+    return _dumps_json, json.loads
+
+
+def _compressor(name: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    if name == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        return zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+    if name == 'zlib':
+        return (lambda data: zlib.compress(data, 6)), zlib.decompress
+    return (lambda data: data), (lambda data: data)
+
+
+class ColumnCodec:
+    """
+    Serializer plus compressor used to store structured column values.
+
+    Every encoded value carries its format byte, so rows written with
+    different codecs (or before the codec existed, as plain JSON text) can
+    all be decoded regardless of which codec is currently configured.
+    """
+
+    def __init__(self, serializer: str = 'json', compressor: str = 'zlib'):
+        """
+        Initialize the codec.
+
+        Args:
+            serializer: 'json', 'orjson' or 'msgpack'
+            compressor: 'none', 'zlib' or 'zstd'
+        """
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown serializer: {serializer}")
+        if compressor not in COMPRESSORS:
+            raise ValueError(f"Unknown compressor: {compressor}")
+        self.serializer = serializer
+        self.compressor = compressor
+        self._dumps = _serializer(serializer)[0]
+        self._compress = _compressor(compressor)[0]
+
+    @property
+    def name(self) -> str:
+        return f'{self.serializer}+{self.compressor}'
+
+    def encode(self, value: Any) -> bytes:
+        """Serialize and compress a value, prefixed with its format header."""
+        payload = self._dumps(value)
+        compressor = self.compressor
+        if compressor != 'none' and len(payload) >= MIN_COMPRESS_SIZE:
+            payload = self._compress(payload)
+        else:
+            compressor = 'none'
+        format_byte = (SERIALIZERS[self.serializer] << 4) | COMPRESSORS[compressor]
+        return bytes((MAGIC, format_byte)) + payload
+
+    @staticmethod
+    def decode(data: Any) -> Any:
+        """Decode a stored value written by any codec, or legacy JSON text."""
+        if data is None:
+            return None
+        if isinstance(data, str):
+            return json.loads(data)
+        data = bytes(data)
+        if len(data) < 2 or data[0] != MAGIC:
+            return json.loads(data.decode('utf-8'))
+
+        serializer = SERIALIZER_NAMES.get(data[1] >> 4)
+        compressor = COMPRESSOR_NAMES.get(data[1] & 0x0F)
+        if serializer is None or compressor is None:
+            raise ValueError(f"Unknown column format byte: {data[1]:#04x}")
+        payload = _compressor(compressor)[1](data[2:])
+        return _serializer(serializer)[1](payload)
+
+    @staticmethod
+    def is_encoded(data: Any) -> bool:
+        """Check whether a stored value already has a codec header."""
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            return False
+        data = bytes(data[:2])
+        return len(data) == 2 and data[0] == MAGIC
+
+
+_default_codec = ColumnCodec('orjson' if orjson is not None else 'json', 'zlib')
+
+
+def codec_from_name(name: str) -> ColumnCodec:
+    """Build a codec from a 'serializer+compressor' name such as 'orjson+zstd'."""
+    serializer, _, compressor = name.partition('+')
+    return ColumnCodec(serializer, compressor or 'none')
+
+
+def get_default_codec() -> ColumnCodec:
+    return _default_codec
+
+
+def set_default_codec(codec: ColumnCodec) -> None:
+    """Set the codec used for new writes; reads handle every format."""
+    global _default_codec
+    _default_codec = codec
+
+
+class EncodedJSON(sa.types.TypeDecorator):
+    """
+    Binary column holding a JSON-compatible value encoded with the default codec.
+
+    Reads transparently decode rows written by any codec and legacy rows
+    that hold plain JSON text.
+    """
+
+    impl = sa.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return _default_codec.encode(value)
+
+    def process_result_value(self, value, dialect):
+        return ColumnCodec.decode(value)
@@ -0,0 +1,93 @@
+import os
+from typing import Any, Dict
+import logging
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# single writer, NORMAL sync is durable across application crashes in WAL
+# mode, and busy_timeout makes writers wait for the lock instead of failing
+# with "database is locked".
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # Milliseconds
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,  # Negative means KiB, i.e. 64 MB
+    'temp_store': 'MEMORY'
+}
+
+
+def database_config(instance_dir: str, threads: int) -> Dict[str, Any]:
+    """
+    Build the SQLAlchemy settings for the current environment.
+
+    DATABASE_URL selects the backend: when it is set (e.g. a Postgres URL
+    from the hosting platform) it is used as is; otherwise a tuned SQLite
+    file in the instance directory is used. The connection pool is sized to
+    the number of server threads plus the background analytics writer.
+
+    Args:
+        instance_dir: Directory holding the SQLite database
+        threads: Number of request-handling threads
+
+    Returns:
+        Flask config entries for Flask-SQLAlchemy
+    """
+    pool_size = threads + 1
+    database_url = os.environ.get('DATABASE_URL')
+
+    if database_url:
+        # Heroku/Render style URLs use the scheme SQLAlchemy no longer accepts
+        if database_url.startswith('postgres://'):
+            database_url = 'postgresql://' + database_url[len('postgres://'):]
+        return {
+            'SQLALCHEMY_DATABASE_URI': database_url,
+            'SQLALCHEMY_ENGINE_OPTIONS': {
+                'pool_size': pool_size,
+                'max_overflow': pool_size,
+                'pool_pre_ping': True,
+                'pool_recycle': 1800
+            }
+        }
+
+    db_path = os.path.join(instance_dir, os.environ.get('SQLITE_DATABASE', 'wordcloud_dev.db'))
+    return {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {
+            'pool_size': pool_size,
+            'max_overflow': 0,
+            'pool_timeout': 30,
+            'connect_args': {
+                'check_same_thread': False,
+                'timeout': DEFAULT_SQLITE_PRAGMAS['busy_timeout'] / 1000.0
+            }
+        },
+        'SQLITE_PRAGMAS': dict(DEFAULT_SQLITE_PRAGMAS)
+    }
+
+
+def configure_sqlite_pragmas(engine, pragmas: Dict[str, Any] = None) -> None:
+    """
+    Apply PRAGMA settings to each new connection of a SQLite engine.
+
+    Does nothing for other backends.
+
+    Args:
+        engine: SQLAlchemy engine
+        pragmas: PRAGMA names and values (defaults to DEFAULT_SQLITE_PRAGMAS)
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = DEFAULT_SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
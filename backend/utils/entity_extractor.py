@@ -0,0 +1,216 @@
+import time
+import hashlib
+import threading
+import multiprocessing
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Tuple, Any
+import logging
+
+from nltk.tokenize import sent_tokenize
+
+from utils.entity_worker import tag_sentences
+from utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# NLTK entity labels grouped into the categories exposed by the entity cloud
+ENTITY_GROUPS = {
+    'PERSON': 'persons',
+    'ORGANIZATION': 'organizations',
+    'GPE': 'places',
+    'LOCATION': 'places',
+    'GSP': 'places',
+    'FACILITY': 'places'
+}
+
+
+class EntityTaggingError(Exception):
+    """A batch of sentences could not be tagged."""
+
+
+class EntityExtractor:
+    """
+    Named-entity extraction over sentence batches.
+
+    Sentences are tagged in batches by a pool of worker processes, results
+    are cached per sentence by content hash, and an optional time budget
+    returns whatever has finished instead of blocking the request.
+
+    Workers are started with the 'spawn' method: the pool is created lazily
+    inside a multithreaded server, where forking could copy locks held by
+    other threads into the child. Spawned workers re-import the main script,
+    so it must not build the app at import time; the development server in
+    app.py does, and tags in threads instead.
+    """
+
+    def __init__(self, max_workers: int = 2, batch_size: int = 25,
+                 cache_size: int = 20000, use_processes: bool = True):
+        """
+        Initialize the extractor. The worker pool is created on first use.
+
+        Args:
+            max_workers: Number of tagging workers
+            batch_size: Sentences per submitted batch
+            cache_size: Maximum number of cached sentences
+            use_processes: Use worker processes (True) or threads (False)
+        """
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.use_processes = use_processes
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def extract(self, text: str, time_budget: float = None) -> Dict[str, Any]:
+        """
+        Extract named entities from text.
+
+        Args:
+            text: Input text
+            time_budget: Seconds to wait for tagging; None waits for all batches
+
+        Returns:
+            Dictionary with entity counts per NLTK label, entity counts per
+            group (persons, organizations, places), and a partial flag
+            
+        Raises:
+            EntityTaggingError: If a batch of sentences failed to tag
+        """
+        start_time = time.monotonic()
+        sentences = [s for s in sent_tokenize(text) if s.strip()]
+        keys = [self._sentence_key(s) for s in sentences]
+
+        # Look up cached sentences, dedupe the rest
+        results = {}
+        missing = OrderedDict()
+        with self._cache_lock:
+            for key, sentence in zip(keys, sentences):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[key] = self._cache[key]
+                elif key not in missing:
+                    missing[key] = sentence
+
+        record_cache('entity_sentences', hits=len(results), misses=len(missing))
+        if missing:
+            results.update(self._tag_missing(missing, start_time, time_budget))
+
+        by_label = {}
+        groups = {'persons': Counter(), 'organizations': Counter(), 'places': Counter()}
+        processed = 0
+        for key in keys:
+            entities = results.get(key)
+            if entities is None:
+                continue
+            processed += 1
+            for label, entity_text in entities:
+                by_label.setdefault(label, Counter())[entity_text] += 1
+                group = ENTITY_GROUPS.get(label)
+                if group:
+                    groups[group][entity_text] += 1
+
+        return {
+            'entities': {label: dict(counts) for label, counts in by_label.items()},
+            'groups': {group: dict(counts) for group, counts in groups.items()},
+            'partial': processed < len(sentences),
+            'sentences_processed': processed,
+            'sentences_total': len(sentences),
+            'elapsed': round(time.monotonic() - start_time, 3)
+        }
+
+    def shutdown(self):
+        """Stop the worker pool."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _tag_missing(self, missing: 'OrderedDict[str, str]', start_time: float,
+                     time_budget: float = None) -> Dict[str, List[Tuple[str, str]]]:
+        """Tag uncached sentences in batches, honouring the time budget."""
+        executor = self._get_executor()
+        items = list(missing.items())
+
+        futures = {}
+        for i in range(0, len(items), self.batch_size):
+            batch = items[i:i + self.batch_size]
+            future = executor.submit(tag_sentences, [sentence for _, sentence in batch])
+            futures[future] = [key for key, _ in batch]
+
+        timeout = None
+        if time_budget is not None:
+            timeout = max(0.0, time_budget - (time.monotonic() - start_time))
+        done, not_done = wait(futures, timeout=timeout)
+
+        for future in not_done:
+            # Batches already running cannot be cancelled; cache them when they land
+            if not future.cancel():
+                future.add_done_callback(self._cache_late_batch(futures[future]))
+        if not_done:
+            logger.info(f"Entity extraction budget exhausted; {len(not_done)} of {len(futures)} batches skipped")
+
+        results = {}
+        failure = None
+        for future in done:
+            try:
+                batch_results = future.result()
+            except BrokenProcessPool as e:
+                failure = e
+                self._discard_executor(executor)
+                continue
+            except Exception as e:
+                failure = e
+                continue
+            results.update(zip(futures[future], batch_results))
+
+        # Batches that did succeed are still worth caching
+        self._store(results)
+        if failure is not None:
+            logger.error(f"Entity tagging batch failed: {str(failure)}")
+            raise EntityTaggingError(f"Entity tagging failed: {str(failure)}") from failure
+        return results
+
+    def _cache_late_batch(self, keys: List[str]):
+        """Build a done-callback that caches a batch finished after the budget."""
+        def callback(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._store(dict(zip(keys, future.result())))
+        return callback
+
+    def _store(self, results: Dict[str, List[Tuple[str, str]]]):
+        """Add tagged sentences to the LRU cache."""
+        with self._cache_lock:
+            for key, entities in results.items():
+                self._cache[key] = entities
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _get_executor(self):
+        """Create the worker pool on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                if self.use_processes:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _discard_executor(self, executor):
+        """Drop a broken pool so the next call starts a fresh one."""
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _sentence_key(sentence: str) -> str:
+        return hashlib.blake2b(sentence.strip().encode('utf-8'), digest_size=16).hexdigest()
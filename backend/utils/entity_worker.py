@@ -0,0 +1,29 @@
+from typing import List, Tuple
+
+from nltk.tokenize import word_tokenize
+from nltk.tag import pos_tag
+from nltk.chunk import ne_chunk
+
+
+def tag_sentences(sentences: List[str]) -> List[List[Tuple[str, str]]]:
+    """
+    Run POS tagging and NE chunking over a batch of sentences.
+
+    Entry point for the spawned entity workers, which import this module
+    fresh. Keep it free of app imports: anything imported here is loaded
+    again in every worker.
+
+    Args:
+        sentences: Sentences to tag
+
+    Returns:
+        One list of (label, entity_text) tuples per sentence
+    """
+    results = []
+    for sentence in sentences:
+        entities = []
+        for chunk in ne_chunk(pos_tag(word_tokenize(sentence))):
+            if hasattr(chunk, 'label'):
+                entities.append((chunk.label(), ' '.join(c[0] for c in chunk.leaves())))
+        results.append(entities)
+    return results
@@ -0,0 +1,82 @@
+import csv
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator
+
+# Rows buffered before a chunk is yielded; keeps chunks around 16-64 KB
+ROWS_PER_CHUNK = 1000
+
+
+class _LineBuffer:
+    """Minimal file-like target for csv.writer that can be drained."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text: str):
+        self.parts.append(text)
+
+    def drain(self) -> str:
+        text = ''.join(self.parts)
+        self.parts.clear()
+        return text
+
+
+def _sorted_frequencies(word_frequencies: Dict[str, Any]):
+    return sorted(word_frequencies.items(), key=lambda item: item[1], reverse=True)
+
+
+def csv_chunks(word_frequencies: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Yield a Word,Frequency CSV in encoded chunks, most frequent first.
+
+    Only one chunk of rows is held in memory at a time.
+    """
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow(['Word', 'Frequency'])
+
+    for index, (word, frequency) in enumerate(_sorted_frequencies(word_frequencies), start=1):
+        writer.writerow([word, frequency])
+        if index % ROWS_PER_CHUNK == 0:
+            yield buffer.drain().encode('utf-8')
+    yield buffer.drain().encode('utf-8')
+
+
+def ndjson_chunks(wordcloud, include_text: bool = True, include_image: bool = True) -> Iterator[bytes]:
+    """
+    Yield a word cloud as newline-delimited JSON records.
+
+    The first record holds the metadata (type 'wordcloud'), followed by an
+    optional 'text' record and one 'word' record per frequency entry.
+
+    Args:
+        wordcloud: WordCloud record
+        include_text: Emit the original text
+        include_image: Keep the image hash and URL in the metadata
+    """
+    metadata = wordcloud.to_dict(include_image=include_image, include_frequencies=False)
+    metadata['type'] = 'wordcloud'
+    yield (json.dumps(metadata) + '\n').encode('utf-8')
+
+    if include_text:
+        yield (json.dumps({'type': 'text', 'original_text': wordcloud.original_text}) + '\n').encode('utf-8')
+
+    lines = []
+    for word, frequency in _sorted_frequencies(wordcloud.get_word_frequencies()):
+        lines.append(json.dumps({'type': 'word', 'word': word, 'frequency': frequency}))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines.clear()
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a stream of chunks into a single gzip member."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -6,8 +6,13 @@ from urllib.parse import urlparse
 import PyPDF2
 from docx import Document
 import pandas as pd
-from bs4 import BeautifulSoup
 import io
+import time
+from concurrent.futures import Executor, wait
+
+from utils.html_extractor import extract_html
+from utils.metrics import stage_timer
+from utils.url_fetcher import ResponseTooLarge, UrlFetcher, normalize_url
 
 class FileProcessor:
     """Process various file formats and extract text content."""
@@ -25,6 +30,9 @@ class FileProcessor:
         
         self.max_file_size = 16 * 1024 * 1024  # 16MB
         self.max_url_size = 5 * 1024 * 1024  # 5MB for URLs
+        
+        # Shared pooled session; extracted page text is cached and revalidated
+        self.url_fetcher = UrlFetcher(max_size=self.max_url_size)
     
     def extract_text_from_file(self, file_path: str) -> Dict[str, any]:
         """
@@ -56,7 +64,8 @@ class FileProcessor:
             
             # Extract text using appropriate method
             extractor = self.supported_extensions[ext]
-            text = extractor(file_path)
+            with stage_timer('extract'):
+                text = extractor(file_path)
             
             if not text or not text.strip():
                 return {
@@ -79,12 +88,13 @@ class FileProcessor:
                 'error': f'Error processing file: {str(e)}'
             }
     
-    def extract_text_from_url(self, url: str) -> Dict[str, any]:
+    def extract_text_from_url(self, url: str, deadline: Optional[float] = None) -> Dict[str, any]:
         """
         Extract text from a web page.
         
         Args:
             url: URL to extract text from
+            deadline: time.monotonic() value by which the fetch must finish
             
         Returns:
             Dictionary containing extracted text and metadata
@@ -98,39 +108,9 @@ class FileProcessor:
                     'error': 'Invalid URL format'
                 }
             
-            # Fetch content
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=30, stream=True)
-            response.raise_for_status()
-            
-            # Check content size
-            content_length = response.headers.get('content-length')
-            if content_length and int(content_length) > self.max_url_size:
-                return {
-                    'success': False,
-                    'error': f'Content size ({content_length} bytes) exceeds maximum allowed size ({self.max_url_size} bytes)'
-                }
-            
-            # Read content
-            content = response.text
-            
-            # Parse HTML
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Extract text
-            text = soup.get_text()
-            
-            # Clean up text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+            # Fetch and parse, or reuse the text if the page has not changed
+            page, from_cache = self.url_fetcher.fetch(url, self._parse_web_page, deadline=deadline)
+            text = page['text']
             
             if not text or not text.strip():
                 return {
@@ -142,11 +122,17 @@ class FileProcessor:
                 'success': True,
                 'text': text,
                 'url': url,
-                'title': soup.title.string if soup.title else '',
+                'title': page['title'],
                 'word_count': len(text.split()),
-                'character_count': len(text)
+                'character_count': len(text),
+                'from_cache': from_cache
             }
             
+        except ResponseTooLarge as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
         except requests.exceptions.RequestException as e:
             return {
                 'success': False,
@@ -158,6 +144,57 @@ class FileProcessor:
                 'error': f'Error processing URL: {str(e)}'
             }
     
+    def extract_text_from_urls(self, urls: List[str], executor: Executor,
+                               timeout: float = 60) -> List[Dict[str, any]]:
+        """
+        Extract text from several web pages concurrently.
+        
+        URLs that normalize to the same address are fetched once. Requests
+        to one host are additionally limited by the fetcher's per-host limit.
+        
+        Args:
+            urls: URLs to extract text from
+            executor: Shared pool the pages are fetched on; its size bounds
+                the fetches in flight across all batches
+            timeout: Seconds to wait for the whole batch; pages not done by
+                then are reported as timed out
+            
+        Returns:
+            One result dictionary per distinct URL, in first-seen order,
+            shaped like extract_text_from_url results plus the 'url'
+        """
+        unique_urls = {}
+        for url in urls:
+            unique_urls.setdefault(normalize_url(url), url.strip())
+        if not unique_urls:
+            return []
+        
+        deadline = time.monotonic() + timeout
+        futures = [(url, executor.submit(self.extract_text_from_url, url, deadline))
+                   for url in unique_urls.values()]
+        done, not_done = wait([future for _, future in futures], timeout=timeout)
+        # Queued fetches are dropped; running ones time out at the deadline
+        for future in not_done:
+            future.cancel()
+        
+        results = []
+        for url, future in futures:
+            if future in done:
+                result = future.result()
+            else:
+                result = {
+                    'success': False,
+                    'error': f'Timed out after {timeout:g} seconds'
+                }
+            result.setdefault('url', url)
+            results.append(result)
+        return results
+    
+    def _parse_web_page(self, body: bytes, encoding: Optional[str], response) -> Dict[str, str]:
+        """Extract the main text and title from a fetched HTML page."""
+        with stage_timer('extract'):
+            return extract_html(body, encoding)
+    
     def _extract_text_txt(self, file_path: str) -> str:
         """Extract text from a plain text file."""
         try:
@@ -246,24 +283,10 @@ class FileProcessor:
     def _extract_text_html(self, file_path: str) -> str:
         """Extract text from an HTML file."""
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
+            with open(file_path, 'rb') as file:
                 content = file.read()
             
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Extract text
-            text = soup.get_text()
-            
-            # Clean up text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
-            
-            return text
+            return extract_html(content)['text']
         except Exception as e:
             raise Exception(f"Error reading HTML: {str(e)}")
     
@@ -0,0 +1,163 @@
+import re
+from typing import Dict, Optional, Union
+
+import lxml.html
+from lxml import etree
+
+# Never contain readable text
+DROP_TAGS = ('script', 'style', 'noscript', 'template', 'svg', 'iframe', 'object', 'embed', 'canvas')
+
+# Page furniture rather than content
+BOILERPLATE_TAGS = ('nav', 'aside', 'footer', 'form', 'button', 'select', 'dialog')
+
+# class/id fragments that mark navigation, banners, share bars and the like
+BOILERPLATE_PATTERN = re.compile(
+    r'(^|[-_ ])(nav|navbar|menu|breadcrumbs?|sidebar|footer|cookies?|consent|banner|'
+    r'share|social|advert|ads?|promo|related|subscribe|newsletter|popup|modal|skip)([-_ ]|$)',
+    re.IGNORECASE
+)
+
+# Elements whose text starts on a new line
+BLOCK_TAGS = (
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption',
+    'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav',
+    'ol', 'p', 'pre', 'section', 'table', 'td', 'th', 'tr', 'ul'
+)
+
+# Blocks that are mostly link text (menus, tag clouds, "read more" lists)
+# are dropped once they hold at least this much text
+LINK_DENSITY_LIMIT = 0.6
+MIN_LINK_BLOCK_LENGTH = 20
+
+# A <main>/<article> is used on its own only if it holds this share of the text
+MAIN_CONTENT_SHARE = 0.25
+
+
+def _parse(content: Union[bytes, str], encoding: Optional[str]):
+    if isinstance(content, bytes):
+        # The declared charset, then UTF-8; a label the bytes do not decode
+        # under is taken to be wrong
+        for candidate in filter(None, (encoding, 'utf-8')):
+            try:
+                content = content.decode(candidate)
+                break
+            except (UnicodeDecodeError, LookupError):
+                continue
+        else:
+            # Let libxml2 go by the page's <meta charset>
+            return lxml.html.document_fromstring(content, parser=lxml.html.HTMLParser(remove_comments=True))
+    try:
+        return lxml.html.document_fromstring(content, parser=lxml.html.HTMLParser(remove_comments=True))
+    except ValueError:
+        # Text with an XML encoding declaration has to be parsed as bytes
+        return lxml.html.document_fromstring(content.encode('utf-8'),
+                                             parser=lxml.html.HTMLParser(encoding='utf-8', remove_comments=True))
+
+
+def _in_content(element) -> bool:
+    return any(ancestor.tag in ('article', 'main') for ancestor in element.iterancestors())
+
+
+def _is_boilerplate(element) -> bool:
+    if element.tag in BOILERPLATE_TAGS:
+        return True
+    if element.tag == 'header' and not _in_content(element):
+        return True
+    if element.tag in ('body', 'html', 'main', 'article'):
+        return False
+    if element.get('role') in ('navigation', 'banner', 'contentinfo', 'complementary'):
+        return True
+    if element.get('aria-hidden') == 'true':
+        return True
+    return BOILERPLATE_PATTERN.search(f"{element.get('class', '')} {element.get('id', '')}") is not None
+
+
+def _text_lengths(root) -> Dict:
+    """Text and link-text lengths of every element, in one bottom-up pass."""
+    lengths = {}
+    for element in reversed(list(root.iter(etree.Element))):
+        text = len((element.text or '').strip())
+        links = 0
+        for child in element:
+            child_text, child_links = lengths.get(child, (0, 0))
+            text += child_text + len((child.tail or '').strip())
+            links += child_links
+        if element.tag == 'a':
+            links = text
+        lengths[element] = (text, links)
+    return lengths
+
+
+def _remove(element) -> None:
+    """Remove an element but keep the text that follows it."""
+    parent = element.getparent()
+    if parent is None:
+        return
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or '') + element.tail
+        else:
+            parent.text = (parent.text or '') + element.tail
+    parent.remove(element)
+
+
+def extract_html(content: Union[bytes, str], encoding: Optional[str] = None,
+                 main_content: bool = True) -> Dict[str, str]:
+    """
+    Extract the readable text and title of an HTML document.
+
+    Scripts, styles and other non-text elements are always dropped. With
+    main_content, page furniture is removed as well: navigation, headers,
+    footers, sidebars, forms, cookie and share banners (by tag, role and
+    class/id), and blocks that are mostly links. When the page marks its
+    content with <main> or <article> and that holds a fair share of the
+    text, only that part is kept.
+
+    Args:
+        content: Page as bytes or text
+        encoding: Declared encoding of the bytes, if known; UTF-8 and then
+            the page's own charset are tried if it is missing or wrong
+        main_content: Remove boilerplate
+
+    Returns:
+        Dictionary with the whitespace-normalized 'text' and the 'title'
+    """
+    try:
+        root = _parse(content, encoding)
+    except (etree.ParserError, ValueError):
+        return {'text': '', 'title': ''}
+
+    title_element = root.find('.//title')
+    title = ' '.join(title_element.text_content().split()) if title_element is not None else ''
+
+    etree.strip_elements(root, 'head', *DROP_TAGS, with_tail=False)
+
+    if main_content:
+        for element in [element for element in root.iter(etree.Element) if _is_boilerplate(element)]:
+            _remove(element)
+
+        lengths = _text_lengths(root)
+        for element in [
+            element for element in root.iter('div', 'ul', 'ol', 'section', 'table', 'dl')
+            if lengths[element][0] >= MIN_LINK_BLOCK_LENGTH
+            and lengths[element][1] > LINK_DENSITY_LIMIT * lengths[element][0]
+        ]:
+            _remove(element)
+
+        lengths = _text_lengths(root)
+        total = lengths.get(root, (0, 0))[0]
+        candidates = root.xpath('//main | //article | //*[@role="main"]')
+        if candidates and total:
+            best = max(candidates, key=lambda element: lengths.get(element, (0, 0))[0])
+            if lengths.get(best, (0, 0))[0] >= MAIN_CONTENT_SHARE * total:
+                root = best
+
+    for element in root.iter(*BLOCK_TAGS):
+        element.text = '\n' + (element.text or '')
+        element.tail = '\n' + (element.tail or '')
+
+    return {
+        'text': ' '.join(root.text_content().split()),
+        'title': title
+    }
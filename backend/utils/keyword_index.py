@@ -0,0 +1,219 @@
+import os
+import atexit
+import tempfile
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple, Iterable
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def candidate_terms(tokens: List[str], max_ngram: int = 2) -> List[str]:
+    """
+    Build keyword candidates (unigrams and n-grams) from a token stream.
+
+    Args:
+        tokens: Preprocessed tokens
+        max_ngram: Longest n-gram to emit
+
+    Returns:
+        List of candidate terms in document order, with repeats
+    """
+    terms = list(tokens)
+    for n in range(2, max_ngram + 1):
+        terms.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    return terms
+
+
+class DocumentFrequencyTable:
+    """
+    Incrementally maintained document-frequency table for TF-IDF scoring.
+
+    Every processed document adds one to the document frequency of each
+    distinct term it contains. The table is persisted as a compressed
+    ``.npz`` file holding the vocabulary as one newline-joined UTF-8 blob
+    and the counts as a ``uint32`` array. Periodic saves run in a background
+    thread, so the request that crosses flush_every does not pay for
+    compressing the whole table; the rest is written at exit.
+    """
+
+    def __init__(self, path: str, flush_every: int = 20, max_terms: int = 500000,
+                 prune_to: float = 0.8, background_flush: bool = True):
+        """
+        Initialize the table and load it from disk if present.
+
+        Args:
+            path: Location of the .npz file
+            flush_every: Documents added between automatic saves
+            max_terms: Vocabulary size that triggers pruning
+            prune_to: Share of max_terms kept after pruning, so the next
+                prune is many documents away
+            background_flush: Save from a background thread rather than
+                from the add_document caller
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.max_terms = max_terms
+        self.low_water = int(max_terms * prune_to)
+        self.background_flush = background_flush
+
+        self._lock = threading.Lock()
+        # Held for a whole save so concurrent saves cannot interleave
+        self._save_lock = threading.Lock()
+        self._flush_thread = None
+        self.document_frequencies: Dict[str, int] = {}
+        self.num_documents = 0
+        self._unsaved = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.load()
+        atexit.register(self.save)
+
+    def load(self) -> bool:
+        """
+        Load the table from disk.
+
+        Returns:
+            True if a table was loaded
+        """
+        if not os.path.exists(self.path):
+            return False
+
+        try:
+            with np.load(self.path) as data:
+                blob = data['terms'].tobytes().decode('utf-8')
+                counts = data['counts']
+                num_documents = int(data['num_documents'])
+        except Exception as e:
+            logger.error(f"Failed to load document frequency table {self.path}: {str(e)}")
+            return False
+
+        terms = blob.split('\n') if blob else []
+        with self._lock:
+            self.document_frequencies = dict(zip(terms, counts.tolist()))
+            self.num_documents = num_documents
+            self._unsaved = 0
+        return True
+
+    def save(self) -> None:
+        """Write the table to disk atomically."""
+        with self._save_lock:
+            with self._lock:
+                if not self._unsaved and os.path.exists(self.path):
+                    return
+                terms = list(self.document_frequencies.keys())
+                counts = np.fromiter(self.document_frequencies.values(), dtype=np.uint32, count=len(terms))
+                num_documents = self.num_documents
+                saved = self._unsaved
+                self._unsaved = 0
+
+            blob = np.frombuffer('\n'.join(terms).encode('utf-8'), dtype=np.uint8)
+            fd, tmp_path = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(self.path))
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    np.savez_compressed(file, terms=blob, counts=counts,
+                                        num_documents=np.array(num_documents, dtype=np.uint64))
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.error(f"Failed to save document frequency table {self.path}: {str(e)}")
+                with self._lock:
+                    self._unsaved += saved
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def add_document(self, terms: Iterable[str]) -> None:
+        """
+        Count one document towards the frequency of each distinct term.
+
+        Args:
+            terms: Terms of the document (duplicates are ignored)
+        """
+        with self._lock:
+            for term in set(terms):
+                self.document_frequencies[term] = self.document_frequencies.get(term, 0) + 1
+            self.num_documents += 1
+            self._unsaved += 1
+
+            if len(self.document_frequencies) > self.max_terms:
+                self._prune()
+
+            should_flush = self._unsaved >= self.flush_every
+
+        if should_flush:
+            if self.background_flush:
+                self.flush_async()
+            else:
+                self.save()
+
+    def flush_async(self) -> bool:
+        """
+        Start a save in a background thread.
+
+        Returns:
+            False if a save is already running; it picks up the new documents
+            on the next flush
+        """
+        with self._lock:
+            if self._flush_thread is not None and self._flush_thread.is_alive():
+                return False
+            self._flush_thread = threading.Thread(target=self._flush, name='df-table-flush', daemon=True)
+            self._flush_thread.start()
+        return True
+
+    def _flush(self) -> None:
+        """Background save entry point."""
+        try:
+            self.save()
+        except Exception as e:
+            logger.error(f"Background save of document frequency table {self.path} failed: {str(e)}")
+
+    def _prune(self) -> None:
+        """
+        Shrink the vocabulary to the low-water mark, dropping singleton
+        terms first and then the rarest. Caller holds the lock.
+        """
+        frequencies = {term: df for term, df in self.document_frequencies.items() if df > 1}
+        if len(frequencies) > self.low_water:
+            kept = sorted(frequencies.items(), key=lambda item: item[1], reverse=True)[:self.low_water]
+            frequencies = dict(kept)
+        self.document_frequencies = frequencies
+
+    def score(self, terms: List[str], top_k: int = 20) -> List[Tuple[str, float]]:
+        """
+        Score a document's terms by TF-IDF against the table.
+
+        Uses the smoothed IDF ``log((1 + N) / (1 + df)) + 1`` and L2
+        normalisation, matching scikit-learn's TfidfVectorizer defaults.
+
+        Args:
+            terms: Terms of the document, with repeats
+            top_k: Number of keywords to return
+
+        Returns:
+            List of (term, score) tuples sorted by score
+        """
+        term_counts = Counter(terms)
+        if not term_counts:
+            return []
+
+        vocabulary = list(term_counts.keys())
+        tf = np.fromiter(term_counts.values(), dtype=np.float64, count=len(vocabulary))
+
+        with self._lock:
+            get_df = self.document_frequencies.get
+            df = np.fromiter((get_df(term, 0) for term in vocabulary), dtype=np.float64, count=len(vocabulary))
+            num_documents = self.num_documents
+
+        idf = np.log((1.0 + num_documents) / (1.0 + df)) + 1.0
+        scores = tf * idf
+        norm = np.linalg.norm(scores)
+        if norm > 0:
+            scores /= norm
+
+        k = min(top_k, len(vocabulary))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(vocabulary[i], float(scores[i])) for i in top]
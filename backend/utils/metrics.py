@@ -0,0 +1,333 @@
+import bisect
+import contextvars
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from fast cache hits to large generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _ThreadShards:
+    """
+    Per-thread storage for metric values.
+
+    Each thread updates only its own shard, so recording takes no lock; the
+    lock is taken once per thread to register the shard, and by scrapes.
+    Shards of finished threads are folded into a retired shard on scrape so
+    short-lived worker threads do not accumulate.
+    """
+
+    def __init__(self, new_shard: Callable[[], dict], merge: Callable[[dict, dict], None]):
+        self._new_shard = new_shard
+        self._merge = merge
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        self._retired = new_shard()
+
+    def mine(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = self._new_shard()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def collect(self) -> dict:
+        """Merged copy of all shards."""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = live
+            total = self._new_shard()
+            self._merge(total, self._retired)
+            for _, shard in live:
+                self._merge(total, shard)
+        return total
+
+
+def _label_key(label_names: Sequence[str], labels: Dict[str, object]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, '')) for name in label_names)
+
+
+def _format_labels(label_names: Sequence[str], key: Sequence[str], extra: str = '') -> str:
+    pairs = [
+        '{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(label_names, key)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._shards = _ThreadShards(dict, self._merge)
+
+    @staticmethod
+    def _merge(into: dict, shard: dict) -> None:
+        for key, value in list(shard.items()):
+            into[key] = into.get(key, 0.0) + value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        shard = self._shards.mine()
+        key = _label_key(self.label_names, labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        return self._shards.collect()
+
+    def expose(self) -> Iterable[str]:
+        for key, value in sorted(self.values().items()):
+            yield f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _ThreadShards(dict, self._merge)
+
+    def _merge(self, into: dict, shard: dict) -> None:
+        for key, (counts, total) in list(shard.items()):
+            merged = into.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+
+    def observe(self, value: float, **labels) -> None:
+        shard = self._shards.mine()
+        key = _label_key(self.label_names, labels)
+        entry = shard.get(key)
+        if entry is None:
+            entry = shard[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def expose(self) -> Iterable[str]:
+        for key, (counts, total) in sorted(self._shards.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="{}"'.format(_format_value(bound))
+                yield f'{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.label_names, key)} {repr(float(total))}'
+            yield f'{self.name}_count{_format_labels(self.label_names, key)} {cumulative}'
+
+
+class Registry:
+    """
+    Holds metrics and scrape-time collectors and renders the Prometheus
+    text exposition format.
+
+    Collectors are called on each scrape and return
+    (name, type, help, [(labels dict, value), ...]) tuples, for values that
+    live elsewhere such as queue depths.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, list]]]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def expose(self, extra_collectors: Sequence[Callable] = ()) -> str:
+        """Render every metric, then the registered and any extra collectors."""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors) + list(extra_collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.expose())
+
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {str(e)}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    names = tuple(labels)
+                    key = tuple(str(labels[label]) for label in names)
+                    lines.append(f'{name}{_format_labels(names, key)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter(
+    'wordcloud_http_requests_total', 'HTTP requests by endpoint, method and status code.',
+    ('endpoint', 'method', 'status')
+)
+REQUEST_ERRORS = REGISTRY.counter(
+    'wordcloud_http_request_errors_total', 'HTTP requests answered with a 5xx status, by endpoint.',
+    ('endpoint',)
+)
+REQUEST_LATENCY = REGISTRY.histogram(
+    'wordcloud_http_request_duration_seconds', 'Time to produce the response, by endpoint.',
+    ('endpoint',)
+)
+STAGE_LATENCY = REGISTRY.histogram(
+    'wordcloud_stage_duration_seconds',
+    'Time spent in each pipeline stage (extract, tokenize, lemmatize, count, layout, encode, '
+    'and the analytics stages by name).',
+    ('stage',)
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    'wordcloud_cache_lookups_total', 'Cache lookups by cache and result (hit or miss).',
+    ('cache', 'result')
+)
+
+
+# Per-request list of (stage, wall seconds, CPU seconds) while a request is
+# being profiled; None otherwise
+_stage_recorder = contextvars.ContextVar('stage_recorder', default=None)
+
+
+@contextmanager
+def record_stages():
+    """Collect the stages observed in this context, e.g. for a request profile."""
+    stages = []
+    token = _stage_recorder.set(stages)
+    try:
+        yield stages
+    finally:
+        _stage_recorder.reset(token)
+
+
+def observe_stage(stage: str, seconds: float, cpu_seconds: Optional[float] = None) -> None:
+    STAGE_LATENCY.observe(seconds, stage=stage)
+    stages = _stage_recorder.get()
+    if stages is not None:
+        stages.append((stage, seconds, cpu_seconds))
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Context manager timing a block, in wall and thread CPU time, as a pipeline stage."""
+    start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, time.thread_time() - cpu_start)
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0) -> None:
+    if hits:
+        CACHE_LOOKUPS.inc(hits, cache=cache, result='hit')
+    if misses:
+        CACHE_LOOKUPS.inc(misses, cache=cache, result='miss')
+
+
+def record_request(endpoint: Optional[str], method: str, status: int, seconds: float) -> None:
+    endpoint = endpoint or 'unmatched'
+    REQUESTS.inc(endpoint=endpoint, method=method, status=status)
+    if status >= 500:
+        REQUEST_ERRORS.inc(endpoint=endpoint)
+    REQUEST_LATENCY.observe(seconds, endpoint=endpoint)
+
+
+def _cache_ratios():
+    """Hit ratio per cache, derived from the lookup counter."""
+    totals = {}
+    for (cache, result), value in CACHE_LOOKUPS.values().items():
+        hits, lookups = totals.get(cache, (0.0, 0.0))
+        totals[cache] = (hits + (value if result == 'hit' else 0.0), lookups + value)
+    yield ('wordcloud_cache_hit_ratio', 'gauge', 'Share of cache lookups that were hits.',
+           [({'cache': cache}, hits / lookups) for cache, (hits, lookups) in sorted(totals.items()) if lookups])
+
+
+def _resident_memory_bytes() -> Optional[int]:
+    """Current RSS from /proc, else peak RSS; None where neither is available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        if resource is None:
+            return None
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _process():
+    resident = _resident_memory_bytes()
+    if resident is not None:
+        yield ('process_resident_memory_bytes', 'gauge', 'Resident memory size in bytes.',
+               [({}, resident)])
+    yield ('process_cpu_seconds_total', 'counter', 'User and system CPU time in seconds.',
+           [({}, time.process_time())])
+    yield ('process_threads', 'gauge', 'Python threads in the process.',
+           [({}, threading.active_count())])
+
+
+REGISTRY.register_collector(_cache_ratios)
+REGISTRY.register_collector(_process)
@@ -0,0 +1,218 @@
+import math
+from collections import Counter
+from typing import Dict, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 64-bit polynomial rolling hash over token ids
+_HASH_BASE = 1000003
+_HASH_MASK = (1 << 64) - 1
+
+
+class PhraseExtractor:
+    """
+    Count unigrams, bigrams and trigrams in one pass and score collocations.
+
+    Tokens are mapped to integer ids and n-grams are keyed by a rolling hash
+    of those ids, so the count tables hold small integer keys. The n-gram
+    tables are bounded with lossy counting: when a table grows past
+    ``max_ngrams`` entries, every entry at or below the current prune floor
+    is dropped and the floor is raised.
+    """
+
+    SCORERS = ('npmi', 'llr')
+
+    def __init__(self, max_ngram: int = 3, min_count: int = 2,
+                 scoring: str = 'npmi', threshold: float = None,
+                 max_ngrams: int = 200000):
+        """
+        Initialize the extractor.
+
+        Args:
+            max_ngram: Longest phrase length (2 or 3)
+            min_count: Minimum occurrences for a phrase to be scored
+            scoring: 'npmi' (normalised PMI) or 'llr' (Dunning log-likelihood ratio)
+            threshold: Minimum score for a phrase (defaults per scorer)
+            max_ngrams: Maximum entries per n-gram table before pruning
+        """
+        if scoring not in self.SCORERS:
+            raise ValueError(f"Unsupported phrase scoring: {scoring}")
+
+        self.max_ngram = max(2, min(int(max_ngram), 3))
+        self.min_count = max(1, int(min_count))
+        self.scoring = scoring
+        if threshold is None:
+            threshold = 0.3 if scoring == 'npmi' else 10.83
+        self.threshold = threshold
+        self.max_ngrams = max_ngrams
+
+        self.token_ids: Dict[str, int] = {}
+        self.tokens: List[str] = []
+        self.unigram_counts = Counter()
+        self.total_tokens = 0
+
+        # n -> {hash: count}, n -> {hash: token id tuple}, n -> prune floor
+        self.ngram_counts = {n: {} for n in range(2, self.max_ngram + 1)}
+        self.ngram_ids = {n: {} for n in range(2, self.max_ngram + 1)}
+        self.prune_floor = {n: 0 for n in range(2, self.max_ngram + 1)}
+
+    def add_segment(self, tokens: List[str]) -> None:
+        """
+        Count a run of adjacent tokens.
+
+        Phrases never span segment boundaries, so callers should start a new
+        segment at sentence ends and wherever a token was filtered out.
+
+        Args:
+            tokens: Adjacent tokens
+        """
+        if not tokens:
+            return
+
+        ids = []
+        for token in tokens:
+            token_id = self.token_ids.get(token)
+            if token_id is None:
+                token_id = len(self.tokens)
+                self.token_ids[token] = token_id
+                self.tokens.append(token)
+            ids.append(token_id)
+
+        self.unigram_counts.update(ids)
+        self.total_tokens += len(ids)
+
+        length = len(ids)
+        for i in range(length):
+            key = ids[i]
+            for n in range(2, self.max_ngram + 1):
+                if i + n > length:
+                    break
+                key = ((key * _HASH_BASE) + ids[i + n - 1]) & _HASH_MASK
+                counts = self.ngram_counts[n]
+                count = counts.get(key)
+                if count is None:
+                    counts[key] = 1
+                    self.ngram_ids[n][key] = tuple(ids[i:i + n])
+                    if len(counts) > self.max_ngrams:
+                        self._prune(n)
+                else:
+                    counts[key] = count + 1
+
+    def phrases(self) -> List[Tuple[str, int, float]]:
+        """
+        Score counted n-grams and return the accepted phrases.
+
+        Returns:
+            List of (phrase, count, score) tuples sorted by count
+        """
+        accepted = []
+        for n in range(2, self.max_ngram + 1):
+            counts = self.ngram_counts[n]
+            ids_table = self.ngram_ids[n]
+            for key, count in counts.items():
+                if count < self.min_count:
+                    continue
+                ids = ids_table[key]
+                score = self._score(ids, count)
+                if score >= self.threshold:
+                    accepted.append((' '.join(self.tokens[i] for i in ids), count, round(score, 4)))
+
+        accepted.sort(key=lambda x: x[1], reverse=True)
+        return accepted
+
+    def frequencies(self) -> Dict[str, int]:
+        """
+        Build a frequency map mixing accepted phrases and residual unigrams.
+
+        Occurrences covered by an accepted phrase are subtracted from its
+        constituent words (and from bigrams inside an accepted trigram), so
+        a phrase does not also show up as its separate words.
+
+        Returns:
+            Mapping of word or phrase to frequency
+        """
+        residual = dict(self.unigram_counts)
+        bigram_residual = {}
+        frequencies = {}
+
+        accepted = self.phrases()
+        by_length = {n: [] for n in range(2, self.max_ngram + 1)}
+        for phrase, count, _ in accepted:
+            by_length[phrase.count(' ') + 1].append((phrase, count))
+
+        for n in sorted(by_length, reverse=True):
+            for phrase, count in by_length[n]:
+                ids = [self.token_ids[token] for token in phrase.split(' ')]
+                if n == 2:
+                    count = bigram_residual.get(phrase, count)
+                    if count < self.min_count:
+                        continue
+                else:
+                    for i in range(n - 1):
+                        bigram = ' '.join(self.tokens[j] for j in ids[i:i + 2])
+                        base = bigram_residual.get(bigram, self._ngram_count(ids[i:i + 2]))
+                        bigram_residual[bigram] = base - count
+                frequencies[phrase] = count
+                for token_id in ids:
+                    residual[token_id] -= count
+
+        for token_id, count in residual.items():
+            if count > 0:
+                frequencies[self.tokens[token_id]] = count
+
+        return frequencies
+
+    def _score(self, ids: Tuple[int, ...], count: int) -> float:
+        """Score an n-gram with the configured collocation measure."""
+        total = float(self.total_tokens)
+        if self.scoring == 'npmi':
+            p_joint = count / total
+            p_independent = 1.0
+            for token_id in ids:
+                p_independent *= self.unigram_counts[token_id] / total
+            if p_joint >= 1.0:
+                return 1.0
+            # Divide by n - 1 so trigram scores share the [-1, 1] range
+            return math.log(p_joint / p_independent) / -math.log(p_joint) / (len(ids) - 1)
+
+        # Log-likelihood ratio of (prefix, last word); for trigrams the
+        # prefix is the leading bigram
+        if len(ids) == 2:
+            prefix_count = self.unigram_counts[ids[0]]
+        else:
+            prefix_count = self._ngram_count(ids[:-1])
+        return self._log_likelihood_ratio(count, prefix_count, self.unigram_counts[ids[-1]], total)
+
+    def _ngram_count(self, ids) -> int:
+        """Look up the count of an n-gram by its token ids."""
+        key = ids[0]
+        for token_id in ids[1:]:
+            key = ((key * _HASH_BASE) + token_id) & _HASH_MASK
+        return self.ngram_counts[len(ids)].get(key, 0)
+
+    @staticmethod
+    def _log_likelihood_ratio(k11: int, prefix_count: int, last_count: int, total: float) -> float:
+        """Dunning's G-squared statistic for a 2x2 contingency table."""
+        k12 = max(prefix_count - k11, 0)
+        k21 = max(last_count - k11, 0)
+        k22 = max(total - k11 - k12 - k21, 0)
+
+        def entropy(*counts):
+            n = sum(counts)
+            return sum(c * math.log(c / n) for c in counts if c > 0)
+
+        return 2.0 * (entropy(k11, k12, k21, k22)
+                      - entropy(k11 + k12, k21 + k22)
+                      - entropy(k11 + k21, k12 + k22))
+
+    def _prune(self, n: int):
+        """Drop low-count entries from an n-gram table (lossy counting)."""
+        self.prune_floor[n] += 1
+        floor = self.prune_floor[n]
+        counts = self.ngram_counts[n]
+        ids_table = self.ngram_ids[n]
+        for key in [key for key, count in counts.items() if count <= floor]:
+            del counts[key]
+            del ids_table[key]
+        logger.info(f"Pruned {n}-gram table to {len(counts)} entries (floor {floor})")
@@ -0,0 +1,301 @@
+import cProfile
+import io
+import itertools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import logging
+
+from utils.metrics import record_stages
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+# Endpoints eligible for server-side 1-in-N sampling
+SAMPLED_ENDPOINTS = {'generate_advanced_wordcloud', 'process_url', 'process_urls', 'upload_file'}
+
+# Functions listed in a cProfile report, by cumulative time
+TOP_FUNCTIONS = 40
+
+# cProfile and tracemalloc are process-wide, so one request is profiled at a time
+_profile_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for one thread.
+
+    A background thread reads the target thread's stack every `interval`
+    seconds and counts identical stacks. Far cheaper than cProfile on deep
+    call trees, at the price of missing short calls.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005, max_depth: int = 64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def report(self) -> Dict:
+        """Collapsed stacks (flame graph input) and the most frequent leaf functions."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return {
+            'interval_ms': self.interval * 1000.0,
+            'samples': self.samples,
+            'top_functions': [
+                {'function': name, 'samples': count, 'share': round(count / self.samples, 4)}
+                for name, count in leaves.most_common(TOP_FUNCTIONS)
+            ] if self.samples else [],
+            'collapsed_stacks': [f'{stack} {count}' for stack, count in self.stacks.most_common()]
+        }
+
+
+def _cprofile_report(profiler: cProfile.Profile) -> Dict:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    stats.sort_stats('cumulative')
+    functions = []
+    for (filename, line, name), (calls, primitive, own, cumulative, _) in stats.stats.items():
+        functions.append({
+            'function': f'{name} ({os.path.basename(filename)}:{line})',
+            'calls': calls,
+            'own_ms': round(own * 1000.0, 3),
+            'cumulative_ms': round(cumulative * 1000.0, 3)
+        })
+    functions.sort(key=lambda f: f['cumulative_ms'], reverse=True)
+
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    return {
+        'total_calls': stats.total_calls,
+        'top_functions': functions[:TOP_FUNCTIONS],
+        'text': text.getvalue()
+    }
+
+
+def _stage_report(stages: List) -> List[Dict]:
+    """Stages in the order they ran, repeated stages summed."""
+    totals = {}
+    for stage, seconds, cpu_seconds in stages:
+        entry = totals.setdefault(stage, {'stage': stage, 'calls': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0})
+        entry['calls'] += 1
+        entry['wall_ms'] += seconds * 1000.0
+        if cpu_seconds is None or entry['cpu_ms'] is None:
+            entry['cpu_ms'] = None
+        else:
+            entry['cpu_ms'] += cpu_seconds * 1000.0
+    for entry in totals.values():
+        entry['wall_ms'] = round(entry['wall_ms'], 3)
+        if entry['cpu_ms'] is not None:
+            entry['cpu_ms'] = round(entry['cpu_ms'], 3)
+    return list(totals.values())
+
+
+class RequestProfile:
+    """
+    Profile of one request: cProfile or sampled stacks, per-stage wall and
+    CPU time, and peak traced allocation.
+
+    start() and finish() must be called from the request's thread. start()
+    returns False, and nothing is profiled, if another request holds the
+    process-wide profilers.
+
+    The memory figures are process-wide too: tracemalloc counts allocations
+    from every thread while the request runs, so concurrent requests are
+    included in them. The profile marks this with memory['scope'].
+    """
+
+    def __init__(self, mode: str, trigger: str, endpoint: Optional[str] = None,
+                 request_id: Optional[str] = None, trace_memory: bool = True):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', expected one of {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self.trigger = trigger
+        self.endpoint = endpoint
+        self.request_id = request_id
+        self.trace_memory = trace_memory
+        self.id = uuid.uuid4().hex
+        self._profiler = None
+        self._stages_context = None
+        self._stages = None
+        self._started_tracing = False
+
+    def start(self) -> bool:
+        if not _profile_lock.acquire(blocking=False):
+            return False
+        try:
+            if self.trace_memory:
+                if tracemalloc.is_tracing():
+                    tracemalloc.reset_peak()
+                else:
+                    tracemalloc.start()
+                    self._started_tracing = True
+                self._memory_start = tracemalloc.get_traced_memory()[0]
+            self._stages_context = record_stages()
+            self._stages = self._stages_context.__enter__()
+            self._wall_start = time.perf_counter()
+            self._cpu_start = time.thread_time()
+            if self.mode == 'cprofile':
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+            else:
+                self._profiler = SamplingProfiler(threading.get_ident())
+                self._profiler.start()
+        except BaseException:
+            # Undo what did start, so later requests can still be profiled
+            if self.mode == 'cprofile' and self._profiler is not None:
+                self._profiler.disable()
+            if self._stages is not None:
+                self._stages_context.__exit__(None, None, None)
+            if self._started_tracing:
+                tracemalloc.stop()
+            _profile_lock.release()
+            raise
+        return True
+
+    def finish(self, status: Optional[int] = None) -> Dict:
+        """Stop profiling, release the profilers and return the profile."""
+        try:
+            if self.mode == 'cprofile':
+                self._profiler.disable()
+            else:
+                self._profiler.stop()
+            wall = time.perf_counter() - self._wall_start
+            cpu = time.thread_time() - self._cpu_start
+            self._stages_context.__exit__(None, None, None)
+
+            memory = None
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                memory = {
+                    'scope': 'process',
+                    'peak_bytes': max(0, peak - self._memory_start),
+                    'retained_bytes': current - self._memory_start
+                }
+                if self._started_tracing:
+                    tracemalloc.stop()
+        finally:
+            _profile_lock.release()
+
+        return {
+            'id': self.id,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'endpoint': self.endpoint,
+            'request_id': self.request_id,
+            'status': status,
+            'mode': self.mode,
+            'trigger': self.trigger,
+            'wall_ms': round(wall * 1000.0, 3),
+            'cpu_ms': round(cpu * 1000.0, 3),
+            'memory': memory,
+            'stages': _stage_report(self._stages),
+            'profile': _cprofile_report(self._profiler) if self.mode == 'cprofile' else self._profiler.report()
+        }
+
+
+class ProfileSampler:
+    """Pick one request in every `every`; 0 disables sampling."""
+
+    def __init__(self, every: int = 0):
+        self.every = max(0, every)
+        self._count = itertools.count(1)
+
+    def hit(self) -> bool:
+        return bool(self.every) and next(self._count) % self.every == 0
+
+
+class ProfileStore:
+    """
+    Finished profiles as JSON files in a directory, newest `max_profiles` kept.
+
+    Files rather than memory so a profile taken by one server process can be
+    read through any other.
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 100):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, profile_id: str) -> Optional[str]:
+        # IDs are hex UUIDs; anything else cannot name a stored profile
+        if len(profile_id) != 32 or any(c not in '0123456789abcdef' for c in profile_id):
+            return None
+        return os.path.join(self.directory, f'{profile_id}.json')
+
+    def save(self, profile: Dict) -> str:
+        path = self._path(profile['id'])
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(profile, file)
+        os.replace(tmp_path, path)
+        self._prune()
+        return profile['id']
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        path = self._path(profile_id)
+        if path is None:
+            return None
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _files(self) -> List[str]:
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+        return sorted(paths, key=lambda path: os.path.getmtime(path), reverse=True)
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        """Summaries of the newest profiles, without the profiler output."""
+        summaries = []
+        for path in self._files()[:limit]:
+            try:
+                with open(path) as file:
+                    profile = json.load(file)
+            except (OSError, ValueError):
+                continue
+            profile.pop('profile', None)
+            summaries.append(profile)
+        return summaries
+
+    def _prune(self) -> None:
+        for path in self._files()[self.max_profiles:]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove old profile {path}: {str(e)}")
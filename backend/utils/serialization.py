@@ -0,0 +1,97 @@
+import gzip
+import json
+from typing import Any
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'image/svg+xml', 'text/csv', 'text/html', 'text/plain'
+}
+
+
+def _default(obj: Any) -> Any:
+    """Convert values the JSON encoders do not handle natively."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Serialize a response payload to JSON bytes in a single pass.
+
+    Non-string keys (ints, floats, booleans) are written as strings, and
+    numpy scalars and arrays are converted on the fly, so payloads need no
+    sanitizing copy first.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def compress_response(response, accept_encodings):
+    """
+    Compress a response body with brotli or gzip if the client accepts it.
+
+    Streamed, already encoded, small and non-text responses are left alone.
+    A strong ETag gets the coding appended, since the bytes differ.
+
+    Args:
+        response: Flask response
+        accept_encodings: The request's parsed Accept-Encoding header
+
+    Returns:
+        The same response, possibly compressed
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return response
+
+    if brotli is not None and accept_encodings['br']:
+        coding, body = 'br', brotli.compress(body, quality=5)
+    elif accept_encodings['gzip']:
+        coding, body = 'gzip', gzip.compress(body, compresslevel=6)
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = coding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{coding}')
+    return response
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """
+    Check If-None-Match against an ETag and its compressed variants.
+
+    Uses the weak comparison If-None-Match calls for, so W/"x" and "x"
+    both match.
+    """
+    return any(if_none_match.contains_weak(candidate) for candidate in (etag, f'{etag}-gzip', f'{etag}-br'))
@@ -0,0 +1,160 @@
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Request ID of the code currently running; '-' outside a request
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+# LogRecord attributes that are not user-supplied fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+
+def log_fields(**fields: Any) -> Dict[str, Any]:
+    """Structured fields for a log call: logger.info('msg', extra=log_fields(words=10))."""
+    return fields
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, request ID, message and fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Formatted before queueing by DroppingQueueHandler.prepare
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Readable single-line format with the request ID and key=value fields."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, 'request_id'):
+            record.request_id = '-'
+        line = super().format(record)
+        fields = ' '.join(
+            f'{key}={value}' for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES
+        )
+        return f'{line} {fields}' if fields else line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks: when the queue is full the record is
+    dropped and counted instead of stalling the request thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and stamp the request ID here, in the calling
+        # thread's context; formatting happens on the listener thread
+        record.request_id = request_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DebugSampler:
+    """
+    Let through one call in every `every`, for per-item debug logging in loops.
+
+    Callers check the logger level once before the loop, so when debug is
+    off the loop pays nothing at all:
+
+        sample = DebugSampler(logger, 1000)
+        for word in words:
+            if sample and sample.hit():
+                logger.debug(...)
+    """
+
+    def __init__(self, logger: logging.Logger, every: int = 1000):
+        self.enabled = logger.isEnabledFor(logging.DEBUG)
+        self.every = max(1, every)
+        self._count = itertools.count()
+
+    def __bool__(self) -> bool:
+        return self.enabled
+
+    def hit(self) -> bool:
+        return next(self._count) % self.every == 0
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+def configure_logging(level: str = 'INFO', log_format: str = 'text', queue_size: int = 10000) -> DroppingQueueHandler:
+    """
+    Route all logging through a bounded queue to a background writer.
+
+    Request threads only enqueue records; a QueueListener thread formats
+    and writes them to stderr. Replaces any handlers already on the root
+    logger, so calling it again reconfigures rather than duplicates.
+
+    Args:
+        level: Root log level name
+        log_format: 'json' for one JSON object per line, 'text' otherwise
+        queue_size: Records buffered before new ones are dropped
+
+    Returns:
+        The queue handler, whose `dropped` counts discarded records
+    """
+    global _listener
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if log_format == 'json' else KeyValueFormatter())
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+
+    root = logging.getLogger()
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level.upper())
+        _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+        _listener.start()
+    return handler
+
+
+@atexit.register
+def _flush_logs() -> None:
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
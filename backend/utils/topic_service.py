@@ -0,0 +1,468 @@
+import os
+import sys
+import copy
+import json
+import shutil
+import argparse
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+import logging
+
+from gensim import corpora
+from gensim.models import LdaModel, Nmf, CoherenceModel
+
+logger = logging.getLogger(__name__)
+
+
+class TopicModelService:
+    """
+    Persistent topic model shared across requests.
+
+    Submitted documents are appended to an on-disk document store. A model
+    (LDA or NMF) is trained from that store offline or in a background
+    thread, saved as a numbered version, and reused for every request, so
+    the per-request cost is a single ``get_document_topics`` inference.
+    """
+
+    MODEL_CLASSES = {
+        'lda': LdaModel,
+        'nmf': Nmf
+    }
+
+    def __init__(self, model_dir: str, num_topics: int = 10,
+                 algorithm: str = 'lda',
+                 min_documents: int = 20,
+                 retrain_every: int = 50,
+                 max_documents: int = 5000,
+                 keep_versions: int = 3,
+                 background_retrain: bool = True):
+        """
+        Initialize the service and load the current model version, if any.
+
+        Args:
+            model_dir: Directory holding the document store and model versions
+            num_topics: Number of topics for newly trained models
+            algorithm: 'lda' or 'nmf'
+            min_documents: Documents required before the first model is trained
+            retrain_every: New documents that trigger a background retrain
+            max_documents: Most recent documents kept for training
+            keep_versions: Number of model versions kept on disk
+            background_retrain: Whether add_document may start a retrain thread
+        """
+        if algorithm not in self.MODEL_CLASSES:
+            raise ValueError(f"Unsupported topic model algorithm: {algorithm}")
+
+        self.model_dir = model_dir
+        self.num_topics = num_topics
+        self.algorithm = algorithm
+        self.min_documents = min_documents
+        self.retrain_every = retrain_every
+        self.max_documents = max_documents
+        self.keep_versions = keep_versions
+        self.background_retrain = background_retrain
+
+        self.documents_path = os.path.join(model_dir, 'documents.jsonl')
+        self.manifest_path = os.path.join(model_dir, 'current.json')
+        os.makedirs(model_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._store_lock = threading.Lock()
+        # Serializes train() and update(), which both build on the current model
+        self._train_lock = threading.Lock()
+        self._retrain_thread = None
+
+        self.model = None
+        self.dictionary = None
+        self.manifest = {}
+        self._pending_documents = 0
+        # Highest version allocated so far, including versions still being written
+        self._last_version = self._highest_version_on_disk()
+
+        self.load()
+
+        # Documents in the store, counted once here and kept up to date after
+        self._document_count = self._count_documents()
+        # Store size at which the next automatic first training is attempted;
+        # raised after a failed attempt so every request does not retrain
+        self._next_train_at = self.min_documents
+
+    @property
+    def version(self) -> Optional[int]:
+        """Version number of the model currently in use."""
+        return self.manifest.get('version')
+
+    def load(self) -> bool:
+        """
+        Load the model version named in the manifest.
+
+        Returns:
+            True if a model was loaded
+        """
+        if not os.path.exists(self.manifest_path):
+            return False
+
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+
+            version_dir = self._version_dir(manifest['version'])
+            model_class = self.MODEL_CLASSES[manifest.get('algorithm', 'lda')]
+            model = model_class.load(os.path.join(version_dir, 'topic.model'))
+            dictionary = corpora.Dictionary.load(os.path.join(version_dir, 'dictionary.dict'))
+        except Exception as e:
+            logger.error(f"Failed to load topic model from {self.model_dir}: {str(e)}")
+            return False
+
+        with self._lock:
+            self.model = model
+            self.dictionary = dictionary
+            self.manifest = manifest
+
+        logger.info(f"Loaded topic model version {manifest['version']}")
+        return True
+
+    def add_document(self, tokens: List[str]) -> None:
+        """
+        Record a processed document for future training.
+
+        Starts a background retrain once enough new documents have arrived.
+
+        Args:
+            tokens: Preprocessed tokens of the document
+        """
+        if not tokens:
+            return
+
+        with self._store_lock:
+            with open(self.documents_path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(tokens) + '\n')
+            self._pending_documents += 1
+            self._document_count += 1
+            pending = self._pending_documents
+            document_count = self._document_count
+
+        if not self.background_retrain:
+            return
+
+        if self.model is None:
+            should_train = document_count >= self._next_train_at
+        else:
+            should_train = pending >= self.retrain_every
+
+        if should_train:
+            self.retrain_async()
+
+    def infer(self, tokens: List[str], num_words: int = 10,
+              minimum_probability: float = 0.05) -> Dict[str, Any]:
+        """
+        Infer the topic mixture of a document with the current model.
+
+        Args:
+            tokens: Preprocessed tokens of the document
+            num_words: Number of words to report per topic
+            minimum_probability: Topics below this weight are omitted
+
+        Returns:
+            Dictionary with topics, coherence, num_topics and model_version
+        """
+        with self._lock:
+            model = self.model
+            dictionary = self.dictionary
+            manifest = self.manifest
+
+        if model is None:
+            return {'topics': [], 'coherence': 0.0, 'num_topics': 0, 'model_version': None}
+
+        bow = dictionary.doc2bow(tokens)
+        if not bow:
+            return {
+                'topics': [],
+                'coherence': manifest.get('coherence', 0.0),
+                'num_topics': 0,
+                'model_version': manifest['version']
+            }
+
+        document_topics = model.get_document_topics(bow, minimum_probability=minimum_probability)
+
+        topics = []
+        for topic_id, weight in sorted(document_topics, key=lambda x: x[1], reverse=True):
+            topics.append({
+                'topic_id': int(topic_id),
+                'weight': round(float(weight), 4),
+                'words': [word for word, _ in model.show_topic(topic_id, topn=num_words)]
+            })
+
+        return {
+            'topics': topics,
+            'coherence': manifest.get('coherence', 0.0),
+            'num_topics': len(topics),
+            'model_version': manifest['version']
+        }
+
+    def train(self, documents: List[List[str]] = None) -> Optional[int]:
+        """
+        Train a new model version and make it current.
+
+        Intended for offline use or the background retrain thread.
+
+        Args:
+            documents: Token lists to train on (defaults to the document store)
+
+        Returns:
+            The new version number, or None if there was too little data
+        """
+        with self._train_lock:
+            version = self._train(documents)
+
+        if version is None:
+            # Wait for retrain_every more documents before trying again
+            with self._store_lock:
+                self._next_train_at = self._document_count + self.retrain_every
+        return version
+
+    def _train(self, documents: Optional[List[List[str]]]) -> Optional[int]:
+        if documents is None:
+            with self._store_lock:
+                documents = self._read_documents()
+                self._pending_documents = 0
+
+        documents = [doc for doc in documents if doc]
+        if len(documents) < self.min_documents:
+            logger.info(f"Not enough documents to train topic model ({len(documents)}/{self.min_documents})")
+            return None
+
+        dictionary = corpora.Dictionary(documents)
+        dictionary.filter_extremes(no_below=2, no_above=0.5, keep_n=50000)
+        corpus = [dictionary.doc2bow(doc) for doc in documents]
+        corpus = [bow for bow in corpus if bow]
+        if not corpus or len(dictionary) == 0:
+            logger.info("Topic model vocabulary is empty after filtering")
+            return None
+
+        if self.algorithm == 'lda':
+            model = LdaModel(
+                corpus,
+                num_topics=self.num_topics,
+                id2word=dictionary,
+                passes=10,
+                random_state=42
+            )
+        else:
+            model = Nmf(
+                corpus,
+                num_topics=self.num_topics,
+                id2word=dictionary,
+                random_state=42
+            )
+
+        try:
+            coherence = CoherenceModel(
+                model=model,
+                texts=documents,
+                dictionary=dictionary,
+                coherence='c_v'
+            ).get_coherence()
+        except Exception as e:
+            logger.error(f"Topic coherence calculation failed: {str(e)}")
+            coherence = 0.0
+
+        return self._publish(model, dictionary, len(documents), coherence)
+
+    def update(self, documents: List[List[str]]) -> Optional[int]:
+        """
+        Update the current model online with new documents.
+
+        The dictionary is kept fixed, so words unseen at training time are
+        ignored until the next full retrain.
+
+        Args:
+            documents: Token lists to fold into the model
+
+        Returns:
+            The new version number, or None if no model exists yet
+        """
+        with self._train_lock:
+            with self._lock:
+                model = self.model
+                dictionary = self.dictionary
+                manifest = dict(self.manifest)
+
+            if model is None:
+                return None
+
+            corpus = [dictionary.doc2bow(doc) for doc in documents]
+            corpus = [bow for bow in corpus if bow]
+            if not corpus:
+                return manifest['version']
+
+            # The published model keeps serving requests while a copy is updated
+            model = copy.deepcopy(model)
+            model.update(corpus)
+            return self._publish(
+                model, dictionary,
+                manifest.get('num_documents', 0) + len(corpus),
+                manifest.get('coherence', 0.0)
+            )
+
+    def retrain_async(self) -> bool:
+        """
+        Start a full retrain in a background thread.
+
+        Returns:
+            False if a retrain is already running
+        """
+        with self._lock:
+            if self._retrain_thread is not None and self._retrain_thread.is_alive():
+                return False
+            self._retrain_thread = threading.Thread(target=self._retrain, daemon=True)
+            self._retrain_thread.start()
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        """Return information about the current model and document store."""
+        with self._lock:
+            manifest = dict(self.manifest)
+            retraining = self._retrain_thread is not None and self._retrain_thread.is_alive()
+        manifest['retraining'] = retraining
+        manifest['pending_documents'] = self._pending_documents
+        return manifest
+
+    def _retrain(self):
+        """Background retrain entry point."""
+        try:
+            self.train()
+        except Exception as e:
+            logger.error(f"Background topic model retrain failed: {str(e)}")
+
+    def _publish(self, model, dictionary, num_documents: int, coherence: float) -> int:
+        """Save a model as a new version and swap it in."""
+        with self._lock:
+            version = max(self._last_version, self.version or 0) + 1
+            self._last_version = version
+        version_dir = self._version_dir(version)
+        os.makedirs(version_dir, exist_ok=True)
+
+        model.save(os.path.join(version_dir, 'topic.model'))
+        dictionary.save(os.path.join(version_dir, 'dictionary.dict'))
+
+        manifest = {
+            'version': version,
+            'algorithm': self.algorithm,
+            'num_topics': self.num_topics,
+            'num_documents': num_documents,
+            'vocabulary_size': len(dictionary),
+            'coherence': float(coherence),
+            'trained_at': datetime.utcnow().isoformat()
+        }
+
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+        os.replace(tmp_path, self.manifest_path)
+
+        with self._lock:
+            # A slower publish never replaces a newer model
+            if version > (self.version or 0):
+                self.model = model
+                self.dictionary = dictionary
+                self.manifest = manifest
+
+        self._prune_versions(version)
+        logger.info(f"Published topic model version {version} trained on {num_documents} documents")
+        return version
+
+    def _prune_versions(self, current_version: int):
+        """Remove model versions older than keep_versions."""
+        for version in range(1, current_version - self.keep_versions + 1):
+            version_dir = self._version_dir(version)
+            if os.path.isdir(version_dir):
+                shutil.rmtree(version_dir, ignore_errors=True)
+
+    def _read_documents(self) -> List[List[str]]:
+        """Read the most recent documents and compact the store."""
+        if not os.path.exists(self.documents_path):
+            return []
+
+        documents = []
+        with open(self.documents_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    documents.append(json.loads(line))
+                except ValueError:
+                    continue
+
+        if len(documents) > self.max_documents:
+            documents = documents[-self.max_documents:]
+            tmp_path = self.documents_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                for doc in documents:
+                    file.write(json.dumps(doc) + '\n')
+            os.replace(tmp_path, self.documents_path)
+        self._document_count = len(documents)
+
+        return documents
+
+    def _count_documents(self) -> int:
+        """Count documents in the store."""
+        if not os.path.exists(self.documents_path):
+            return 0
+        with open(self.documents_path, 'rb') as file:
+            return sum(1 for _ in file)
+
+    def _highest_version_on_disk(self) -> int:
+        versions = [
+            int(name[1:]) for name in os.listdir(self.model_dir)
+            if name.startswith('v') and name[1:].isdigit()
+        ]
+        return max(versions, default=0)
+
+    def _version_dir(self, version: int) -> str:
+        return os.path.join(self.model_dir, f'v{version}')
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Offline topic model management.
+
+        python -m utils.topic_service train [--model-dir DIR]
+        python -m utils.topic_service update DOCUMENTS.jsonl [--model-dir DIR]
+        python -m utils.topic_service status [--model-dir DIR]
+
+    The update file holds one JSON list of tokens per line, like the store.
+    """
+    default_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resources', 'topic_models')
+    parser = argparse.ArgumentParser(description='Train, update or inspect the shared topic model.')
+    parser.add_argument('command', choices=['train', 'update', 'status'])
+    parser.add_argument('documents', nargs='?', help='JSONL token lists for update')
+    parser.add_argument('--model-dir', default=default_dir)
+    parser.add_argument('--algorithm', choices=sorted(TopicModelService.MODEL_CLASSES), default='lda')
+    parser.add_argument('--num-topics', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    service = TopicModelService(args.model_dir, num_topics=args.num_topics,
+                                algorithm=args.algorithm, background_retrain=False)
+
+    if args.command == 'status':
+        print(json.dumps(service.status(), indent=2))
+        return 0
+
+    if args.command == 'train':
+        version = service.train()
+    else:
+        if not args.documents:
+            parser.error('update needs a documents file')
+        with open(args.documents, 'r', encoding='utf-8') as file:
+            documents = [json.loads(line) for line in file if line.strip()]
+        version = service.update(documents)
+
+    if version is None:
+        print(f"No model published ({args.command} needs more documents or an existing model)")
+        return 1
+    print(f"Published topic model version {version}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
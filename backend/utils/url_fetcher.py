@@ -0,0 +1,251 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.metrics import record_cache, stage_timer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+CHUNK_SIZE = 64 * 1024
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for deduplication.
+
+    Lowercases the scheme and host, drops the default port and the
+    fragment, and gives an empty path as '/'.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    if parts.username:
+        host = f'{parts.username}@{host}'
+    return urlunsplit((scheme, host, parts.path or '/', parts.query, ''))
+
+
+class ResponseTooLarge(Exception):
+    """The response body exceeded the fetcher's size cap."""
+
+    def __init__(self, size: int, max_size: int):
+        super().__init__(f'Content size ({size} bytes) exceeds maximum allowed size ({max_size} bytes)')
+        self.size = size
+        self.max_size = max_size
+
+
+class _CacheEntry:
+    __slots__ = ('value', 'etag', 'last_modified', 'stored_at')
+
+    def __init__(self, value: Any, etag: Optional[str], last_modified: Optional[str]):
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.monotonic()
+
+
+class _HostSlot:
+    """Concurrency limit for one host, with the number of requests using it."""
+
+    def __init__(self, limit: int):
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.users = 0
+
+
+class UrlFetcher:
+    """
+    Fetch URLs over a shared, pooled session with a size cap and a
+    conditional-GET cache.
+
+    Bodies are streamed and the download is abandoned as soon as it passes
+    max_size, whether or not the server sent Content-Length. Parsed results
+    of responses carrying an ETag or Last-Modified are cached per URL; later
+    fetches revalidate with If-None-Match / If-Modified-Since and a 304
+    returns the cached result without downloading or parsing again. Entries
+    are evicted cache_ttl seconds after they were last validated, and the
+    least recently used beyond cache_size.
+
+    At most per_host_limit requests to the same host are in flight at once,
+    across all callers, so batch fetches stay polite to each site. Limits
+    are only kept for hosts with requests in flight or waiting.
+
+    Time spent waiting for a host slot is recorded as the 'host_wait' stage
+    and the request and download as 'fetch'; parsing is timed by the
+    caller's parse function.
+    """
+
+    def __init__(self, max_size: int, timeout: float = 30, pool_connections: int = 10,
+                 pool_maxsize: int = 20, retries: int = 2, cache_ttl: float = 3600,
+                 cache_size: int = 256, per_host_limit: int = 4):
+        """
+        Initialize the fetcher.
+
+        Args:
+            max_size: Largest body to download, in bytes
+            timeout: Connect and read timeout in seconds
+            pool_connections: Hosts to keep connection pools for
+            pool_maxsize: Connections kept per host
+            retries: Retries on connection errors and 502/503/504
+            cache_ttl: Seconds a cached result stays usable without revalidation succeeding
+            cache_size: Most URLs kept in the cache
+            per_host_limit: Concurrent requests allowed to one host
+        """
+        self.max_size = max_size
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+
+        retry = Retry(total=retries, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(['GET']), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0}
+        self._host_slots = {}
+
+    def fetch(self, url: str, parse: Callable[[bytes, Optional[str], requests.Response], Any],
+              headers: Optional[Dict[str, str]] = None, deadline: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Fetch a URL and parse its body, using the cache when it is still valid.
+
+        Args:
+            url: URL to fetch
+            parse: Called with (body bytes, declared encoding or None, response)
+            headers: Extra request headers
+            deadline: time.monotonic() value by which the caller gives up;
+                caps the connect and read timeouts of each attempt once a
+                host slot is held
+
+        Returns:
+            Tuple of (parsed value, True if it came from the cache)
+
+        Raises:
+            ResponseTooLarge: The body is larger than max_size
+            requests.exceptions.RequestException: The request failed, or the
+                deadline passed while waiting for a host slot
+        """
+        entry = self._cached(url)
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry.etag:
+                request_headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                request_headers['If-Modified-Since'] = entry.last_modified
+
+        with self._host_slot(url), stage_timer('fetch'), \
+                self.session.get(url, headers=request_headers, timeout=self._timeout(deadline), stream=True) as response:
+            if response.status_code == 304 and entry is not None:
+                with self._lock:
+                    entry.stored_at = time.monotonic()
+                    self._counters['hits'] += 1
+                record_cache('url_text', hits=1)
+                return entry.value, True
+            response.raise_for_status()
+
+            body = self._read_capped(response)
+            encoding = response.encoding if 'charset' in response.headers.get('content-type', '').lower() else None
+
+        # Parsed after the host slot and connection are released
+        value = parse(body, encoding, response)
+        with self._lock:
+            self._counters['misses'] += 1
+        record_cache('url_text', misses=1)
+        self._store(url, value, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return value, False
+
+    def _timeout(self, deadline: Optional[float]) -> float:
+        """Connect and read timeout, shortened to what is left before the deadline."""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.exceptions.Timeout('Deadline passed before the request started')
+        return min(self.timeout, remaining)
+
+    @contextmanager
+    def _host_slot(self, url: str):
+        """Hold one of the host's request slots; the host is forgotten once idle."""
+        host = (urlsplit(url).hostname or '').lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = _HostSlot(self.per_host_limit)
+            slot.users += 1
+        try:
+            with stage_timer('host_wait'):
+                slot.semaphore.acquire()
+            try:
+                yield
+            finally:
+                slot.semaphore.release()
+        finally:
+            with self._lock:
+                slot.users -= 1
+                if not slot.users:
+                    del self._host_slots[host]
+
+    def _read_capped(self, response: requests.Response) -> bytes:
+        """Read a streamed body, stopping as soon as it passes max_size."""
+        content_length = response.headers.get('content-length')
+        if content_length and content_length.isdigit() and int(content_length) > self.max_size:
+            raise ResponseTooLarge(int(content_length), self.max_size)
+
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            size += len(chunk)
+            if size > self.max_size:
+                raise ResponseTooLarge(size, self.max_size)
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def _cached(self, url: str) -> Optional[_CacheEntry]:
+        with self._lock:
+            entry = self._cache.get(url)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.stored_at > self.cache_ttl:
+                del self._cache[url]
+                return None
+            self._cache.move_to_end(url)
+            return entry
+
+    def _store(self, url: str, value: Any, etag: Optional[str], last_modified: Optional[str]) -> None:
+        with self._lock:
+            if not etag and not last_modified:
+                # Nothing to revalidate with
+                self._cache.pop(url, None)
+                return
+            self._cache[url] = _CacheEntry(value, etag, last_modified)
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters, size=len(self._cache))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
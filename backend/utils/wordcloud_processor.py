@@ -1,11 +1,10 @@
 import matplotlib
 matplotlib.use('Agg')
-import re
 import string
 import base64
 import io
-from collections import Counter, defaultdict
-from typing import Dict, List, Optional, Tuple
+from collections import Counter
+from typing import Dict, List, Optional
 
 import nltk
 from nltk.corpus import stopwords
@@ -14,15 +13,52 @@ from wordcloud import WordCloud, STOPWORDS
 import matplotlib.pyplot as plt
 import numpy as np
 from PIL import Image, ImageDraw
-from textblob import TextBlob
 import os
 from matplotlib.colors import LinearSegmentedColormap
 import logging
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Map frontend color scheme names to matplotlib colormap names
+COLOR_MAP_TRANSLATION = {
+    'reds': 'Reds',
+    'blues': 'Blues',
+    'greens': 'Greens',
+    'purples': 'Purples',
+    'greys': 'Greys',
+    'spectral': 'Spectral',
+    'coolwarm': 'coolwarm',
+    'viridis': 'viridis',
+    'plasma': 'plasma',
+    'inferno': 'inferno',
+    'magma': 'magma',
+    'cividis': 'cividis',
+    'rainbow': 'rainbow',
+    # ... add more as needed ...
+}
+
+# Map frontend background color names to valid color codes
+BACKGROUND_COLOR_TRANSLATION = {
+    'lightred': '#fff0f0',
+    'lightgrey': '#f0f0f0',
+    'darkgrey': '#333333',
+    'lightblue': '#e6f7ff',
+    'lightgreen': '#e6fff0',
+    'transparent': None,  # WordCloud uses None for transparent
+    'white': '#ffffff',
+    'black': '#000000',
+    # Add more as needed
+}
+
+def translate_color_scheme(color_scheme: str) -> str:
+    """Return the matplotlib colormap for a frontend color scheme name."""
+    return COLOR_MAP_TRANSLATION.get(color_scheme.lower(), color_scheme)
+
+def translate_background_color(background_color: str) -> Optional[str]:
+    """Return the color code for a frontend background name (None = transparent)."""
+    return BACKGROUND_COLOR_TRANSLATION.get(background_color.lower(), background_color)
+
 class WordCloudProcessor:
     def __init__(self):
         """Initialize the WordCloud processor with NLTK data."""
@@ -234,87 +270,24 @@ class WordCloudProcessor:
             # Default to no mask
             return None
     
-    def extract_word_context(self, text: str, words: List[str]) -> Dict[str, List[str]]:
-        """
-        For each word, find sentences in the text where it appears.
-        Returns a dict: word -> list of sentences containing the word.
-        """
-        # Split text into sentences (simple split, can be improved)
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        word_context = defaultdict(list)
-        for sentence in sentences:
-            for word in words:
-                # Use word boundaries for exact match, case-insensitive
-                if re.search(rf'\\b{re.escape(word)}\\b', sentence, re.IGNORECASE):
-                    word_context[word].append(sentence.strip())
-        return dict(word_context)
-    
-    def analyze_sentiment(self, text: str) -> dict:
-        """
-        Analyze sentiment using TextBlob. Returns polarity and subjectivity.
-        """
-        blob = TextBlob(text)
-        return {
-            'polarity': blob.sentiment.polarity,
-            'subjectivity': blob.sentiment.subjectivity
-        }
-    
-    def get_top_n_words(self, word_frequencies: Dict[str, int], n: int = 10) -> list:
-        """
-        Return a list of tuples (word, frequency) for the top N words.
-        """
-        # Ensure all frequency values are integers
-        word_frequencies_converted = {}
-        for word, freq in word_frequencies.items():
-            if isinstance(freq, str):
-                try:
-                    word_frequencies_converted[word] = int(freq)
-                except (ValueError, TypeError):
-                    word_frequencies_converted[word] = 1  # Default to 1 if conversion fails
-            else:
-                word_frequencies_converted[word] = freq
-                
-        return sorted(word_frequencies_converted.items(), key=lambda x: x[1], reverse=True)[:n]
-    
-    def generate_wordcloud(self, text: str, remove_stopwords: bool = True,
-                          custom_stopwords: List[str] = None,
-                          mask_shape: str = 'none',
-                          min_frequency: int = None,
-                          max_frequency: int = None,
-                          width: int = 800,
-                          height: int = 600,
-                          color_scheme: str = 'viridis',
-                          background_color: str = 'white',
-                          prefer_horizontal: float = 0.7,
-                          relative_scaling: float = 0.5,
-                          max_words: int = 200,
-                          min_font_size: int = 10,
-                          max_font_size: int = 100) -> Tuple[str, Dict[str, int], Dict[str, List[str]], dict, list]:
+    def filtered_frequencies(self, text: str, remove_stopwords: bool = True,
+                             custom_stopwords: List[str] = None,
+                             min_frequency: int = None,
+                             max_frequency: int = None) -> Dict[str, int]:
         """
-        Generate a word cloud from input text.
-        Always use a rectangular shape (no mask).
+        Preprocess text and count word frequencies within the thresholds.
         
         Args:
             text: Raw input text
             remove_stopwords: Whether to remove stopwords
             custom_stopwords: Additional custom stopwords
-            mask_shape: Shape for the word cloud ('none', 'circle', 'heart')
             min_frequency: Minimum frequency for a word to appear
             max_frequency: Maximum frequency for a word to appear
-            width: Image width
-            height: Image height
-            color_scheme: Color scheme for the word cloud
-            background_color: Background color for the word cloud
-            prefer_horizontal: Ratio of horizontal to vertical word placement (0.0 to 1.0)
-            relative_scaling: Importance of word frequency for font size (0.0 to 1.0)
-            max_words: Maximum number of words in the cloud
-            min_font_size: Minimum font size for words
-            max_font_size: Maximum font size for words
             
         Returns:
-            Tuple of (base64_image_string, word_frequencies, word_context, sentiment, top_words)
+            Mapping of word to frequency
         """
-        logger.info(f"Starting generate_wordcloud with min_frequency={min_frequency} (type: {type(min_frequency).__name__}), max_frequency={max_frequency} (type: {type(max_frequency).__name__})")
+        logger.debug(f"Starting filtered_frequencies with min_frequency={min_frequency} (type: {type(min_frequency).__name__}), max_frequency={max_frequency} (type: {type(max_frequency).__name__})")
         
         # Preprocess text
         tokens = self.preprocess_text(text, remove_stopwords, custom_stopwords)
@@ -323,14 +296,14 @@ class WordCloudProcessor:
         
         # Count frequencies
         word_frequencies = self.count_frequencies(tokens)
-        logger.info(f"Found {len(word_frequencies)} unique words before frequency filtering")
+        logger.debug(f"Found {len(word_frequencies)} unique words before frequency filtering")
         
         # Apply frequency thresholds
         if min_frequency is not None:
-            logger.info(f"Applying min_frequency filter: {min_frequency}")
+            logger.debug(f"Applying min_frequency filter: {min_frequency}")
             try:
                 min_freq_value = int(min_frequency)
-                logger.info(f"Converted min_frequency to {min_freq_value}")
+                logger.debug(f"Converted min_frequency to {min_freq_value}")
                 filtered_words = {}
                 for w, f in word_frequencies.items():
                     # Ensure both values are integers for comparison
@@ -338,16 +311,16 @@ class WordCloudProcessor:
                     if word_freq >= min_freq_value:
                         filtered_words[w] = f
                 word_frequencies = filtered_words
-                logger.info(f"After min_frequency filter: {len(word_frequencies)} words remain")
+                logger.debug(f"After min_frequency filter: {len(word_frequencies)} words remain")
             except (ValueError, TypeError) as e:
                 # If conversion fails, log the error but continue without filtering
                 logger.error(f"Invalid min_frequency value: {min_frequency}, expected an integer. Error: {str(e)}")
                 
         if max_frequency is not None:
-            logger.info(f"Applying max_frequency filter: {max_frequency}")
+            logger.debug(f"Applying max_frequency filter: {max_frequency}")
             try:
                 max_freq_value = int(max_frequency)
-                logger.info(f"Converted max_frequency to {max_freq_value}")
+                logger.debug(f"Converted max_frequency to {max_freq_value}")
                 filtered_words = {}
                 for w, f in word_frequencies.items():
                     # Ensure both values are integers for comparison
@@ -355,7 +328,7 @@ class WordCloudProcessor:
                     if word_freq <= max_freq_value:
                         filtered_words[w] = f
                 word_frequencies = filtered_words
-                logger.info(f"After max_frequency filter: {len(word_frequencies)} words remain")
+                logger.debug(f"After max_frequency filter: {len(word_frequencies)} words remain")
             except (ValueError, TypeError) as e:
                 # If conversion fails, log the error but continue without filtering
                 logger.error(f"Invalid max_frequency value: {max_frequency}, expected an integer. Error: {str(e)}")
@@ -363,48 +336,54 @@ class WordCloudProcessor:
         if not word_frequencies:
             raise ValueError("No words meet the frequency threshold criteria.")
         
+        return word_frequencies
+
+    def compute_layout(self, word_frequencies: Dict[str, int],
+                       width: int = 800,
+                       height: int = 600,
+                       color_scheme: str = 'viridis',
+                       background_color: str = 'white',
+                       prefer_horizontal: float = 0.7,
+                       relative_scaling: float = 0.5,
+                       max_words: int = 200,
+                       min_font_size: int = 10,
+                       max_font_size: int = 100,
+                       random_state: int = None) -> WordCloud:
+        """
+        Place the words of a frequency map; this is the expensive step.
+        
+        The returned WordCloud's layout_ lists (word, count), font size,
+        (y, x) position, orientation and color for every placed word, and
+        can be redrawn at any scale or as SVG without placing again
+        (see utils.cloud_layout).
+        
+        Keys may be single words or multi-word phrases.
+        
+        Args:
+            word_frequencies: Mapping of term to frequency
+            width: Image width
+            height: Image height
+            color_scheme: Color scheme for the word cloud
+            background_color: Background color for the word cloud
+            prefer_horizontal: Ratio of horizontal to vertical word placement (0.0 to 1.0)
+            relative_scaling: Importance of word frequency for font size (0.0 to 1.0)
+            max_words: Maximum number of words in the cloud
+            min_font_size: Minimum font size for words
+            max_font_size: Maximum font size for words
+            random_state: Seed for placement and coloring
+            
+        Returns:
+            Generated WordCloud object
+        """
         # Limit the number of words to prevent overcrowding
         max_words = min(len(word_frequencies), max_words)
         
-        # Map frontend color scheme names to matplotlib colormap names
-        color_map_translation = {
-            'reds': 'Reds',
-            'blues': 'Blues',
-            'greens': 'Greens',
-            'purples': 'Purples',
-            'greys': 'Greys',
-            'spectral': 'Spectral',
-            'coolwarm': 'coolwarm',
-            'viridis': 'viridis',
-            'plasma': 'plasma',
-            'inferno': 'inferno',
-            'magma': 'magma',
-            'cividis': 'cividis',
-            'rainbow': 'rainbow',
-            # ... add more as needed ...
-        }
-        mapped_color_scheme = color_map_translation.get(color_scheme.lower(), color_scheme)
-        
-        # Map frontend background color names to valid color codes
-        background_color_translation = {
-            'lightred': '#fff0f0',
-            'lightgrey': '#f0f0f0',
-            'darkgrey': '#333333',
-            'lightblue': '#e6f7ff',
-            'lightgreen': '#e6fff0',
-            'transparent': None,  # WordCloud uses None for transparent
-            'white': '#ffffff',
-            'black': '#000000',
-            # Add more as needed
-        }
-        mapped_background_color = background_color_translation.get(background_color.lower(), background_color)
-        
         # Remove all mask logic, always use None for mask
         wc = WordCloud(
             width=width,
             height=height,
-            background_color=mapped_background_color,
-            colormap=mapped_color_scheme,
+            background_color=translate_background_color(background_color),
+            colormap=translate_color_scheme(color_scheme),
             mask=None,
             stopwords=self.stop_words,
             min_word_length=1,
@@ -412,13 +391,24 @@ class WordCloudProcessor:
             max_words=max_words,
             max_font_size=max_font_size,
             prefer_horizontal=prefer_horizontal,
-            relative_scaling=relative_scaling
+            relative_scaling=relative_scaling,
+            random_state=random_state
         )
         
         # Generate the word cloud
         wc.generate_from_frequencies(word_frequencies)
+        return wc
+
+    def image_to_png(self, wc: WordCloud) -> bytes:
+        """
+        Draw a generated WordCloud as PNG bytes.
         
-        # Convert to base64
+        Args:
+            wc: WordCloud with a computed layout
+            
+        Returns:
+            PNG image bytes
+        """
         # Create figure without GUI
         fig = plt.figure(figsize=(10, 8))
         plt.imshow(wc, interpolation='bilinear')
@@ -428,23 +418,10 @@ class WordCloudProcessor:
         buffer = io.BytesIO()
         fig.savefig(buffer, format='png', bbox_inches='tight', 
                    pad_inches=0, dpi=150, facecolor='white')
-        buffer.seek(0)
-        
-        # Convert to base64
-        image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
         
         plt.close(fig)
         
-        # Extract context for each word
-        word_context = self.extract_word_context(text, list(word_frequencies.keys()))
-        
-        # Sentiment analysis
-        sentiment = self.analyze_sentiment(text)
-        
-        # Top N words
-        top_words = self.get_top_n_words(word_frequencies, n=10)
-        
-        return image_base64, word_frequencies, word_context, sentiment, top_words 
+        return buffer.getvalue()
 
     def _get_font_path(self, font_family):
         """Get the path to a font file based on the font family name."""
@@ -65,13 +65,15 @@ const MultiSourceInput = ({ onTextExtracted, onError }) => {
   };
 
   const handleUrlSubmit = async () => {
-    if (!url.trim()) {
+    // One URL per line; several are fetched together in one batch request
+    const urls = url.split(/\s+/).filter(Boolean);
+    if (urls.length === 0) {
       onError('Please enter a URL');
       return;
     }
 
-    if (!url.match(/^https?:\/\//i)) {
-      onError('Please enter a valid URL starting with http:// or https://');
+    if (!urls.every(u => u.match(/^https?:\/\//i))) {
+      onError('Please enter valid URLs starting with http:// or https://');
       return;
     }
 
@@ -80,11 +82,17 @@ const MultiSourceInput = ({ onTextExtracted, onError }) => {
 
     try {
       setProgress(30);
-      const response = await axios.post(`/api/process_url`, { url });
+      const response = urls.length > 1
+        ? await axios.post(`/api/process_urls`, { urls })
+        : await axios.post(`/api/process_url`, { url: urls[0] });
       setProgress(100);
 
       if (response.data.success) {
         onTextExtracted(response.data.text);
+        const failed = (response.data.results || []).filter(result => !result.success);
+        if (failed.length > 0) {
+          onError(`Could not extract text from: ${failed.map(result => result.url).join(', ')}`);
+        }
       } else {
         onError(response.data.error || 'Failed to extract text from URL');
       }
@@ -242,21 +250,21 @@ const MultiSourceInput = ({ onTextExtracted, onError }) => {
         {inputType === 'url' && (
           <div>
             <label htmlFor="url-input" className="block text-sm font-medium text-gray-700 mb-2">
-              Enter a website URL
+              Enter website URLs
             </label>
             <div className="mt-1 flex rounded-md shadow-sm">
-              <input
-                type="text"
+              <textarea
                 id="url-input"
+                rows={3}
                 value={url}
                 onChange={(e) => setUrl(e.target.value)}
-                placeholder="https://example.com"
+                placeholder={'https://example.com\nhttps://example.com/about'}
                 className="flex-1 min-w-0 block w-full px-3 py-2 rounded-md border border-gray-300 focus:outline-none focus:ring-blue-500 focus:border-blue-500 sm:text-sm"
                 disabled={loading}
               />
             </div>
             <p className="mt-1 text-sm text-gray-500">
-              Enter a valid URL starting with http:// or https://
+              One URL per line, each starting with http:// or https://
             </p>
 
             {loading && (
@@ -1,31 +1,42 @@
 import React, { useState, useEffect } from 'react';
 
-const WordCloudDisplay = ({ imageBase64, wordFrequencies, wordContext, sentiment, topWords, stats, onReset }) => {
+const WordCloudDisplay = ({ imageBase64, imageUrl, wordFrequencies, wordContext, sentiment, topWords, stats, onReset }) => {
   const [selectedWord, setSelectedWord] = useState(null);
   const [showModal, setShowModal] = useState(false);
   const [animateCloud, setAnimateCloud] = useState(false);
 
+  // Images are served by URL from the image cache; older responses may still carry them inline
+  const imageSrc = imageUrl || (imageBase64 ? `data:image/png;base64,${imageBase64}` : null);
+
   useEffect(() => {
-    if (imageBase64) {
+    if (imageSrc) {
       setAnimateCloud(false);
       setTimeout(() => setAnimateCloud(true), 50);
     }
-  }, [imageBase64]);
+  }, [imageSrc]);
 
-  const handleDownload = () => {
-    if (!imageBase64) return;
+  const handleDownload = async () => {
+    if (!imageSrc) return;
     
-    const link = document.createElement('a');
-    link.href = `data:image/png;base64,${imageBase64}`;
-    link.download = 'word-cloud.png';
-    document.body.appendChild(link);
-    link.click();
-    document.body.removeChild(link);
+    // Cross-origin URLs ignore the download attribute, so go through a blob URL
+    try {
+      const response = await fetch(imageSrc);
+      const objectUrl = URL.createObjectURL(await response.blob());
+      const link = document.createElement('a');
+      link.href = objectUrl;
+      link.download = 'word-cloud.png';
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      URL.revokeObjectURL(objectUrl);
+    } catch (error) {
+      console.error('Failed to download image:', error);
+    }
   };
 
   const handleCopyImage = async () => {
     try {
-      const response = await fetch(`data:image/png;base64,${imageBase64}`);
+      const response = await fetch(imageSrc);
       const blob = await response.blob();
       await navigator.clipboard.write([
         new window.ClipboardItem({
@@ -60,7 +71,7 @@ const WordCloudDisplay = ({ imageBase64, wordFrequencies, wordContext, sentiment
   // Find max frequency for bar chart scaling
   const maxTopWordFreq = topWords && Array.isArray(topWords) && topWords.length > 0 ? Math.max(...topWords.map(([_, freq]) => freq || 0)) : 1;
 
-  if (!imageBase64) {
+  if (!imageSrc) {
     return null;
   }
 
@@ -107,7 +118,7 @@ const WordCloudDisplay = ({ imageBase64, wordFrequencies, wordContext, sentiment
       <div className="flex justify-center mb-6">
         <div className="relative group">
           <img
-            src={`data:image/png;base64,${imageBase64}`}
+            src={imageSrc}
             alt="Generated Word Cloud"
             className={`max-w-full h-auto rounded-xl shadow-xl border border-gray-200 transition-all duration-700 ease-out ${animateCloud ? 'opacity-100 scale-100' : 'opacity-0 scale-95'} group-hover:shadow-2xl group-hover:shadow-blue-200`}
             style={{ boxShadow: animateCloud ? '0 8px 32px 0 rgba(31, 38, 135, 0.18)' : undefined }}
@@ -26,12 +26,12 @@ const WordCloudGenerator = () => {
       // Fetch the word cloud from the backend
       setIsLoading(true);
       setError(null);
-      axios.get(`/api/export/${wordcloudId}?format=json`)
+      axios.get(`/api/export/${wordcloudId}?format=json&include_text=false`)
         .then((response) => {
           if (response.data.success && response.data.wordcloud) {
             const wc = response.data.wordcloud;
             setWordCloudData({
-              imageBase64: wc.image_base64,
+              imageUrl: `${axios.defaults.baseURL || ''}${wc.image_url}`,
               wordFrequencies: wc.word_frequencies,
               wordContext: wc.word_context,
               sentiment: wc.sentiment_analysis,
@@ -106,7 +106,7 @@ const WordCloudGenerator = () => {
       });
       if (response.data.success) {
         setWordCloudData({
-          imageBase64: response.data.image_base64,
+          imageUrl: `${axios.defaults.baseURL || ''}${response.data.image_url}`,
           wordFrequencies: response.data.word_frequencies,
           wordContext: response.data.word_context,
           sentiment: response.data.sentiment_analysis,
@@ -283,6 +283,7 @@ const WordCloudGenerator = () => {
           {wordCloudData && (
             <WordCloudDisplay
               imageBase64={wordCloudData.imageBase64}
+              imageUrl={wordCloudData.imageUrl}
               wordFrequencies={wordCloudData.wordFrequencies}
               wordContext={wordCloudData.wordContext}
               sentiment={wordCloudData.sentiment}